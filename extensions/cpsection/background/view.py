@@ -16,16 +16,16 @@
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301 USA
 
 import os
+from threading import Thread
 
-import gi
 from gi.repository import Gtk
 from gi.repository import Gdk
-from gi.repository import GObject
 from gi.repository import GdkPixbuf
 
 from sugar3.graphics import style
 from sugar3.graphics.radiotoolbutton import RadioToolButton
 from jarabe.controlpanel.sectionview import SectionView
+from jarabe.util.thumbnails import ThumbnailPool
 
 from gettext import gettext as _
 
@@ -40,6 +40,7 @@ class Background(SectionView):
 
         self.connect('realize', self.__realize_cb)
         self.connect('unrealize', self.__unrealize_cb)
+        self.connect('destroy', self.__destroy_cb)
 
         self.set_border_width(style.DEFAULT_SPACING * 2)
         self.set_spacing(style.DEFAULT_SPACING)
@@ -103,38 +104,56 @@ class Background(SectionView):
 
         self._paths_list = []
 
-        file_paths = []
-        for directory in self._model.BACKGROUNDS_DIRS:
-            if directory is not None and os.path.exists(directory):
-                for root, dirs, files in os.walk(directory):
-                    for file_ in files:
-                        file_paths.append(os.path.join(root, file_))
+        # the thumbnails are added to the view as they are ready, the
+        # directories are walked in a thread so that the panel shows up
+        # right away
+        self._thumbnail_pool = ThumbnailPool(self.__thumbnails_cb,
+                                             self.__thumbnails_done_cb,
+                                             size=style.XLARGE_ICON_SIZE)
+        thread = Thread(target=self._find_backgrounds,
+                        args=(self._model.BACKGROUNDS_DIRS,))
+        thread.daemon = True
+        thread.start()
 
-        self._append_to_store(file_paths)
         self.setup()
 
-    def _append_to_store(self, file_paths):
-        if file_paths:
-            file_path = file_paths.pop()
-            pixbuf = None
-
-            try:
-                pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_size(
-                    file_path, style.XLARGE_ICON_SIZE,
-                    style.XLARGE_ICON_SIZE)
-            except gi._glib._glib.GError:
-                pass
-            else:
-                self._store.append([pixbuf, file_path])
-                self._paths_list.append(file_path)
+    def _find_backgrounds(self, directories):
+        for directory in directories:
+            if directory is not None and os.path.exists(directory):
+                for root, dirs, files in os.walk(directory):
+                    for file_ in files:
+                        self._thumbnail_pool.add(os.path.join(root, file_))
+        self._thumbnail_pool.close()
 
-            GObject.idle_add(self._append_to_store, file_paths)
-        else:
-            self._select_background()
-            self._images_loaded = True
-            window = self.get_window()
-            if window is not None:
-                window.set_cursor(None)
+    def __thumbnails_cb(self, results):
+        background = self._model.get_background_image_path()
+        for file_path, pixbuf in results:
+            if pixbuf is None:
+                continue
+
+            if pixbuf.get_width() > style.XLARGE_ICON_SIZE or \
+                    pixbuf.get_height() > style.XLARGE_ICON_SIZE:
+                scale = min(
+                    style.XLARGE_ICON_SIZE / float(pixbuf.get_width()),
+                    style.XLARGE_ICON_SIZE / float(pixbuf.get_height()))
+                pixbuf = pixbuf.scale_simple(
+                    max(1, int(pixbuf.get_width() * scale)),
+                    max(1, int(pixbuf.get_height() * scale)),
+                    GdkPixbuf.InterpType.BILINEAR)
+
+            self._store.append([pixbuf, file_path])
+            self._paths_list.append(file_path)
+            if file_path == background:
+                self._select_background()
+
+    def __thumbnails_done_cb(self):
+        self._images_loaded = True
+        window = self.get_window()
+        if window is not None:
+            window.set_cursor(None)
+
+    def __destroy_cb(self, widget):
+        self._thumbnail_pool.stop()
 
     def __realize_cb(self, widget):
         if self._images_loaded:
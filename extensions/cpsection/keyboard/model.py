@@ -17,9 +17,16 @@
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 #
 
+import json
+import logging
+import os
+import tempfile
+
 from gi.repository import Xkl
 from gi.repository import Gio
 
+from sugar3 import env
+
 _GROUP_NAME = 'grp'  # The XKB name for group switch options
 
 _KEYBOARD_DIR = 'org.sugarlabs.peripherals.keyboard'
@@ -27,61 +34,150 @@ _LAYOUTS_KEY = 'layouts'
 _OPTIONS_KEY = 'options'
 _MODEL_KEY = 'model'
 
+_XKB_RULES_DIR = '/usr/share/X11/xkb/rules'
+_SNAPSHOT_FILE = 'keyboard-registry.json'
+_SNAPSHOT_VERSION = 1
+
+
+def _append_item(config_registry, item, items):
+    items.append([item.get_description(), item.get_name()])
+
+
+def _append_layout(config_registry, item, subitem, layouts):
+    layout = item.get_name()
+    if subitem:
+        description = '%s, %s' % (subitem.get_description(),
+                                  item.get_description())
+        variant = subitem.get_name()
+    else:
+        description = 'Default layout, %s' % item.get_description()
+        variant = ''
+    layouts.append([description, ('%s(%s)' % (layout, variant))])
+
+
+def _encode(value):
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    elif isinstance(value, list):
+        return [_encode(item) for item in value]
+    elif isinstance(value, dict):
+        return dict((_encode(key), _encode(item))
+                    for key, item in value.iteritems())
+    return value
+
+
+def get_snapshot_key(rules_dir=_XKB_RULES_DIR):
+    """Return what the registry snapshot depends on, or None
+
+    That is the XKB rules files, and the locale since the descriptions
+    are translated.
+    """
+    try:
+        names = sorted(os.listdir(rules_dir))
+    except OSError:
+        return None
+
+    rules = []
+    for name in names:
+        if name.endswith('.xml'):
+            stat = os.stat(os.path.join(rules_dir, name))
+            rules.append([name, stat.st_mtime, stat.st_size])
+    return {'version': _SNAPSHOT_VERSION,
+            'locale': os.environ.get('LANG', ''),
+            'rules': rules}
+
+
+def build_snapshot(config_registry):
+    """Read the models, languages, layouts and options of the registry"""
+    snapshot = {'models': [], 'languages': [], 'options': [], 'layouts': {}}
+    config_registry.foreach_model(_append_item, snapshot['models'])
+    config_registry.foreach_language(_append_item, snapshot['languages'])
+    config_registry.foreach_option(_GROUP_NAME, _append_item,
+                                   snapshot['options'])
+    for description_, language in snapshot['languages']:
+        layouts = []
+        config_registry.foreach_language_variant(language, _append_layout,
+                                                 layouts)
+        layouts.sort()
+        snapshot['layouts'][language] = layouts
+
+    for key in ['models', 'languages', 'options']:
+        snapshot[key].sort()
+    return snapshot
+
+
+def load_snapshot(path, key):
+    """Return the snapshot saved at path, or None if missing or outdated"""
+    try:
+        with open(path) as snapshot_file:
+            data = json.load(snapshot_file)
+    except (IOError, ValueError):
+        return None
+
+    if data.get('key') != key:
+        return None
+    return _encode(data['snapshot'])
+
+
+def save_snapshot(path, key, snapshot):
+    directory = os.path.dirname(path)
+    try:
+        fd, temp_path = tempfile.mkstemp(dir=directory)
+        with os.fdopen(fd, 'w') as snapshot_file:
+            json.dump({'key': key, 'snapshot': snapshot}, snapshot_file)
+        os.rename(temp_path, path)
+    except (IOError, OSError), e:
+        logging.error('Could not save the keyboard registry: %s', e)
+
 
 class KeyboardManager(object):
-    def __init__(self, display):
+    def __init__(self, display, rules_dir=_XKB_RULES_DIR,
+                 snapshot_path=None):
         self._engine = Xkl.Engine.get_instance(display)
-        self._configregistry = Xkl.ConfigRegistry.get_instance(self._engine)
-        self._configregistry.load(False)
         self._configrec = Xkl.ConfigRec()
         self._configrec.get_from_server(self._engine)
 
+        self._rules_dir = rules_dir
+        self._snapshot_path = snapshot_path or \
+            env.get_profile_path(_SNAPSHOT_FILE)
+        self._snapshot = None
+
         self._settings = Gio.Settings(_KEYBOARD_DIR)
 
-    def _populate_one(self, config_registry, item, store):
-        store.append([item.get_description(), item.get_name()])
+    def _get_snapshot(self):
+        # reading the registry means thousands of calls through
+        # introspection, do it only when the XKB rules changed
+        if self._snapshot is not None:
+            return self._snapshot
 
-    def _populate_two(self, config_registry, item, subitem, store):
-        layout = item.get_name()
-        if subitem:
-            description = '%s, %s' % (subitem.get_description(),
-                                      item.get_description())
-            variant = subitem.get_name()
-        else:
-            description = 'Default layout, %s' % item.get_description()
-            variant = ''
-        store.append([description, ('%s(%s)' % (layout, variant))])
+        key = get_snapshot_key(self._rules_dir)
+        if key is not None:
+            self._snapshot = load_snapshot(self._snapshot_path, key)
+
+        if self._snapshot is None:
+            configregistry = Xkl.ConfigRegistry.get_instance(self._engine)
+            configregistry.load(False)
+            self._snapshot = build_snapshot(configregistry)
+            if key is not None:
+                save_snapshot(self._snapshot_path, key, self._snapshot)
+
+        return self._snapshot
 
     def get_models(self):
         """Return list of supported keyboard models"""
-        models = []
-        self._configregistry.foreach_model(self._populate_one, models)
-        models.sort()
-        return models
+        return list(self._get_snapshot()['models'])
 
     def get_languages(self):
         """Return list of supported keyboard languages"""
-        languages = []
-        self._configregistry.foreach_language(self._populate_one, languages)
-        languages.sort()
-        return languages
+        return list(self._get_snapshot()['languages'])
 
     def get_layouts_for_language(self, language):
         """Return list of supported keyboard layouts for a given language"""
-        layouts = []
-        self._configregistry.foreach_language_variant(language,
-                                                      self._populate_two,
-                                                      layouts)
-        layouts.sort()
-        return layouts
+        return list(self._get_snapshot()['layouts'].get(language, []))
 
     def get_options_group(self):
         """Return list of supported options for switching keyboard group"""
-        options = []
-        self._configregistry.foreach_option(_GROUP_NAME, self._populate_one,
-                                            options)
-        options.sort()
-        return options
+        return list(self._get_snapshot()['options'])
 
     def get_current_model(self):
         """Return the enabled keyboard model"""
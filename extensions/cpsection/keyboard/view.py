@@ -67,6 +67,34 @@ def _build_ISO_639_dictionary():
         logging.error('%s not found' % (ISO_DATA_FILE))
 
 
+class _LayoutStores(object):
+    """ListStores of the keyboard languages and layouts, shared by all the
+    LayoutCombos and filled the first time they are needed
+    """
+
+    def __init__(self, keyboard_manager):
+        self._keyboard_manager = keyboard_manager
+        self._languages_store = None
+        self._layouts_stores = {}
+
+    def get_languages_store(self):
+        if self._languages_store is None:
+            self._languages_store = Gtk.ListStore(GObject.TYPE_STRING,
+                                                  GObject.TYPE_STRING)
+            for description, name in self._keyboard_manager.get_languages():
+                self._languages_store.append([name, description])
+        return self._languages_store
+
+    def get_layouts_store(self, lang):
+        if lang not in self._layouts_stores:
+            store = Gtk.ListStore(GObject.TYPE_STRING, GObject.TYPE_STRING)
+            layouts = self._keyboard_manager.get_layouts_for_language(lang)
+            for description, name in layouts:
+                store.append([name, description])
+            self._layouts_stores[lang] = store
+        return self._layouts_stores[lang]
+
+
 class LayoutCombo(Gtk.HBox):
     """
     Custom GTK widget with two comboboxes side by side, one for layout, and
@@ -78,9 +106,9 @@ class LayoutCombo(Gtk.HBox):
                               (GObject.TYPE_STRING, GObject.TYPE_INT)),
     }
 
-    def __init__(self, keyboard_manager, n):
+    def __init__(self, layout_stores, n):
         GObject.GObject.__init__(self)
-        self._keyboard_manager = keyboard_manager
+        self._layout_stores = layout_stores
         self._index = n
 
         self.set_border_width(style.DEFAULT_SPACING)
@@ -93,11 +121,7 @@ class LayoutCombo(Gtk.HBox):
         label.set_alignment(0.5, 0.5)
         self.pack_start(label, False, True, 0)
 
-        self._klang_store = Gtk.ListStore(GObject.TYPE_STRING,
-                                          GObject.TYPE_STRING)
-        for description, name in self._keyboard_manager.get_languages():
-            self._klang_store.append([name, description])
-
+        self._klang_store = layout_stores.get_languages_store()
         self._klang_combo = Gtk.ComboBox(model=self._klang_store)
         self._klang_combo_changed_id = \
             self._klang_combo.connect('changed', self._klang_combo_changed_cb)
@@ -164,11 +188,7 @@ class LayoutCombo(Gtk.HBox):
         return model.get(it, 0)[0]
 
     def _set_kvariant_store(self, lang):
-        self._kvariant_store = Gtk.ListStore(GObject.TYPE_STRING,
-                                             GObject.TYPE_STRING)
-        layouts = self._keyboard_manager.get_layouts_for_language(lang)
-        for description, name in layouts:
-            self._kvariant_store.append([name, description])
+        self._kvariant_store = self._layout_stores.get_layouts_store(lang)
         self._kvariant_combo.set_model(self._kvariant_store)
         self._kvariant_combo.set_active(0)
 
@@ -372,12 +392,13 @@ class Keyboard(SectionView):
         self._vbox.pack_start(label_klayout, False, True, 0)
 
         self._klayouts = self._keyboard_manager.get_current_layouts()
+        layout_stores = _LayoutStores(self._keyboard_manager)
         for i in range(0, self._keyboard_manager.get_max_layouts()):
             add_remove_box = self.__create_add_remove_box()
             self._layout_addremovebox_list.append(add_remove_box)
             self._layout_table.attach(add_remove_box, 1, 2, i, i + 1)
 
-            layout_combo = LayoutCombo(self._keyboard_manager, i)
+            layout_combo = LayoutCombo(layout_stores, i)
             layout_combo.connect('selection-changed',
                                  self.__layout_combo_selection_changed_cb)
             self._layout_combo_list.append(layout_combo)
@@ -16,38 +16,42 @@
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
 import os
+import logging
 import tempfile
 from gettext import gettext as _
+from threading import Thread, Lock
 import StringIO
 import cairo
 
 from gi.repository import Gdk
 from gi.repository import Gio
+from gi.repository import GLib
 import dbus
 
 from sugar3.datastore import datastore
 from sugar3.graphics import style
+from sugar3.graphics.icon import get_icon_file_name
 from sugar3 import env
 from jarabe.model import shell
+from jarabe.model import notifications
 
 BOUND_KEYS = ['<alt>1', 'Print']
 
+_queue = None
 
-def handle_key_press(key):
-    tmp_dir = os.path.join(env.get_profile_path(), 'data')
-    fd, file_path = tempfile.mkstemp(dir=tmp_dir)
-    os.close(fd)
 
+def handle_key_press(key):
+    # Only grabbing the pixels needs to happen right away, encoding and
+    # saving the screenshot is done by the save queue
     window = Gdk.get_default_root_window()
     width, height = window.get_width(), window.get_height()
 
-    screenshot_surface = Gdk.Window.create_similar_surface(
-        window, cairo.CONTENT_COLOR, width, height)
+    screenshot_surface = cairo.ImageSurface(cairo.FORMAT_RGB24, width, height)
 
     cr = cairo.Context(screenshot_surface)
     Gdk.cairo_set_source_window(cr, window, 0, 0)
     cr.paint()
-    screenshot_surface.write_to_png(file_path)
+    del cr
 
     settings = Gio.Settings('org.sugarlabs.user')
     color = settings.get_string('color')
@@ -75,19 +79,94 @@ def handle_key_press(key):
     else:
         title = _('Screenshot of \"%s\"') % content_title
 
-    jobject = datastore.create()
-    try:
+    _get_queue().enqueue(screenshot_surface, title, color)
+
+
+class _SaveQueue(object):
+    """Save screenshots to the datastore without blocking the shell
+
+    Screenshots are queued in the order they were taken. A single thread
+    encodes the PNG file and the preview of each one, then the main loop
+    writes the entry to the datastore asynchronously and notifies the user
+    when it is saved.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._queue = []
+        self._thread_running = False
+
+    def enqueue(self, surface, title, color):
+        task = (surface, title, color)
+        self._lock.acquire()
+        self._queue.append(task)
+        if not self._thread_running:
+            self._thread_running = True
+            Thread(target=self._thread_func).start()
+        self._lock.release()
+
+    def _thread_func(self):
+        while True:
+            self._lock.acquire()
+            if len(self._queue) == 0:
+                self._thread_running = False
+                self._lock.release()
+                return
+
+            task = self._queue.pop(0)
+            self._lock.release()
+
+            self._encode(*task)
+
+    def _encode(self, surface, title, color):
+        tmp_dir = os.path.join(env.get_profile_path(), 'data')
+        fd, file_path = tempfile.mkstemp(dir=tmp_dir)
+        os.close(fd)
+
+        try:
+            surface.write_to_png(file_path)
+            preview = _get_preview_data(surface)
+        except Exception:
+            logging.exception('Could not encode screenshot')
+            os.remove(file_path)
+            return
+
+        GLib.idle_add(self._write, file_path, preview, title, color)
+
+    def _write(self, file_path, preview, title, color):
+        jobject = datastore.create()
         jobject.metadata['title'] = title
         jobject.metadata['keep'] = '0'
         jobject.metadata['buddies'] = ''
-        jobject.metadata['preview'] = _get_preview_data(screenshot_surface)
+        jobject.metadata['preview'] = preview
         jobject.metadata['icon-color'] = color
         jobject.metadata['mime_type'] = 'image/png'
         jobject.file_path = file_path
-        datastore.write(jobject, transfer_ownership=True)
-    finally:
+        datastore.write(jobject, transfer_ownership=True,
+                        reply_handler=lambda *args:
+                        self.__write_reply_cb(jobject, title, color),
+                        error_handler=lambda error:
+                        self.__write_error_cb(jobject, error))
+        return False
+
+    def __write_reply_cb(self, jobject, title, color):
+        jobject.destroy()
+        hints = {'x-sugar-icon-file-name':
+                 get_icon_file_name('image-x-generic'),
+                 'x-sugar-icon-colors': color}
+        notifications.get_service().Notify('', 0, '', title, '', [], hints,
+                                           -1)
+
+    def __write_error_cb(self, jobject, error):
+        logging.error('Could not save screenshot: %s', error)
         jobject.destroy()
-        del jobject
+
+
+def _get_queue():
+    global _queue
+    if _queue is None:
+        _queue = _SaveQueue()
+    return _queue
 
 
 def _get_preview_data(screenshot_surface):
@@ -15,6 +15,7 @@
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
 import json
+import logging
 import os
 import struct
 import time
@@ -33,12 +34,225 @@ from jarabe.model import session
 from jarabe.journal.objectchooser import ObjectChooser
 
 
+_CHUNK_SIZE = 64 * 1024
+# data of a stream waiting to be written, a client sending more than this
+# faster than it can be written gets an error
+_MAX_QUEUED_SIZE = 16 * _CHUNK_SIZE
+_MAX_STREAMS = 255
+
+
 class StreamMonitor(object):
     def __init__(self):
         self.on_data = None
         self.on_close = None
 
 
+class StreamReader(object):
+    """Answer the read requests of a stream with asynchronous file reads
+
+    Requests are served in order, the file is read in chunks of at most
+    _CHUNK_SIZE bytes and the next chunk is only read once the previous
+    one has arrived, so a large request never blocks the main loop.
+    """
+
+    def __init__(self, send_data):
+        self._send_data = send_data
+        self._stream = None
+        self._failed = False
+        self._closed = False
+        self._requests = []
+        self._data = []
+        self._remaining = 0
+        self._reading = False
+
+    def open(self, file_name):
+        Gio.File.new_for_path(file_name).read_async(
+            GLib.PRIORITY_DEFAULT, None, self.__read_async_cb, None)
+
+    def __read_async_cb(self, gfile, result, user_data):
+        try:
+            self._stream = gfile.read_finish(result)
+        except GLib.GError, e:
+            logging.error('Could not open %s: %s', gfile.get_path(), e)
+            self._failed = True
+
+        if self._closed:
+            self._close_stream()
+        else:
+            self._read_next()
+
+    def read(self, size):
+        self._requests.append(size)
+        self._read_next()
+
+    def close(self):
+        self._closed = True
+        if not self._reading:
+            self._close_stream()
+
+    def _close_stream(self):
+        if self._stream is not None:
+            self._stream.close_async(GLib.PRIORITY_DEFAULT, None,
+                                     self.__close_async_cb, None)
+            self._stream = None
+
+    def __close_async_cb(self, stream, result, user_data):
+        try:
+            stream.close_finish(result)
+        except GLib.GError, e:
+            logging.error('Could not close stream: %s', e)
+
+    def _read_next(self):
+        if self._reading or self._closed or not self._requests:
+            return
+
+        if self._failed:
+            # Answer with no data, as when reading past the end of the file
+            while self._requests:
+                self._requests.pop(0)
+                self._send_data('')
+            return
+
+        if self._stream is None:
+            return
+
+        self._remaining = self._requests[0]
+        self._data = []
+        self._reading = True
+        self._read_chunk()
+
+    def _read_chunk(self):
+        self._stream.read_bytes_async(min(self._remaining, _CHUNK_SIZE),
+                                      GLib.PRIORITY_DEFAULT, None,
+                                      self.__read_bytes_cb, None)
+
+    def __read_bytes_cb(self, stream, result, user_data):
+        try:
+            data = stream.read_bytes_finish(result).get_data() or ''
+        except GLib.GError, e:
+            logging.error('Could not read stream: %s', e)
+            data = ''
+
+        if data:
+            self._data.append(data)
+            self._remaining -= len(data)
+            if self._remaining > 0 and not self._closed:
+                self._read_chunk()
+                return
+
+        self._reading = False
+        self._requests.pop(0)
+        if self._closed:
+            self._close_stream()
+            return
+
+        self._send_data(''.join(self._data))
+        self._data = []
+        self._read_next()
+
+
+class StreamWriter(object):
+    """Write the data received on a stream asynchronously to a file
+
+    Only one write is in flight at any time, data arriving meanwhile is
+    queued and written in order. The stream fails when more than
+    max_queued_size bytes are waiting to be written.
+    """
+
+    def __init__(self, file_path, max_queued_size=_MAX_QUEUED_SIZE):
+        self._stream = None
+        self._error = None
+        self._queue = []
+        self._queued_size = 0
+        self._max_queued_size = max_queued_size
+        self._writing = True
+        self._close_cb = None
+
+        Gio.File.new_for_path(file_path).replace_async(
+            None, False, Gio.FileCreateFlags.NONE, GLib.PRIORITY_DEFAULT,
+            None, self.__replace_async_cb, None)
+
+    def __replace_async_cb(self, gfile, result, user_data):
+        try:
+            self._stream = gfile.replace_finish(result)
+        except GLib.GError, e:
+            logging.error('Could not create %s: %s', gfile.get_path(), e)
+            self._error = e
+
+        self._writing = False
+        self._write_next()
+
+    def write(self, data):
+        if self._error is not None:
+            return
+
+        if self._queued_size + len(data) > self._max_queued_size:
+            logging.error('Stream data arrives faster than it is written')
+            self._error = IOError('Too much data waiting to be written')
+            self._queue = []
+            self._queued_size = 0
+            return
+
+        self._queue.append(data)
+        self._queued_size += len(data)
+        self._write_next()
+
+    def close(self, callback):
+        """Close the file once all the data is written
+
+        callback is called with the error that occurred, or None.
+        """
+        self._close_cb = callback
+        self._write_next()
+
+    def _write_next(self):
+        if self._writing:
+            return
+
+        if self._error is None and self._queue:
+            data = self._queue.pop(0)
+            self._queued_size -= len(data)
+            self._writing = True
+            self._stream.write_bytes_async(GLib.Bytes.new(data),
+                                           GLib.PRIORITY_DEFAULT, None,
+                                           self.__write_bytes_cb, data)
+        elif self._close_cb is not None:
+            if self._stream is None:
+                self._close_cb(self._error)
+                return
+
+            self._writing = True
+            self._stream.close_async(GLib.PRIORITY_DEFAULT, None,
+                                     self.__close_async_cb, None)
+
+    def __write_bytes_cb(self, stream, result, data):
+        try:
+            written = stream.write_bytes_finish(result)
+        except GLib.GError, e:
+            logging.error('Could not write stream: %s', e)
+            self._error = e
+            self._queue = []
+            self._queued_size = 0
+        else:
+            if written < len(data):
+                self._queue.insert(0, data[written:])
+                self._queued_size += len(data) - written
+
+        self._writing = False
+        self._write_next()
+
+    def __close_async_cb(self, stream, result, user_data):
+        try:
+            stream.close_finish(result)
+        except GLib.GError, e:
+            logging.error('Could not close stream: %s', e)
+            if self._error is None:
+                self._error = e
+
+        self._stream = None
+        self._close_cb(self._error)
+
+
 class API(object):
     def __init__(self, client):
         self._client = client
@@ -112,14 +326,11 @@ class DatastoreAPI(API):
         self._data_store = dbus.Interface(bus_object,
                                           "org.laptop.sugar.DataStore")
 
-    def _create_file(self):
+    def _get_file_path(self):
         activity_root = env.get_profile_path(self._activity.get_type())
         instance_path = os.path.join(activity_root, "instance")
 
-        file_path = os.path.join(instance_path, "%i" % time.time())
-        file_object = open(file_path, "w")
-
-        return file_path, file_object
+        return os.path.join(instance_path, "%i" % time.time())
 
     def get_metadata(self, request):
         def get_properties_reply_handler(properties):
@@ -133,6 +344,59 @@ class DatastoreAPI(API):
             reply_handler=get_properties_reply_handler,
             error_handler=error_handler)
 
+    def get_metadata_many(self, request):
+        """Get the metadata of several entries with a single query
+
+        The result holds the metadata of each entry in the order of the
+        requested uids, or None for entries that do not exist. Only the
+        requested properties are returned, all of them if none is given.
+        """
+        def find_reply_handler(entries, count):
+            metadata_by_uid = {}
+            for entry in entries:
+                if properties and "uid" not in properties:
+                    entry_uid = entry.pop("uid")
+                else:
+                    entry_uid = entry["uid"]
+                metadata_by_uid[entry_uid] = entry
+
+            self._client.send_result(
+                request, [[metadata_by_uid.get(uid) for uid in uids]])
+
+        def error_handler(error):
+            self._client.send_error(request, error)
+
+        uids, properties = request["params"]
+        if not uids:
+            self._client.send_result(request, [[]])
+            return
+
+        query_properties = list(properties)
+        if query_properties and "uid" not in query_properties:
+            query_properties.append("uid")
+
+        self._data_store.find({"uid": uids, "limit": len(uids)},
+                              query_properties, byte_arrays=True,
+                              reply_handler=find_reply_handler,
+                              error_handler=error_handler)
+
+    def find(self, request):
+        def find_reply_handler(entries, count):
+            self._client.send_result(request, [entries, count])
+
+        def error_handler(error):
+            self._client.send_error(request, error)
+
+        query, properties, offset, limit = request["params"]
+
+        query = dict(query)
+        query["offset"] = offset
+        query["limit"] = limit
+
+        self._data_store.find(query, properties, byte_arrays=True,
+                              reply_handler=find_reply_handler,
+                              error_handler=error_handler)
+
     def set_metadata(self, request):
         def reply_handler():
             self._client.send_result(request, [])
@@ -148,14 +412,7 @@ class DatastoreAPI(API):
 
     def load(self, request):
         def get_filename_reply_handler(file_name):
-            file_object = open(file_name)
-            info["file_object"] = file_object
-
-            if "requested_size" in info:
-                send_binary(file_object.read(info["requested_size"]))
-
-            if "stream_closed" in info:
-                info["file_object"].close()
+            reader.open(file_name)
 
         def get_properties_reply_handler(properties):
             self._client.send_result(request, [properties])
@@ -167,24 +424,16 @@ class DatastoreAPI(API):
             self._client.send_binary(chr(stream_id) + data)
 
         def on_data(data):
-            size = struct.unpack("ii", data)[1]
-            if "file_object" in info:
-                send_binary(info["file_object"].read(size))
-            else:
-                info["requested_size"] = size
+            reader.read(struct.unpack("ii", data)[1])
 
         def on_close(close_request):
-            if "file_object" in info:
-                info["file_object"].close()
-            else:
-                info["stream_closed"] = True
-
+            reader.close()
             self._client.send_result(close_request, [])
 
-        info = {}
-
         uid, stream_id = request["params"]
 
+        reader = StreamReader(send_binary)
+
         self._data_store.get_filename(
             uid,
             reply_handler=get_filename_reply_handler,
@@ -207,12 +456,17 @@ class DatastoreAPI(API):
             self._client.send_error(info["close_request"], error)
 
         def on_data(data):
-            file_object.write(data[1:])
+            writer.write(data[1:])
 
         def on_close(close_request):
-            file_object.close()
-
             info["close_request"] = close_request
+            writer.close(writer_closed_cb)
+
+        def writer_closed_cb(error):
+            if error is not None:
+                self._client.send_error(info["close_request"], str(error))
+                return
+
             self._data_store.update(uid, metadata, file_path, True,
                                     reply_handler=reply_handler,
                                     error_handler=error_handler)
@@ -221,7 +475,8 @@ class DatastoreAPI(API):
 
         uid, metadata, stream_id = request["params"]
 
-        file_path, file_object = self._create_file()
+        file_path = self._get_file_path()
+        writer = StreamWriter(file_path)
 
         stream_monitor = self._client.stream_monitors[stream_id]
         stream_monitor.on_data = on_data
@@ -247,6 +502,8 @@ class APIClient(object):
 
         self.activity_id = None
         self.stream_monitors = {}
+        self.free_stream_ids = range(_MAX_STREAMS - 1, -1, -1)
+        self.apis = {}
 
     def send_result(self, request, result):
         response = {"result": result,
@@ -293,10 +550,12 @@ class APIServer(object):
         os.environ["SUGAR_APISOCKET_KEY"] = self._key
 
     def _open_stream(self, client, request):
-        for stream_id in xrange(0, 255):
-            if stream_id not in client.stream_monitors:
-                client.stream_monitors[stream_id] = StreamMonitor()
-                break
+        if not client.free_stream_ids:
+            client.send_error(request, "Too many open streams")
+            return
+
+        stream_id = client.free_stream_ids.pop()
+        client.stream_monitors[stream_id] = StreamMonitor()
 
         client.send_result(request, [stream_id])
 
@@ -307,6 +566,7 @@ class APIServer(object):
             stream_monitor.on_close(request)
 
         del client.stream_monitors[stream_id]
+        client.free_stream_ids.append(stream_id)
 
     def _session_started_cb(self, server, session):
         session.connect("message-received",
@@ -337,7 +597,11 @@ class APIServer(object):
             self._close_stream(client, request)
         else:
             api_name, method_name = request["method"].split(".")
-            getattr(self._apis[api_name](client), method_name)(request)
+            api = client.apis.get(api_name)
+            if api is None:
+                api = self._apis[api_name](client)
+                client.apis[api_name] = api
+            getattr(api, method_name)(request)
 
 
 def start():
@@ -41,6 +41,7 @@ from jarabe.model import desktop
 from jarabe.view.palettes import ActivityPalette
 from jarabe.journal import misc
 from jarabe.util.normalize import normalize_string
+from jarabe.util.normalize import SearchIndex
 
 
 class ActivitiesTreeView(Gtk.TreeView):
@@ -55,6 +56,7 @@ class ActivitiesTreeView(Gtk.TreeView):
         Gtk.TreeView.__init__(self)
 
         self._query = ''
+        self._matches = None
 
         self.set_headers_visible(False)
         self.add_events(Gdk.EventMask.BUTTON_PRESS_MASK |
@@ -172,14 +174,17 @@ class ActivitiesTreeView(Gtk.TreeView):
 
         """
         self._query = normalize_string(query.decode('utf-8'))
+        self._matches = self._model.match(self._query)
         self.get_model().refilter()
         matches = self.get_model().iter_n_children(None)
         return matches
 
     def __model_visible_cb(self, model, tree_iter, data):
-        title = model[tree_iter][self._model.column_title]
-        title = normalize_string(title.decode('utf-8'))
-        return title is not None and title.find(self._query) > -1
+        if self._matches is None:
+            return True
+        row = model[tree_iter]
+        return (row[self._model.column_bundle_id],
+                row[self._model.column_version]) in self._matches
 
     def do_row_activated(self, path, column):
         if column == self._icon_column:
@@ -205,6 +210,8 @@ class ListModel(Gtk.TreeModelSort):
         for i in range(desktop.get_number_of_views()):
             column_types.insert(1, bool)
 
+        self._search_index = SearchIndex()
+
         self._model = Gtk.ListStore()
         self._model.set_column_types(column_types)
         self._model_filter = self._model.filter_new()
@@ -234,6 +241,8 @@ class ListModel(Gtk.TreeModelSort):
         for row in self._model:
             if row[self.column_bundle_id] == bundle_id and \
                     row[self.column_version] == version:
+                self._search_index.add((bundle_id, version),
+                                       self._get_search_text(activity_info))
                 for i in range(desktop.get_number_of_views()):
                     row[self.column_favorites[i]] = favorites[i]
                 return
@@ -244,6 +253,7 @@ class ListModel(Gtk.TreeModelSort):
         for row in self._model:
             if row[self.column_bundle_id] == bundle_id and \
                     row[self.column_version] == version:
+                self._search_index.remove((bundle_id, version))
                 self._model.remove(row.iter)
                 return
 
@@ -274,6 +284,9 @@ class ListModel(Gtk.TreeModelSort):
                     '<span style="italic" weight="light">%s</span>' % \
                 (activity_info.get_name(), tags)
 
+        self._search_index.add((activity_info.get_bundle_id(), version),
+                               self._get_search_text(activity_info))
+
         model_list = [activity_info.get_bundle_id()]
         for i in range(desktop.get_number_of_views()):
             model_list.append(favorites[i])
@@ -285,6 +298,15 @@ class ListModel(Gtk.TreeModelSort):
         model_list.append(util.timestamp_to_elapsed_string(timestamp))
         self._model.append(model_list)
 
+    def _get_search_text(self, activity_info):
+        tag_list = activity_info.get_tags()
+        if not tag_list:
+            return activity_info.get_name()
+        return '%s\n%s' % (activity_info.get_name(), ', '.join(tag_list))
+
+    def match(self, query):
+        return self._search_index.match(query)
+
     def set_visible_func(self, func):
         self._model_filter.set_visible_func(func)
 
@@ -298,6 +298,12 @@ class RingLayout(ViewLayout):
     def __init__(self):
         ViewLayout.__init__(self)
         self._spiral_mode = False
+        self._allocations_key = None
+        self._allocations = []
+
+    def remove(self, child):
+        self._allocations_key = None
+        self._allocations = []
 
     def _calculate_radius_and_icon_size(self, children_count):
         """ Adjust the ring or spiral radius and icon size as needed. """
@@ -382,10 +388,23 @@ class RingLayout(ViewLayout):
         return angle, radius
 
     def allocate_children(self, allocation, children):
+        key = (allocation.x, allocation.y, allocation.width,
+               allocation.height, tuple(children))
+        if key != self._allocations_key:
+            self._allocations = self._calculate_allocations(allocation,
+                                                            children)
+            self._allocations_key = key
+
+        for child, child_allocation in self._allocations:
+            child.size_allocate(child_allocation)
+
+    def _calculate_allocations(self, allocation, children):
+        """ Position the children, hiding the ones that end up off-screen. """
         radius, icon_size = self._calculate_radius_and_icon_size(len(children))
 
-        children.sort(self.compare_activities)
+        children = sorted(children, key=self._get_sort_key)
         height = allocation.height + allocation.y
+        allocations = []
         for n in range(len(children)):
             child = children[n]
 
@@ -409,10 +428,15 @@ class RingLayout(ViewLayout):
             child_allocation.y = allocation.y + y
             child_allocation.width = new_width
             child_allocation.height = new_height
-            child.size_allocate(child_allocation)
 
-    def compare_activities(self, icon_a, icon_b):
-        return cmp(icon_a.get_activity_name(), icon_b.get_activity_name())
+            on_screen = Gdk.rectangle_intersect(allocation,
+                                                child_allocation)[0]
+            child.set_child_visible(on_screen)
+            allocations.append((child, child_allocation))
+        return allocations
+
+    def _get_sort_key(self, icon):
+        return icon.get_activity_name()
 
 
 _SUNFLOWER_CONSTANT = style.STANDARD_ICON_SIZE * .75
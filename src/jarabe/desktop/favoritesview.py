@@ -54,7 +54,7 @@ from jarabe.desktop import schoolserver
 from jarabe.desktop.schoolserver import RegisterError
 from jarabe.desktop import favoriteslayout
 from jarabe.desktop.viewcontainer import ViewContainer
-from jarabe.util.normalize import normalize_string
+from jarabe.util.normalize import SearchIndex
 
 _logger = logging.getLogger('FavoritesView')
 
@@ -72,6 +72,7 @@ LAYOUT_MAP = {favoriteslayout.RingLayout.key: favoriteslayout.RingLayout,
 about the layout can be accessed with fields of the class."""
 
 _favorites_settings = None
+_resume_entries = None
 
 
 class FavoritesBox(Gtk.VBox):
@@ -150,6 +151,7 @@ class FavoritesView(ViewContainer):
 
         self._alert = None
         self._resume_mode = True
+        self._search_index = SearchIndex()
 
         GLib.idle_add(self.__connect_to_bundle_registry_cb)
 
@@ -210,6 +212,10 @@ class FavoritesView(ViewContainer):
             child.set_parent_window(self.get_parent_window())
         child.set_parent(self)
 
+    def do_remove(self, child):
+        self._search_index.remove(child)
+        ViewContainer.do_remove(self, child)
+
     def __button_release_cb(self, widget, event):
         if self._dragging:
             return True
@@ -310,6 +316,7 @@ class FavoritesView(ViewContainer):
         if activity_info.get_bundle_id() == 'org.laptop.JournalActivity':
             return
         icon = ActivityIcon(activity_info)
+        self._search_index.add(icon, icon.get_activity_name())
         icon.props.pixel_size = style.STANDARD_ICON_SIZE
         # icon.set_resume_mode(self._resume_mode)
         self.add(icon)
@@ -350,24 +357,20 @@ class FavoritesView(ViewContainer):
             self._add_activity(activity_info)
 
     def set_filter(self, query):
-        query = query.strip()
+        matches = self._search_index.match(query.strip())
         for icon in self.get_children():
             if icon not in [self._owner_icon, self._activity_icon]:
-                activity_name = icon.get_activity_name().decode('utf-8')
-                normalized_name = normalize_string(activity_name)
-                if normalized_name.find(query) > -1:
+                if icon in matches:
                     icon.alpha = 1.0
                 else:
                     icon.alpha = 0.33
 
     def _get_selected(self, query):
-        query = query.strip()
+        matches = self._search_index.match(query.strip())
         selected = []
         for icon in self.get_children():
             if icon not in [self._owner_icon, self._activity_icon]:
-                activity_name = icon.get_activity_name().decode('utf-8')
-                normalized_name = normalize_string(activity_name)
-                if normalized_name.find(query) > -1:
+                if icon in matches:
                     selected.append(icon)
         return selected
 
@@ -404,63 +407,31 @@ class ActivityIcon(CanvasIcon):
     __gtype_name__ = 'SugarFavoriteActivityIcon'
 
     _BORDER_WIDTH = style.zoom(9)
-    _MAX_RESUME_ENTRIES = 5
 
     def __init__(self, activity_info):
         CanvasIcon.__init__(self, cache=True,
                             file_name=activity_info.get_icon())
 
         self._activity_info = activity_info
-        self._journal_entries = []
         self._resume_mode = True
 
         self.connect_after('button-release-event',
                            self.__button_release_event_cb)
+        self.connect('destroy', self.__destroy_cb)
 
-        datastore.updated.connect(self.__datastore_listener_updated_cb)
-        datastore.deleted.connect(self.__datastore_listener_deleted_cb)
+        resume_entries = get_resume_entries()
+        self._journal_entries = resume_entries.get_entries(self.bundle_id)
+        resume_entries.add_listener(self.bundle_id, self.__entries_changed_cb)
 
-        self._refresh()
         self._update()
 
-    def _refresh(self):
-        bundle_id = self._activity_info.get_bundle_id()
-        properties = ['uid', 'title', 'icon-color', 'activity', 'activity_id',
-                      'mime_type', 'mountpoint']
-        self._get_last_activity_async(bundle_id, properties)
-
-    def __datastore_listener_updated_cb(self, **kwargs):
-        bundle_id = self._activity_info.get_bundle_id()
-        if kwargs['metadata'].get('activity', '') == bundle_id:
-            self._refresh()
-
-    def __datastore_listener_deleted_cb(self, **kwargs):
-        for entry in self._journal_entries:
-            if entry['uid'] == kwargs['object_id']:
-                self._refresh()
-                break
-
-    def _get_last_activity_async(self, bundle_id, properties):
-        query = {'activity': bundle_id}
-        datastore.find(query, sorting=['+timestamp'],
-                       limit=self._MAX_RESUME_ENTRIES,
-                       properties=properties,
-                       reply_handler=self.__get_last_activity_reply_handler_cb,
-                       error_handler=self.__get_last_activity_error_handler_cb)
-
-    def __get_last_activity_reply_handler_cb(self, entries, total_count):
-        # If there's a problem with the DS index, we may get entries not
-        # related to this activity.
-        checked_entries = []
-        for entry in entries:
-            if entry['activity'] == self.bundle_id:
-                checked_entries.append(entry)
-
-        self._journal_entries = checked_entries
+    def __entries_changed_cb(self, entries):
+        self._journal_entries = entries
         self._update()
 
-    def __get_last_activity_error_handler_cb(self, error):
-        logging.error('Error retrieving most recent activities: %r', error)
+    def __destroy_cb(self, icon):
+        get_resume_entries().remove_listener(self.bundle_id,
+                                             self.__entries_changed_cb)
 
     def _update(self):
         self.palette = None
@@ -539,6 +510,123 @@ class ActivityIcon(CanvasIcon):
         self._update()
 
 
+class ResumeEntries(object):
+    """Most recent journal entries of the favorite activities
+
+    Entries are fetched for all the bundles that have listeners with a
+    single grouped datastore query. After that, a change in the datastore
+    only triggers a query for the bundle it affects, and only the listeners
+    of that bundle are notified.
+    """
+
+    _MAX_RESUME_ENTRIES = 5
+    _PROPERTIES = ['uid', 'title', 'icon-color', 'activity', 'activity_id',
+                   'mime_type', 'mountpoint']
+
+    def __init__(self):
+        self._entries = {}
+        self._listeners = {}
+        self._uids = {}
+        self._pending = set()
+        self._refresh_sid = None
+
+        datastore.updated.connect(self.__datastore_updated_cb)
+        datastore.deleted.connect(self.__datastore_deleted_cb)
+
+    def get_entries(self, bundle_id):
+        return self._entries.get(bundle_id, [])
+
+    def add_listener(self, bundle_id, callback):
+        if bundle_id not in self._listeners:
+            self._listeners[bundle_id] = []
+            self._queue_refresh(bundle_id)
+        self._listeners[bundle_id].append(callback)
+
+    def remove_listener(self, bundle_id, callback):
+        listeners = self._listeners.get(bundle_id, [])
+        if callback in listeners:
+            listeners.remove(callback)
+        if not listeners:
+            self._listeners.pop(bundle_id, None)
+            self._pending.discard(bundle_id)
+            self._set_entries(bundle_id, [])
+
+    def __datastore_updated_cb(self, **kwargs):
+        bundle_id = kwargs['metadata'].get('activity', '')
+        if bundle_id in self._listeners:
+            self._queue_refresh(bundle_id)
+
+    def __datastore_deleted_cb(self, **kwargs):
+        bundle_id = self._uids.get(kwargs['object_id'])
+        if bundle_id is not None:
+            self._queue_refresh(bundle_id)
+
+    def _queue_refresh(self, bundle_id):
+        self._pending.add(bundle_id)
+        if self._refresh_sid is None:
+            self._refresh_sid = GLib.idle_add(self.__refresh_cb)
+
+    def __refresh_cb(self):
+        self._refresh_sid = None
+        bundle_ids = list(self._pending)
+        self._pending.clear()
+        if not bundle_ids:
+            return False
+
+        if len(bundle_ids) == 1:
+            query = {'activity': bundle_ids[0]}
+        else:
+            query = {'activity': bundle_ids}
+        limit = self._MAX_RESUME_ENTRIES * len(bundle_ids)
+
+        def reply_handler(entries, total_count):
+            self.__find_reply_cb(bundle_ids, limit, entries, total_count)
+
+        datastore.find(query, sorting=['+timestamp'], limit=limit,
+                       properties=self._PROPERTIES,
+                       reply_handler=reply_handler,
+                       error_handler=self.__find_error_cb)
+        return False
+
+    def __find_reply_cb(self, bundle_ids, limit, entries, total_count):
+        grouped = dict([(bundle_id, []) for bundle_id in bundle_ids])
+        # If there's a problem with the DS index, we may get entries not
+        # related to the requested activities.
+        for entry in entries:
+            bundle_entries = grouped.get(entry['activity'])
+            if bundle_entries is not None and \
+                    len(bundle_entries) < self._MAX_RESUME_ENTRIES:
+                bundle_entries.append(entry)
+
+        for bundle_id, bundle_entries in grouped.iteritems():
+            if bundle_id not in self._listeners:
+                continue
+            if len(bundle_ids) > 1 and total_count > limit and \
+                    len(bundle_entries) < self._MAX_RESUME_ENTRIES:
+                # The grouped result was truncated, entries of this bundle
+                # could be missing, query it on its own and keep the
+                # current entries until then
+                self._queue_refresh(bundle_id)
+                continue
+            self._set_entries(bundle_id, bundle_entries)
+
+    def __find_error_cb(self, error):
+        logging.error('Error retrieving most recent activities: %r', error)
+
+    def _set_entries(self, bundle_id, entries):
+        for entry in self._entries.get(bundle_id, []):
+            self._uids.pop(entry['uid'], None)
+        for entry in entries:
+            self._uids[entry['uid']] = bundle_id
+
+        self._entries[bundle_id] = entries
+        if not entries and bundle_id not in self._listeners:
+            del self._entries[bundle_id]
+
+        for callback in self._listeners.get(bundle_id, [])[:]:
+            callback(entries)
+
+
 class FavoritePalette(ActivityPalette):
     __gtype_name__ = 'SugarFavoritePalette'
 
@@ -753,3 +841,11 @@ def get_settings(favorite_view=0):
             _favorites_settings.append(
                 FavoritesSetting(len(_favorites_settings)))
     return _favorites_settings[favorite_view]
+
+
+def get_resume_entries():
+    global _resume_entries
+
+    if _resume_entries is None:
+        _resume_entries = ResumeEntries()
+    return _resume_entries
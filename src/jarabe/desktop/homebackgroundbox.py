@@ -17,17 +17,23 @@
 
 import os
 import logging
+from threading import Thread
 
+import cairo
 from gi.repository import Gtk
 from gi.repository import Gdk
 from gi.repository import GdkPixbuf
 from gi.repository import Gio
+from gi.repository import GLib
 
 BACKGROUND_DIR = 'org.sugarlabs.user.background'
 BACKGROUND_IMAGE_PATH_KEY = 'image-path'
 BACKGROUND_ALPHA_LEVEL_KEY = 'alpha-level'
 DEFAULT_BACKGROUND_ALPHA_LEVEL = 0.20
 
+# one per orientation of the screen
+_MAX_SURFACES = 2
+
 
 def get_background_image_path():
     settings = Gio.Settings(BACKGROUND_DIR)
@@ -55,45 +61,102 @@ def get_background_alpha_level():
 
 
 class HomeBackgroundBox(Gtk.VBox):
+    """Paint the background image of the home views
+
+    The image is decoded once, in a thread, at most at the size of the
+    screen. What gets painted is a surface scaled from it to the size of
+    the box, with the alpha level already applied. Surfaces are cached by
+    size and dropped when the image or the alpha level change.
+    """
+
     def __init__(self):
         Gtk.VBox.__init__(self)
         self._background_pixbuf = None
-        self._update_background_image()
-        self.connect('draw', self.__draw_cb)
+        self._surfaces = {}
+        self._load_id = 0
 
         self._settings = Gio.Settings(BACKGROUND_DIR)
+        self._alpha = get_background_alpha_level()
+        self._update_background_image()
         self._settings.connect('changed', self.__conf_changed_cb, None)
 
+        self.connect('draw', self.__draw_cb)
+
     def __draw_cb(self, widget, context):
         if self._background_pixbuf is None:
             return
 
         alloc = widget.get_allocation()
-
-        if self._background_pixbuf.get_width() != alloc.width or \
-                self._background_pixbuf.get_height() != alloc.height:
-            self._background_pixbuf = self._background_pixbuf.scale_simple(
-                alloc.width,
-                alloc.height,
-                GdkPixbuf.InterpType.TILES)
-        Gdk.cairo_set_source_pixbuf(context, self._background_pixbuf, 0, 0)
-        alpha = get_background_alpha_level()
-        context.paint_with_alpha(alpha)
+        size = (alloc.width, alloc.height)
+        surface = self._surfaces.get(size)
+        if surface is None:
+            if len(self._surfaces) >= _MAX_SURFACES:
+                self._surfaces.clear()
+            surface = self._create_surface(alloc.width, alloc.height)
+            self._surfaces[size] = surface
+
+        context.set_source_surface(surface, 0, 0)
+        context.paint()
+
+    def _create_surface(self, width, height):
+        # always scale from the decoded image, so resizes don't add up
+        pixbuf = self._background_pixbuf
+        if pixbuf.get_width() != width or pixbuf.get_height() != height:
+            pixbuf = pixbuf.scale_simple(width, height,
+                                         GdkPixbuf.InterpType.TILES)
+
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
+        context = cairo.Context(surface)
+        Gdk.cairo_set_source_pixbuf(context, pixbuf, 0, 0)
+        context.paint_with_alpha(self._alpha)
+        return surface
 
     def __conf_changed_cb(self, settings, key, data):
-        self._update_background_image()
-        self.queue_draw()
+        if key == BACKGROUND_ALPHA_LEVEL_KEY:
+            self._alpha = get_background_alpha_level()
+            self._surfaces.clear()
+            self.queue_draw()
+        elif key == BACKGROUND_IMAGE_PATH_KEY:
+            self._update_background_image()
 
     def _update_background_image(self, *args):
         background_image_path = get_background_image_path()
 
-        if background_image_path == '':
-            self._background_pixbuf = None
-        elif os.path.exists(background_image_path):
-            try:
-                self._background_pixbuf = GdkPixbuf.Pixbuf.new_from_file(
-                    background_image_path)
-            except Exception as e:
-                logging.exception('Failed to update background image %s: %s' %
-                                 (background_image_path, str(e)))
-                self._background_pixbuf = None
+        # results of loads that are still running are ignored
+        self._load_id += 1
+        if background_image_path == '' or \
+                not os.path.exists(background_image_path):
+            self._set_background_pixbuf(self._load_id, None)
+            return
+
+        screen = Gdk.Screen.get_default()
+        thread = Thread(target=self._load_pixbuf,
+                        args=(self._load_id, background_image_path,
+                              screen.get_width(), screen.get_height()))
+        thread.daemon = True
+        thread.start()
+
+    def _load_pixbuf(self, load_id, path, max_width, max_height):
+        try:
+            image_format, width, height = \
+                GdkPixbuf.Pixbuf.get_file_info(path)
+            if image_format is not None and \
+                    (width > max_width or height > max_height):
+                # no need to keep more pixels than the screen can show
+                pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_size(
+                    path, max_width, max_height)
+            else:
+                pixbuf = GdkPixbuf.Pixbuf.new_from_file(path)
+        except Exception as e:
+            logging.exception('Failed to update background image %s: %s' %
+                              (path, str(e)))
+            pixbuf = None
+
+        GLib.idle_add(self._set_background_pixbuf, load_id, pixbuf)
+
+    def _set_background_pixbuf(self, load_id, pixbuf):
+        if load_id == self._load_id:
+            self._background_pixbuf = pixbuf
+            self._surfaces.clear()
+            self.queue_draw()
+        return False
@@ -50,6 +50,50 @@ from jarabe.journal import misc
 
 
 _FILTERED_ALPHA = 0.33
+_UPDATE_INTERVAL = 1000 / 60
+
+
+class _UpdateQueue(object):
+    """Coalesce model changes and apply them at most once per frame
+
+    Changes are recorded per key, only the latest model for every key is
+    kept, so an item that is added and removed between two frames costs
+    nothing. The callback gets the pending changes as a dictionary mapping
+    each key to its latest model and is not invoked while the queue is
+    frozen.
+    """
+
+    def __init__(self, callback):
+        self._callback = callback
+        self._pending = {}
+        self._frozen = True
+        self._sid = None
+
+    def queue(self, key, model):
+        self._pending[key] = model
+        self._schedule()
+
+    def freeze(self):
+        self._frozen = True
+        if self._sid is not None:
+            GLib.source_remove(self._sid)
+            self._sid = None
+
+    def thaw(self):
+        self._frozen = False
+        self._schedule()
+
+    def _schedule(self):
+        if self._frozen or self._sid is not None or not self._pending:
+            return
+        self._sid = GLib.timeout_add(_UPDATE_INTERVAL, self.__flush_cb)
+
+    def __flush_cb(self):
+        self._sid = None
+        pending = self._pending
+        self._pending = {}
+        self._callback(pending)
+        return False
 
 
 class _ActivityIcon(CanvasIcon):
@@ -113,6 +157,8 @@ class ActivityView(SnowflakeLayout):
         self._model.connect('current-buddy-removed', self.__buddy_removed_cb)
 
         self._icons = {}
+        self._search_text = self._model.bundle.get_name().lower() + \
+            self._model.bundle.get_bundle_id().lower()
 
         self._icon = self._create_icon()
         self._icon.show()
@@ -130,6 +176,9 @@ class ActivityView(SnowflakeLayout):
                              size=style.STANDARD_ICON_SIZE)
         return icon
 
+    def get_model(self):
+        return self._model
+
     def has_buddy_icon(self, key):
         return key in self._icons
 
@@ -149,10 +198,8 @@ class ActivityView(SnowflakeLayout):
         icon.destroy()
 
     def set_filter(self, query):
-        text_to_check = self._model.bundle.get_name().lower() + \
-            self._model.bundle.get_bundle_id().lower()
         self._icon.props.xo_color = self._model.get_color()
-        if text_to_check.find(query) == -1:
+        if self._search_text.find(query) == -1:
             self._icon.alpha = _FILTERED_ALPHA
         else:
             self._icon.alpha = 1.0
@@ -372,18 +419,21 @@ class MeshBox(ViewContainer):
         self._suspended = True
         self._query = ''
 
+        self._buddy_updates = _UpdateQueue(self.__buddy_updates_cb)
+        self._activity_updates = _UpdateQueue(self.__activity_updates_cb)
+
         toolbar.connect('query-changed', self._toolbar_query_changed_cb)
         toolbar.search_entry.connect('icon-press',
                                      self.__clear_icon_pressed_cb)
 
         for buddy_model in self._model.get_buddies():
-            self._add_buddy(buddy_model)
+            self._buddy_added_cb(self._model, buddy_model)
 
         self._model.connect('buddy-added', self._buddy_added_cb)
         self._model.connect('buddy-removed', self._buddy_removed_cb)
 
         for activity_model in self._model.get_activities():
-            self._add_activity(activity_model)
+            self._activity_added_cb(self._model, activity_model)
 
         self._model.connect('activity-added', self._activity_added_cb)
         self._model.connect('activity-removed', self._activity_removed_cb)
@@ -392,24 +442,48 @@ class MeshBox(ViewContainer):
         netmgr_observer.listen()
 
     def _buddy_added_cb(self, model, buddy_model):
-        self._add_buddy(buddy_model)
+        buddy_model.connect('notify::current-activity',
+                            self.__buddy_notify_current_activity_cb)
+        self._buddy_updates.queue(buddy_model.props.key, buddy_model)
 
     def _buddy_removed_cb(self, model, buddy_model):
-        self._remove_buddy(buddy_model)
+        buddy_model.disconnect_by_func(
+            self.__buddy_notify_current_activity_cb)
+        self._buddy_updates.queue(buddy_model.props.key, None)
+
+    def __buddy_notify_current_activity_cb(self, buddy_model, pspec):
+        logging.debug('MeshBox.__buddy_notify_current_activity_cb %s',
+                      buddy_model.props.current_activity)
+        self._buddy_updates.queue(buddy_model.props.key, buddy_model)
 
     def _activity_added_cb(self, model, activity_model):
-        self._add_activity(activity_model)
+        self._activity_updates.queue(activity_model.activity_id,
+                                     activity_model)
 
     def _activity_removed_cb(self, model, activity_model):
-        self._remove_activity(activity_model)
+        self._activity_updates.queue(activity_model.activity_id, None)
+
+    def __buddy_updates_cb(self, updates):
+        for key, buddy_model in updates.iteritems():
+            visible = buddy_model is not None and \
+                buddy_model.props.current_activity is None and \
+                not buddy_model.is_owner()
+            if visible and key not in self._buddies:
+                self._add_buddy(buddy_model)
+            elif not visible and key in self._buddies:
+                self._remove_buddy(key)
+
+    def __activity_updates_cb(self, updates):
+        for activity_id, activity_model in updates.iteritems():
+            icon = self._activities.get(activity_id)
+            if icon is not None:
+                if icon.get_model() is activity_model:
+                    continue
+                self._remove_activity(activity_id)
+            if activity_model is not None:
+                self._add_activity(activity_model)
 
     def _add_buddy(self, buddy_model):
-        buddy_model.connect('notify::current-activity',
-                            self.__buddy_notify_current_activity_cb)
-        if buddy_model.props.current_activity is not None:
-            return
-        if buddy_model.is_owner():
-            return
         icon = BuddyIcon(buddy_model)
         self.add(icon)
         icon.show()
@@ -419,20 +493,10 @@ class MeshBox(ViewContainer):
 
         self._buddies[buddy_model.props.key] = icon
 
-    def _remove_buddy(self, buddy_model):
+    def _remove_buddy(self, key):
         logging.debug('MeshBox._remove_buddy')
-        icon = self._buddies[buddy_model.props.key]
+        icon = self._buddies.pop(key)
         self.remove(icon)
-        del self._buddies[buddy_model.props.key]
-
-    def __buddy_notify_current_activity_cb(self, buddy_model, pspec):
-        logging.debug('MeshBox.__buddy_notify_current_activity_cb %s',
-                      buddy_model.props.current_activity)
-        if buddy_model.props.current_activity is None:
-            if not buddy_model.props.key in self._buddies:
-                self._add_buddy(buddy_model)
-        elif buddy_model.props.key in self._buddies:
-            self._remove_buddy(buddy_model)
 
     def _add_activity(self, activity_model):
         icon = ActivityView(activity_model)
@@ -444,10 +508,9 @@ class MeshBox(ViewContainer):
 
         self._activities[activity_model.activity_id] = icon
 
-    def _remove_activity(self, activity_model):
-        icon = self._activities[activity_model.activity_id]
+    def _remove_activity(self, activity_id):
+        icon = self._activities.pop(activity_id)
         self.remove(icon)
-        del self._activities[activity_model.activity_id]
 
     # add AP to its corresponding network icon on the desktop,
     # creating one if it doesn't already exist
@@ -589,12 +652,16 @@ class MeshBox(ViewContainer):
     def suspend(self):
         if not self._suspended:
             self._suspended = True
+            self._buddy_updates.freeze()
+            self._activity_updates.freeze()
             for net in self.wireless_networks.values() + self._mesh:
                 net.props.paused = True
 
     def resume(self):
         if self._suspended:
             self._suspended = False
+            self._buddy_updates.thaw()
+            self._activity_updates.thaw()
             for net in self.wireless_networks.values() + self._mesh:
                 net.props.paused = False
 
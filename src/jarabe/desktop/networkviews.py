@@ -65,6 +65,8 @@ class WirelessNetworkView(EventPulsingIcon):
         self._filtered = False
         self._ssid = initial_ap.ssid
         self._display_name = network.ssid_to_display_name(self._ssid)
+        self._normalized_name = normalize_string(
+            self._display_name.decode('utf-8'))
         self._mode = initial_ap.mode
         self._strength = initial_ap.strength
         self._flags = initial_ap.flags
@@ -98,6 +100,10 @@ class WirelessNetworkView(EventPulsingIcon):
         self._palette_icon.props.xo_color = self._color
         self._update_badge()
 
+        connections = network.get_connections()
+        if not connections.is_ready():
+            connections.connect('ready', self.__connections_ready_cb)
+
         interface_props = dbus.Interface(self._device, dbus.PROPERTIES_IFACE)
         interface_props.Get(network.NM_WIRELESS_IFACE, 'WirelessCapabilities',
                             reply_handler=self.__get_device_caps_reply_cb,
@@ -220,6 +226,10 @@ class WirelessNetworkView(EventPulsingIcon):
                 icon = self._palette.props.icon
                 icon.props.icon_name = icon_name
 
+    def __connections_ready_cb(self, connections):
+        connections.disconnect_by_func(self.__connections_ready_cb)
+        self._update_badge()
+
     def _update_badge(self):
         if self._mode != network.NM_802_11_MODE_ADHOC:
             if network.find_connection_by_ssid(self._ssid) is not None:
@@ -340,7 +350,8 @@ class WirelessNetworkView(EventPulsingIcon):
             return wireless_security
 
     def __connect_activate_cb(self, icon):
-        self._connect()
+        # an existing connection would be missed while they are loaded
+        network.call_when_connections_ready(self._connect)
 
     def _connect(self):
         # Activate existing connection, if there is one
@@ -378,10 +389,11 @@ class WirelessNetworkView(EventPulsingIcon):
                                             self.get_first_ap().model)
 
     def set_filter(self, query):
-        normalized_name = normalize_string(self._display_name.decode('utf-8'))
-        self._filtered = normalized_name.find(query) == -1
-        self._update_icon()
-        self._update_color()
+        filtered = self._normalized_name.find(query) == -1
+        if filtered != self._filtered:
+            self._filtered = filtered
+            self._update_icon()
+            self._update_color()
 
     def create_keydialog(self, response):
         keydialog.create(self._ssid, self._flags, self._wpa_flags,
@@ -437,6 +449,10 @@ class WirelessNetworkView(EventPulsingIcon):
         self.update_strength()
 
     def disconnect(self):
+        connections = network.get_connections()
+        if not connections.is_ready():
+            connections.disconnect_by_func(self.__connections_ready_cb)
+
         self._bus.remove_signal_receiver(
             self.__device_state_changed_cb,
             signal_name='StateChanged',
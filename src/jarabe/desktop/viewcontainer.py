@@ -67,7 +67,8 @@ class ViewContainer(Gtk.Container):
             self._layout.setup(allocation, self._owner_icon,
                                self._activity_icon)
 
-        self._layout.allocate_children(allocation, self._children)
+        children = [child for child in self._children if child.get_visible()]
+        self._layout.allocate_children(allocation, children)
 
     def do_forall(self, include_internals, callback):
         for child in self._children:
@@ -53,6 +53,9 @@ from jarabe.frame.notification import NotificationIcon
 import jarabe.frame
 
 
+_PROGRESS_UPDATE_INTERVAL = 1000 / 60
+
+
 class ActivityButton(RadioToolButton):
     def __init__(self, home_activity, group):
         RadioToolButton.__init__(self, group=group)
@@ -388,8 +391,10 @@ class IncomingTransferButton(BaseTransferButton):
         self._ds_object = datastore.create()
 
         file_transfer.connect('notify::state', self.__notify_state_cb)
-        file_transfer.connect('notify::transferred-bytes',
-                              self.__notify_transferred_bytes_cb)
+        # only write the progress to the datastore every few percents or
+        # seconds, the completion of the transfer writes the entry anyway
+        self._progress_throttle = filetransfer.ProgressThrottle(
+            file_transfer, self.__progress_cb)
 
         icons = Gio.content_type_get_icon(file_transfer.mime_type).props.names
         icons.append('application-octet-stream')
@@ -443,10 +448,10 @@ class IncomingTransferButton(BaseTransferButton):
                 datastore.delete(object_id)
                 self._ds_object = None
 
-    def __notify_transferred_bytes_cb(self, file_transfer, pspec):
-        progress = file_transfer.props.transferred_bytes /      \
-            file_transfer.file_size
-        self._ds_object.metadata['progress'] = str(progress * 100)
+    def __progress_cb(self, progress):
+        if self._ds_object is None:
+            return
+        self._ds_object.metadata['progress'] = str(int(progress * 100))
         datastore.write(self._ds_object, update_mtime=False)
 
     def __reply_handler_cb(self):
@@ -512,6 +517,7 @@ class BaseTransferPalette(Palette):
         self.progress_bar = None
         self.progress_label = None
         self._notify_transferred_bytes_handler = None
+        self._update_progress_sid = None
 
         self.connect('popup', self.__popup_cb)
         self.connect('popdown', self.__popdown_cb)
@@ -527,9 +533,21 @@ class BaseTransferPalette(Palette):
             self.file_transfer.disconnect(
                 self._notify_transferred_bytes_handler)
             self._notify_transferred_bytes_handler = None
+        if self._update_progress_sid is not None:
+            GLib.source_remove(self._update_progress_sid)
+            self._update_progress_sid = None
 
     def __notify_transferred_bytes_cb(self, file_transfer, pspec):
+        # the transferred bytes can change much more often than the
+        # screen is refreshed, redraw at most once per frame
+        if self._update_progress_sid is None:
+            self._update_progress_sid = GLib.timeout_add(
+                _PROGRESS_UPDATE_INTERVAL, self.__update_progress_cb)
+
+    def __update_progress_cb(self):
+        self._update_progress_sid = None
         self.update_progress()
+        return False
 
     def _format_size(self, size):
         if size < 1024:
@@ -555,7 +573,23 @@ class BaseTransferPalette(Palette):
             self.file_transfer.props.transferred_bytes)
         total = self._format_size(self.file_transfer.file_size)
         # TRANS: file transfer, bytes transferred, e.g. 128 of 1024
-        self.progress_label.props.label = _('%s of %s') % (transferred, total)
+        label = _('%s of %s') % (transferred, total)
+
+        eta = self.file_transfer.props.eta
+        if eta >= 0 and \
+                self.file_transfer.props.state == filetransfer.FT_STATE_OPEN:
+            throughput = self._format_size(
+                int(self.file_transfer.props.throughput))
+            # TRANS: file transfer, speed and time left, e.g. 64KB/s, 0:42
+            label += '\n' + _('%s/s, %s left') % (throughput,
+                                                  self._format_time(eta))
+        self.progress_label.props.label = label
+
+    def _format_time(self, seconds):
+        if seconds < 3600:
+            return '%d:%02d' % (seconds / 60, seconds % 60)
+        return '%d:%02d:%02d' % (seconds / 3600, seconds / 60 % 60,
+                                 seconds % 60)
 
 
 class IncomingTransferPalette(BaseTransferPalette):
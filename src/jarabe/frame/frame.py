@@ -94,6 +94,10 @@ class Frame(object):
         self._key_listener = _KeyListener(self)
 
         self._notif_by_icon = {}
+        # icons of the notification service by id, and their windows,
+        # which are reused once the notification is closed
+        self._service_icons = {}
+        self._service_windows = []
 
         notification_service = notifications.get_service()
         notification_service.notification_received.connect(
@@ -254,9 +258,34 @@ class Frame(object):
         window.destroy()
         del self._notif_by_icon[icon]
 
+    def _get_service_window(self):
+        for window in self._service_windows:
+            if window.get_child() is None:
+                return window
+
+        # stack the windows from the top right corner to the left
+        window = NotificationWindow()
+        screen = Gdk.Screen.get_default()
+        window.move(screen.get_width() -
+                    style.GRID_CELL_SIZE * (len(self._service_windows) + 1),
+                    0)
+        self._service_windows.append(window)
+        return window
+
     def __notification_received_cb(self, **kwargs):
         logging.debug('__notification_received_cb')
-        icon = NotificationIcon()
+        notification_id = kwargs['notification_id']
+
+        icon = self._service_icons.pop(kwargs['replaces_id'], None)
+        if icon is None:
+            icon = NotificationIcon()
+            icon.connect('button-release-event',
+                         self.__service_icon_release_cb)
+            window = self._get_service_window()
+            window.add(icon)
+            icon.show()
+            window.show()
+        self._service_icons[notification_id] = icon
 
         hints = kwargs['hints']
 
@@ -271,13 +300,19 @@ class Frame(object):
             icon_colors = profile.get_color()
         icon.props.xo_color = icon_colors
 
-        duration = kwargs.get('expire_timeout', -1)
-        if duration == -1:
-            duration = _NOTIFICATION_DURATION
-
-        self.add_notification(icon, Gtk.CornerType.TOP_RIGHT, duration)
+    def __service_icon_release_cb(self, icon, event):
+        for notification_id, service_icon in self._service_icons.items():
+            if service_icon is icon:
+                notifications.get_service().close_notification(
+                    notification_id)
+                break
 
     def __notification_cancelled_cb(self, **kwargs):
-        # Do nothing for now. Our notification UI is so simple, there's no
-        # point yet.
-        pass
+        icon = self._service_icons.pop(kwargs['notification_id'], None)
+        if icon is None:
+            return
+
+        window = icon.get_parent()
+        window.hide()
+        window.remove(icon)
+        icon.destroy()
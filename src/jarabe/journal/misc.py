@@ -38,6 +38,7 @@ from sugar3 import profile
 from jarabe.view import launcher
 from jarabe.view import alerts
 from jarabe.model import bundleregistry, shell
+from jarabe.model import launchpool
 from jarabe.journal.journalentrybundle import JournalEntryBundle
 from jarabe.journal import model
 from jarabe.journal import journalwindow
@@ -295,7 +296,8 @@ def launch(bundle, activity_id=None, object_id=None, uri=None, color=None,
                                      object_id=object_id,
                                      uri=uri,
                                      invited=invited)
-    activityfactory.create(bundle, activity_handle)
+    if not launchpool.get_pool().launch(bundle, activity_handle):
+        activityfactory.create(bundle, activity_handle)
 
 
 def _downgrade_option_alert(bundle, metadata):
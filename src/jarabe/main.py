@@ -55,6 +55,7 @@ from jarabe.view import cursortracker
 from jarabe.journal import journalactivity
 from jarabe.model import notifications
 from jarabe.model import filetransfer
+from jarabe.model import launchpool
 from jarabe.view import launcher
 from jarabe.model import keyboard
 from jarabe.desktop import homewindow
@@ -112,6 +113,10 @@ def setup_file_transfer_cb():
     filetransfer.init()
 
 
+def setup_launch_pool_cb():
+    launchpool.get_pool().start()
+
+
 def setup_window_manager():
     logging.debug('STARTUP: window_manager')
 
@@ -137,6 +142,7 @@ def _complete_desktop_startup():
     GLib.idle_add(setup_journal_cb)
     GLib.idle_add(setup_notification_service_cb)
     GLib.idle_add(setup_file_transfer_cb)
+    GLib.idle_add(setup_launch_pool_cb)
     GLib.timeout_add_seconds(600, updater.startup_periodic_update)
 
     apisocket.start()
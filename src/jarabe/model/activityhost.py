@@ -0,0 +1,109 @@
+# Copyright (C) 2013 One Laptop per Child
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+"""Pre-warmed host process for Python activities
+
+The launch pool runs this module as a script. It imports the modules that
+every activity needs, then blocks until the shell writes a launch request
+on its standard input and turns into the requested activity by running
+sugar-activity in place.
+
+A request is a single JSON line with the sugar-activity command line, the
+environment and working directory of the activity and the path of its log
+file. An empty standard input means that the host is not needed anymore.
+"""
+
+import importlib
+import json
+import os
+import runpy
+import sys
+
+
+_PRELOAD_MODULES = [
+    'dbus',
+    'gi.repository.GObject',
+    'gi.repository.GLib',
+    'gi.repository.Gtk',
+    'gi.repository.Gdk',
+    'sugar3.activity.activity',
+    'sugar3.activity.activityhandle',
+    'sugar3.datastore.datastore',
+    'sugar3.graphics.alert',
+    'sugar3.graphics.style',
+    'sugar3.graphics.toolbarbox',
+    'sugar3.presence.presenceservice',
+]
+
+
+def _warm_up():
+    for name in _PRELOAD_MODULES:
+        importlib.import_module(name)
+
+
+def _find_program(name):
+    if os.path.isabs(name):
+        return name
+    for path in os.environ.get('PATH', '').split(os.pathsep):
+        program = os.path.join(path, name)
+        if os.path.isfile(program) and os.access(program, os.X_OK):
+            return program
+    return None
+
+
+def _to_str(value):
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return value
+
+
+def _run(request):
+    log_fd = os.open(_to_str(request['log_path']),
+                     os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0644)
+    os.dup2(log_fd, sys.stdout.fileno())
+    os.dup2(log_fd, sys.stderr.fileno())
+    os.close(log_fd)
+
+    null_fd = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(null_fd, sys.stdin.fileno())
+    os.close(null_fd)
+
+    os.environ.clear()
+    for key, value in request['environ'].iteritems():
+        os.environ[_to_str(key)] = _to_str(value)
+    os.chdir(_to_str(request['cwd']))
+
+    sys.argv = [_to_str(arg) for arg in request['argv']]
+    program = _find_program(sys.argv[0])
+    if program is None:
+        sys.stderr.write('Can not find %s\n' % sys.argv[0])
+        sys.exit(1)
+
+    runpy.run_path(program, run_name='__main__')
+
+
+def main():
+    _warm_up()
+
+    line = sys.stdin.readline()
+    if not line:
+        sys.exit(0)
+
+    _run(json.loads(line))
+
+
+if __name__ == '__main__':
+    main()
@@ -69,6 +69,9 @@ class AdHocManager(GObject.GObject):
                           self._CHANNEL_6: None,
                           self._CHANNEL_11: None}
 
+        network.call_when_connections_ready(self._ensure_connections)
+
+    def _ensure_connections(self):
         for channel in (self._CHANNEL_1, self._CHANNEL_6, self._CHANNEL_11):
             if not self._find_connection(channel):
                 self._add_connection(channel)
@@ -84,6 +84,14 @@ class BundleRegistry(GObject.GObject):
         # access to _bundles. Protect all _bundles access with a lock.
         self._lock = Lock()
         self._bundles = []
+        # MIME type -> activities that can open it, ordered by preference.
+        # Built on demand, dropped when the bundles or the defaults change.
+        self._mime_index = None
+        self._mime_index_serial = 0
+
+        self._mime_registry = mimeregistry.get_registry()
+        self._mime_registry.connect('changed', self.__mime_registry_changed_cb)
+        self.connect('bundle-changed', self.__bundle_changed_cb)
 
         # hold a reference to the monitors so they don't get disposed
         self._gio_monitors = []
@@ -121,6 +129,17 @@ class BundleRegistry(GObject.GObject):
         self._desktop_model.connect('desktop-view-icons-changed',
                                     self.__desktop_view_icons_changed_cb)
 
+    def __mime_registry_changed_cb(self, mime_registry):
+        self._invalidate_mime_index()
+
+    def __bundle_changed_cb(self, registry, bundle):
+        self._invalidate_mime_index()
+
+    def _invalidate_mime_index(self):
+        with self._lock:
+            self._mime_index = None
+            self._mime_index_serial += 1
+
     def __desktop_view_icons_changed_cb(self, model):
         number_of_views = desktop.get_number_of_views()
         if len(self._last_defaults_mtime) < number_of_views:
@@ -312,6 +331,8 @@ class BundleRegistry(GObject.GObject):
 
         with self._lock:
             self._bundles.append(bundle)
+            self._mime_index = None
+            self._mime_index_serial += 1
         if emit_signals:
             self.emit('bundle-added', bundle)
         return bundle
@@ -322,6 +343,8 @@ class BundleRegistry(GObject.GObject):
         for bundle in self._bundles:
             if bundle.get_path() == bundle_path:
                 self._bundles.remove(bundle)
+                self._mime_index = None
+                self._mime_index_serial += 1
                 removed = bundle
                 break
         self._lock.release()
@@ -331,28 +354,54 @@ class BundleRegistry(GObject.GObject):
         return removed is not None
 
     def get_activities_for_type(self, mime_type):
-        result = []
+        """Return the activities that can open mime_type
 
-        mime = mimeregistry.get_registry()
-        default_bundle_id = mime.get_default_activity(mime_type)
-        default_bundle = None
-
-        for bundle in self:
+        The activity chosen by the user comes first, then the default one
+        of the system, then the others in the order of the registry.
+        """
+        with self._lock:
+            mime_index = self._mime_index
+            serial = self._mime_index_serial
+            bundles = list(self._bundles)
+
+        if mime_index is None:
+            mime_index = self._build_mime_index(bundles)
+            with self._lock:
+                # bundles may have been installed meanwhile by the thread
+                if serial == self._mime_index_serial:
+                    self._mime_index = mime_index
+
+        return list(mime_index.get(mime_type, []))
+
+    def _build_mime_index(self, bundles):
+        candidates = {}
+        for bundle in bundles:
             if not isinstance(bundle, ActivityBundle):
                 continue
-            if mime_type in (bundle.get_mime_types() or []):
+            for mime_type in bundle.get_mime_types() or []:
+                if bundle not in candidates.setdefault(mime_type, []):
+                    candidates[mime_type].append(bundle)
+
+        mime_index = {}
+        for mime_type, activities in candidates.iteritems():
+            default_bundle_id = \
+                self._mime_registry.get_default_activity(mime_type)
+            system_bundle_id = self.get_default_for_type(mime_type)
+            default_bundle = None
+
+            result = []
+            for bundle in activities:
                 if bundle.get_bundle_id() == default_bundle_id:
                     default_bundle = bundle
-                elif self.get_default_for_type(mime_type) == \
-                        bundle.get_bundle_id():
+                elif bundle.get_bundle_id() == system_bundle_id:
                     result.insert(0, bundle)
                 else:
                     result.append(bundle)
+            if default_bundle is not None:
+                result.insert(0, default_bundle)
+            mime_index[mime_type] = result
 
-        if default_bundle is not None:
-            result.insert(0, default_bundle)
-
-        return result
+        return mime_index
 
     def get_default_for_type(self, mime_type):
         return self._mime_defaults.get(mime_type)
@@ -17,6 +17,9 @@
 import os
 import logging
 import socket
+import time
+import hashlib
+from collections import deque
 
 from gi.repository import GObject
 from gi.repository import Gio
@@ -50,13 +53,126 @@ FT_REASON_LOCAL_ERROR = 4
 FT_REASON_LOCAL_ERROR = 5
 FT_REASON_REMOTE_ERROR = 6
 
+FT_HASH_TYPE_NONE = 0
+FT_HASH_TYPE_MD5 = 1
+FT_HASH_TYPE_SHA1 = 2
+FT_HASH_TYPE_SHA256 = 3
+
+_HASH_NAMES = {
+    FT_HASH_TYPE_MD5: 'md5',
+    FT_HASH_TYPE_SHA1: 'sha1',
+    FT_HASH_TYPE_SHA256: 'sha256',
+}
+
 # FIXME: use constants from tp-python once the spec is undrafted
 CHANNEL_TYPE_FILE_TRANSFER = \
     'org.freedesktop.Telepathy.Channel.Type.FileTransfer'
 
+_PROGRESS_STEP = 0.05
+_PROGRESS_INTERVAL = 5
+
+_THROUGHPUT_WINDOW = 5
+_SPLICE_CHUNK_SIZE = 64 * 1024
+
 new_file_transfer = dispatch.Signal()
 
 
+class HashingSplicer(object):
+    """Copy an input stream to an output stream and hash the data
+
+    This does the same as Gio.OutputStream.splice_async, closing both
+    streams at the end, but the data goes through Python in chunks of
+    _SPLICE_CHUNK_SIZE bytes so that its digest is computed on the way.
+    Without an output stream the input is only read and hashed.
+    """
+
+    def __init__(self, input_stream, output_stream, hash_name='sha256'):
+        self._input_stream = input_stream
+        self._output_stream = output_stream
+        self._hash = hashlib.new(hash_name)
+        self._size = 0
+        self._callback = None
+        self._error = None
+
+    def get_size(self):
+        """Return the number of bytes copied so far"""
+        return self._size
+
+    def get_digest(self):
+        """Return the hex digest of the data copied so far"""
+        return self._hash.hexdigest()
+
+    def splice_async(self, callback):
+        """Start copying, callback is called with the error, or None"""
+        self._callback = callback
+        self._read_chunk()
+
+    def _read_chunk(self):
+        self._input_stream.read_bytes_async(_SPLICE_CHUNK_SIZE,
+                                            GLib.PRIORITY_LOW, None,
+                                            self.__read_bytes_cb, None)
+
+    def __read_bytes_cb(self, stream, result, user_data):
+        try:
+            data = stream.read_bytes_finish(result).get_data() or ''
+        except GLib.GError, e:
+            logging.error('Could not read stream: %s', e)
+            self._close(e)
+            return
+
+        if not data:
+            self._close(None)
+            return
+
+        self._hash.update(data)
+        if self._output_stream is None:
+            self._size += len(data)
+            self._read_chunk()
+        else:
+            self._write_data(data)
+
+    def _write_data(self, data):
+        self._output_stream.write_bytes_async(GLib.Bytes.new(data),
+                                              GLib.PRIORITY_LOW, None,
+                                              self.__write_bytes_cb, data)
+
+    def __write_bytes_cb(self, stream, result, data):
+        try:
+            written = stream.write_bytes_finish(result)
+        except GLib.GError, e:
+            logging.error('Could not write stream: %s', e)
+            self._close(e)
+            return
+
+        self._size += written
+        if written < len(data):
+            self._write_data(data[written:])
+        else:
+            self._read_chunk()
+
+    def _close(self, error):
+        self._error = error
+        self._input_stream.close_async(GLib.PRIORITY_LOW, None,
+                                       self.__close_async_cb, None)
+        if self._output_stream is None:
+            self._callback(error)
+        else:
+            self._output_stream.close_async(GLib.PRIORITY_LOW, None,
+                                            self.__close_async_cb,
+                                            self._callback)
+
+    def __close_async_cb(self, stream, result, callback):
+        try:
+            stream.close_finish(result)
+        except GLib.GError, e:
+            logging.error('Could not close stream: %s', e)
+            if self._error is None:
+                self._error = e
+
+        if callback is not None:
+            callback(self._error)
+
+
 class BaseFileTransfer(GObject.GObject):
 
     def __init__(self, connection):
@@ -64,6 +180,8 @@ class BaseFileTransfer(GObject.GObject):
         self._connection = connection
         self._state = FT_STATE_NONE
         self._transferred_bytes = 0
+        # (time, transferred bytes) of the last _THROUGHPUT_WINDOW seconds
+        self._samples = deque()
 
         self.channel = None
         self.buddy = None
@@ -73,6 +191,8 @@ class BaseFileTransfer(GObject.GObject):
         self.mime_type = None
         self.initial_offset = 0
         self.reason_last_change = FT_REASON_NONE
+        self.content_hash_type = FT_HASH_TYPE_NONE
+        self.content_hash = ''
 
     def set_channel(self, channel):
         self.channel = channel
@@ -91,6 +211,9 @@ class BaseFileTransfer(GObject.GObject):
         self.file_size = props['Size']
         self.description = props['Description']
         self.mime_type = props['ContentType']
+        self.content_hash_type = props.get('ContentHashType',
+                                           FT_HASH_TYPE_NONE)
+        self.content_hash = props.get('ContentHash', '')
 
         handle = channel_properties.Get(CHANNEL, 'TargetHandle')
         self.buddy = neighborhood.get_model().get_buddy_by_handle(handle)
@@ -102,6 +225,12 @@ class BaseFileTransfer(GObject.GObject):
     def _set_transferred_bytes(self, transferred_bytes):
         self._transferred_bytes = transferred_bytes
 
+        now = time.time()
+        self._samples.append((now, transferred_bytes))
+        while len(self._samples) > 2 and \
+                now - self._samples[0][0] > _THROUGHPUT_WINDOW:
+            self._samples.popleft()
+
     def _get_transferred_bytes(self):
         return self._transferred_bytes
 
@@ -110,6 +239,28 @@ class BaseFileTransfer(GObject.GObject):
                                          getter=_get_transferred_bytes,
                                          setter=_set_transferred_bytes)
 
+    def _get_throughput(self):
+        if len(self._samples) < 2:
+            return 0.0
+        start_time, start_bytes = self._samples[0]
+        end_time, end_bytes = self._samples[-1]
+        if end_time <= start_time:
+            return 0.0
+        return max(0.0, (end_bytes - start_bytes) / (end_time - start_time))
+
+    # bytes per second, over the last _THROUGHPUT_WINDOW seconds
+    throughput = GObject.property(type=float, getter=_get_throughput)
+
+    def _get_eta(self):
+        throughput = self._get_throughput()
+        if not self.file_size or throughput <= 0:
+            return -1
+        remaining = max(0, self.file_size - self._transferred_bytes)
+        return int(remaining / throughput)
+
+    # seconds until the transfer is completed, or -1 if unknown
+    eta = GObject.property(type=int, getter=_get_eta)
+
     def __initial_offset_defined_cb(self, offset):
         logging.debug('__initial_offset_defined_cb %r', offset)
         self.initial_offset = offset
@@ -131,6 +282,81 @@ class BaseFileTransfer(GObject.GObject):
         self.channel[CHANNEL].Close()
 
 
+class ProgressThrottle(object):
+    """Rate limit the progress reports of a file transfer
+
+    The transfer changes its transferred bytes for every block that goes
+    through, callback is only called with the progress, between 0 and 1,
+    when it advanced at least step since the last call, when it is done
+    or when interval seconds went by with some progress left unreported.
+    The reports stop when the transfer is completed or cancelled.
+    """
+
+    def __init__(self, file_transfer, callback, step=_PROGRESS_STEP,
+                 interval=_PROGRESS_INTERVAL):
+        self._file_transfer = file_transfer
+        self._callback = callback
+        self._step = step
+        self._interval = interval
+        self._reported = None
+        self._reported_time = 0
+        self._timeout_sid = None
+
+        self._handlers = [
+            file_transfer.connect('notify::transferred-bytes',
+                                  self.__notify_transferred_bytes_cb),
+            file_transfer.connect('notify::state', self.__notify_state_cb)]
+
+    def get_progress(self):
+        file_size = self._file_transfer.file_size
+        if not file_size:
+            return 0.0
+        transferred_bytes = self._file_transfer.props.transferred_bytes
+        return min(1.0, transferred_bytes / float(file_size))
+
+    def stop(self):
+        if self._timeout_sid is not None:
+            GLib.source_remove(self._timeout_sid)
+            self._timeout_sid = None
+        for handler in self._handlers:
+            self._file_transfer.disconnect(handler)
+        self._handlers = []
+
+    def _report(self, progress):
+        if self._timeout_sid is not None:
+            GLib.source_remove(self._timeout_sid)
+            self._timeout_sid = None
+        self._reported = progress
+        self._reported_time = time.time()
+        self._callback(progress)
+
+    def __notify_transferred_bytes_cb(self, file_transfer, pspec):
+        progress = self.get_progress()
+        if progress == self._reported:
+            return
+
+        elapsed = time.time() - self._reported_time
+        if self._reported is None or progress == 1.0 or \
+                elapsed >= self._interval or \
+                progress - self._reported >= self._step:
+            self._report(progress)
+        elif self._timeout_sid is None:
+            delay = int((self._interval - elapsed) * 1000)
+            self._timeout_sid = GLib.timeout_add(delay, self.__timeout_cb)
+
+    def __timeout_cb(self):
+        self._timeout_sid = None
+        progress = self.get_progress()
+        if progress != self._reported:
+            self._report(progress)
+        return False
+
+    def __notify_state_cb(self, file_transfer, pspec):
+        if file_transfer.props.state in (FT_STATE_COMPLETED,
+                                         FT_STATE_CANCELLED):
+            self.stop()
+
+
 class IncomingFileTransfer(BaseFileTransfer):
     def __init__(self, connection, object_path, props):
         BaseFileTransfer.__init__(self, connection)
@@ -141,6 +367,8 @@ class IncomingFileTransfer(BaseFileTransfer):
         self.connect('notify::state', self.__notify_state_cb)
 
         self.destination_path = None
+        self.digest = None
+        self.verified = None
         self._socket_address = None
         self._socket = None
         self._splicer = None
@@ -176,11 +404,27 @@ class IncomingFileTransfer(BaseFileTransfer):
             else:
                 output_stream = destination_file.append_to()
 
-            output_stream.splice_async(
-                input_stream,
-                Gio.OutputStreamSpliceFlags.CLOSE_SOURCE |
-                Gio.OutputStreamSpliceFlags.CLOSE_TARGET,
-                GLib.PRIORITY_LOW, None, None, None)
+            # the digest can only be checked if the whole file goes
+            # through the splicer, not when resuming a transfer
+            hash_name = _HASH_NAMES.get(self.content_hash_type)
+            if hash_name is None or self.initial_offset != 0:
+                hash_name = 'sha256'
+                self.content_hash = ''
+            self._splicer = HashingSplicer(input_stream, output_stream,
+                                           hash_name)
+            self._splicer.splice_async(self.__splice_cb)
+
+    def __splice_cb(self, error):
+        if error is not None:
+            return
+
+        self.digest = self._splicer.get_digest()
+        if self.content_hash:
+            self.verified = self.digest == self.content_hash.lower()
+            if not self.verified:
+                logging.warning('The digest of %s is %s instead of %s',
+                                self.destination_path, self.digest,
+                                self.content_hash)
 
 
 class OutgoingFileTransfer(BaseFileTransfer):
@@ -199,6 +443,7 @@ class OutgoingFileTransfer(BaseFileTransfer):
         self._socket = None
         self._splicer = None
         self._output_stream = None
+        self._ready_connection = None
 
         self.buddy = buddy
         self.title = title
@@ -206,7 +451,26 @@ class OutgoingFileTransfer(BaseFileTransfer):
         self.description = description
         self.mime_type = mime_type
 
+        # the digest is part of the channel request, so that the receiver
+        # can verify the file, compute it while the connection gets ready
+        input_stream = Gio.File.new_for_path(file_name).read(None)
+        self._hasher = HashingSplicer(input_stream, None)
+        self._hasher.splice_async(self.__hash_cb)
+
+    def __hash_cb(self, error):
+        if error is None:
+            self.content_hash_type = FT_HASH_TYPE_SHA256
+            self.content_hash = self._hasher.get_digest()
+        self._hasher = None
+        if self._ready_connection is not None:
+            self._create_channel(self._ready_connection)
+
     def __connection_ready_cb(self, connection):
+        self._ready_connection = connection
+        if self._hasher is None:
+            self._create_channel(connection)
+
+    def _create_channel(self, connection):
         requests = connection[CONNECTION_INTERFACE_REQUESTS]
         object_path, properties_ = requests.CreateChannel({
             CHANNEL + '.ChannelType': CHANNEL_TYPE_FILE_TRANSFER,
@@ -216,6 +480,9 @@ class OutgoingFileTransfer(BaseFileTransfer):
             CHANNEL_TYPE_FILE_TRANSFER + '.Filename': self.title,
             CHANNEL_TYPE_FILE_TRANSFER + '.Size': self.file_size,
             CHANNEL_TYPE_FILE_TRANSFER + '.Description': self.description,
+            CHANNEL_TYPE_FILE_TRANSFER + '.ContentHashType':
+                self.content_hash_type,
+            CHANNEL_TYPE_FILE_TRANSFER + '.ContentHash': self.content_hash,
             CHANNEL_TYPE_FILE_TRANSFER + '.InitialOffset': 0})
 
         self.set_channel(Channel(connection.service_name, object_path))
@@ -0,0 +1,262 @@
+# Copyright (C) 2013 One Laptop per Child
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+"""Pool of pre-warmed processes to launch Python activities
+
+Starting a Python activity from scratch means loading the interpreter,
+GTK and the toolkit before any activity code runs. The pool keeps a few
+host processes that already did that waiting in the background, a launch
+hands one of them the activity to run. The pool is refilled after every
+launch and shrinks when the system is running out of memory.
+"""
+
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+
+from gi.repository import Gio
+from gi.repository import GLib
+
+from sugar3.activity import activityfactory
+
+from jarabe.model import shell
+
+
+_HOST_COMMAND = [sys.executable, '-m', 'jarabe.model.activityhost']
+_ACTIVITY_COMMAND = 'sugar-activity'
+
+_REFILL_DELAY = 5
+_MEMORY_CHECK_INTERVAL = 30
+_MIN_AVAILABLE_MEMORY = 200 * 1024
+
+# the hosts have loaded GTK3 already, GTK2 activities can't run in them
+_SUGAR3_IMPORT = re.compile(r'^\s*(from|import)\s+(sugar3|gi\.repository)\b',
+                            re.MULTILINE)
+_GTK2_IMPORT = re.compile(r'^\s*(from|import)\s+(sugar|gtk|gobject|pygtk)\b',
+                          re.MULTILINE)
+
+_pool = None
+
+
+def get_available_memory():
+    """Return an estimate of the available memory in kB, or None"""
+    try:
+        meminfo = open('/proc/meminfo')
+    except IOError:
+        return None
+
+    values = {}
+    try:
+        for line in meminfo:
+            key, value = line.split(':', 1)
+            values[key] = int(value.split()[0])
+    except ValueError:
+        return None
+    finally:
+        meminfo.close()
+
+    if 'MemAvailable' in values:
+        return values['MemAvailable']
+    return values.get('MemFree', 0) + values.get('Buffers', 0) + \
+        values.get('Cached', 0)
+
+
+def is_sugar3_activity(bundle_path, command):
+    """Return True if the sugar-activity command runs a sugar3 activity
+
+    The module of the activity class is looked at, an activity is only
+    considered to use sugar3 when it imports sugar3 or gi.repository and
+    none of the GTK2 modules.
+    """
+    class_names = [arg for arg in command[1:] if not arg.startswith('-')]
+    if not class_names or '.' not in class_names[0]:
+        return False
+
+    module_path = os.path.join(bundle_path,
+                               *class_names[0].split('.')[:-1])
+    for path in [module_path + '.py',
+                 os.path.join(module_path, '__init__.py')]:
+        try:
+            with open(path) as module_file:
+                source = module_file.read()
+        except IOError:
+            continue
+        return _SUGAR3_IMPORT.search(source) is not None and \
+            _GTK2_IMPORT.search(source) is None
+
+    return False
+
+
+class LaunchPool(object):
+    """Keep up to size idle activity hosts ready to be launched"""
+
+    def __init__(self, size, host_command=_HOST_COMMAND,
+                 get_memory=get_available_memory):
+        self._size = size
+        self._host_command = host_command
+        self._get_memory = get_memory
+        self._hosts = []
+        self._launched = {}
+        self._refill_sid = None
+        self._memory_sid = None
+
+    def get_size(self):
+        return self._size
+
+    def get_idle_hosts(self):
+        return len(self._hosts)
+
+    def start(self):
+        if self._size > 0:
+            self._refill()
+
+    def stop(self):
+        if self._refill_sid is not None:
+            GLib.source_remove(self._refill_sid)
+            self._refill_sid = None
+        if self._memory_sid is not None:
+            GLib.source_remove(self._memory_sid)
+            self._memory_sid = None
+        self._shrink(0)
+
+    def launch(self, bundle, handle):
+        """Launch the activity in an idle host
+
+        Return False if the activity can not be launched this way, because
+        there is no idle host or the activity is not a sugar3 Python one,
+        so that the caller can fall back to a regular launch.
+        """
+        command = activityfactory.get_command(bundle, handle.activity_id,
+                                              handle.object_id, handle.uri,
+                                              handle.invited)
+        if os.path.basename(command[0]) != _ACTIVITY_COMMAND or \
+                not is_sugar3_activity(bundle.get_path(), command):
+            return False
+
+        if not self._hosts:
+            self._queue_refill()
+            return False
+        host = self._hosts.pop(0)
+
+        shell.get_model().notify_launch(handle.activity_id,
+                                        bundle.get_bundle_id())
+
+        log_path, log_file = activityfactory.open_log_file(bundle)
+        log_file.close()
+
+        request = {'argv': [str(arg) for arg in command],
+                   'environ': activityfactory.get_environment(bundle),
+                   'cwd': bundle.get_path(),
+                   'log_path': log_path}
+        self._launched[host.pid] = handle.activity_id
+        try:
+            host.stdin.write(json.dumps(request) + '\n')
+            host.stdin.close()
+        except IOError, e:
+            logging.error('Could not hand %s to activity host: %s',
+                          handle.activity_id, e)
+            del self._launched[host.pid]
+            shell.get_model().notify_launch_failed(handle.activity_id)
+
+        self._queue_refill()
+        return True
+
+    def _spawn_host(self):
+        dev_null = open(os.devnull, 'w')
+        try:
+            host = subprocess.Popen(self._host_command,
+                                    stdin=subprocess.PIPE,
+                                    stdout=dev_null, stderr=dev_null,
+                                    close_fds=True)
+        except OSError, e:
+            logging.error('Could not start activity host: %s', e)
+            return None
+        finally:
+            dev_null.close()
+
+        GLib.child_watch_add(host.pid, self.__host_exited_cb, host)
+        return host
+
+    def __host_exited_cb(self, pid, condition, host):
+        # the child has been reaped already, keep Popen from waiting on it
+        host.returncode = condition
+        if host in self._hosts:
+            logging.debug('Idle activity host %d exited', pid)
+            self._hosts.remove(host)
+            return
+
+        activity_id = self._launched.pop(pid, None)
+        if activity_id is not None and (not os.WIFEXITED(condition) or
+                                        os.WEXITSTATUS(condition) != 0):
+            shell.get_model().notify_launch_failed(activity_id)
+
+    def _memory_is_low(self):
+        available = self._get_memory()
+        return available is not None and available < _MIN_AVAILABLE_MEMORY
+
+    def _queue_refill(self):
+        if self._refill_sid is None and self._size > 0:
+            self._refill_sid = GLib.timeout_add_seconds(_REFILL_DELAY,
+                                                        self.__refill_cb)
+
+    def __refill_cb(self):
+        self._refill_sid = None
+        self._refill()
+        return False
+
+    def _refill(self):
+        if self._memory_is_low():
+            self._shrink(0)
+        else:
+            while len(self._hosts) < self._size:
+                host = self._spawn_host()
+                if host is None:
+                    break
+                self._hosts.append(host)
+
+        if self._memory_sid is None:
+            self._memory_sid = GLib.timeout_add_seconds(
+                _MEMORY_CHECK_INTERVAL, self.__check_memory_cb)
+
+    def __check_memory_cb(self):
+        if self._memory_is_low():
+            if self._hosts:
+                logging.debug('Low memory, stopping %d activity hosts',
+                              len(self._hosts))
+            self._shrink(0)
+        elif len(self._hosts) < self._size:
+            self._queue_refill()
+        return True
+
+    def _shrink(self, size):
+        while len(self._hosts) > size:
+            host = self._hosts.pop()
+            try:
+                # closing stdin tells the host to exit
+                host.stdin.close()
+            except IOError:
+                pass
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        settings = Gio.Settings('org.sugarlabs')
+        _pool = LaunchPool(settings.get_int('activity-launch-pool-size'))
+    return _pool
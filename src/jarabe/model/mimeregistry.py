@@ -16,6 +16,7 @@
 
 from gi.repository import GLib
 from gi.repository import Gio
+from gi.repository import GObject
 
 _JOURNAL_DIR = 'org.sugarlabs.journal'
 _REGISTRY_KEY = 'mime-registry'
@@ -23,18 +24,36 @@ _REGISTRY_KEY = 'mime-registry'
 _instance = None
 
 
-class MimeRegistry(object):
+class MimeRegistry(GObject.GObject):
+    """The activities chosen by the user to open each MIME type"""
+
+    __gsignals__ = {
+        'changed': (GObject.SignalFlags.RUN_FIRST, None, ([])),
+    }
 
     def __init__(self):
+        GObject.GObject.__init__(self)
         # TODO move here all mime_type related code from jarabe modules
         self._settings = Gio.Settings(_JOURNAL_DIR)
+        self._settings.connect('changed::%s' % _REGISTRY_KEY,
+                               self.__settings_changed_cb)
+        self._defaults = None
+
+    def __settings_changed_cb(self, settings, key):
+        self._defaults = None
+        self.emit('changed')
+
+    def _get_defaults(self):
+        # unpacking the variant is not cheap, keep it until it changes
+        if self._defaults is None:
+            self._defaults = self._settings.get_value(_REGISTRY_KEY).unpack()
+        return self._defaults
 
     def get_default_activity(self, mime_type):
-        dictionary = self._settings.get_value(_REGISTRY_KEY).unpack()
-        return dictionary.get(mime_type)
+        return self._get_defaults().get(mime_type)
 
     def set_default_activity(self, mime_type, bundle_id):
-        dictionary = self._settings.get_value(_REGISTRY_KEY).unpack()
+        dictionary = dict(self._get_defaults())
         dictionary[mime_type] = bundle_id
 
         variant = GLib.Variant('a{ss}', dictionary)
@@ -26,6 +26,7 @@ import uuid
 import dbus
 import dbus.service
 from gi.repository import GObject
+from gi.repository import GLib
 import ConfigParser
 from gi.repository import Gio
 import ctypes
@@ -745,7 +746,8 @@ def _get_settings():
         obj = dbus.SystemBus().get_object(NM_SERVICE, NM_SETTINGS_PATH)
         _nm_settings = dbus.Interface(obj, NM_SETTINGS_IFACE)
         _migrate_old_wifi_connections()
-        _migrate_old_gsm_connection()
+        # the existing connections need to be known first
+        GLib.idle_add(_migrate_old_gsm_connection_when_ready)
     return _nm_settings
 
 
@@ -775,6 +777,7 @@ def _add_and_activate_error_cb(err):
 class Connection(GObject.GObject):
     __gsignals__ = {
         'removed': (GObject.SignalFlags.RUN_LAST, None, ()),
+        'updated': (GObject.SignalFlags.RUN_LAST, None, ()),
     }
 
     def __init__(self, bus, path):
@@ -785,10 +788,32 @@ class Connection(GObject.GObject):
             'Removed', self._removed_cb)
         self._updated_handle = self._connection.connect_to_signal(
             'Updated', self._updated_cb)
-        self._settings = self._connection.GetSettings(byte_arrays=True)
+        self._settings = {}
+        self._loaded = False
+        self._load_settings()
+
+    def _load_settings(self):
+        self._connection.GetSettings(
+            byte_arrays=True,
+            reply_handler=self.__get_settings_reply_cb,
+            error_handler=self.__get_settings_error_cb)
+
+    def __get_settings_reply_cb(self, settings):
+        self._settings = settings
+        self._loaded = True
+        self.emit('updated')
+
+    def __get_settings_error_cb(self, error):
+        logging.error('Could not get the settings of %s: %s',
+                      self.get_path(), error)
+        self._loaded = True
+        self.emit('updated')
+
+    def is_loaded(self):
+        return self._loaded
 
     def _updated_cb(self):
-        self._settings = self._connection.GetSettings(byte_arrays=True)
+        self._load_settings()
 
     def _removed_cb(self):
         self._updated_handle.remove()
@@ -828,37 +853,138 @@ class Connection(GObject.GObject):
             return None
 
     def get_id(self):
-        return self.get_settings('connection')['id']
+        connection_settings = self.get_settings('connection')
+        if connection_settings is None:
+            return None
+        return connection_settings['id']
 
     def get_path(self):
         return self._connection.object_path
 
 
-class Connections(object):
+class Connections(GObject.GObject):
+    """The saved NetworkManager connections, indexed by SSID and id
+
+    The settings of the connections are loaded asynchronously, ready is
+    emitted once the settings of all the connections that existed at
+    startup are known.
+    """
+
+    __gsignals__ = {
+        'ready': (GObject.SignalFlags.RUN_FIRST, None, ()),
+    }
+
+    _SSID = 0
+    _ID = 1
+
     def __init__(self):
+        GObject.GObject.__init__(self)
         self._bus = dbus.SystemBus()
         self._connections = []
+        self._by_ssid = {}
+        self._by_id = {}
+        # (ssid, id) of each connection, as indexed
+        self._keys = {}
+        self._loading = set()
+        self._ready = False
 
         settings = _get_settings()
         settings.connect_to_signal('NewConnection', self._new_connection_cb)
+        settings.ListConnections(
+            reply_handler=self.__list_connections_reply_cb,
+            error_handler=self.__list_connections_error_cb)
 
-        for connection_o in settings.ListConnections():
+    def __list_connections_reply_cb(self, connections_o):
+        for connection_o in connections_o:
             self._monitor_connection(connection_o)
+        self._check_ready()
+
+    def __list_connections_error_cb(self, error):
+        logging.error('Could not list the connections: %s', error)
+        self._check_ready()
+
+    def _check_ready(self):
+        if not self._ready and not self._loading:
+            self._ready = True
+            self.emit('ready')
+
+    def is_ready(self):
+        return self._ready
 
     def get_list(self):
         return self._connections
 
+    def find_by_ssid(self, ssid):
+        return self._by_ssid.get(ssid)
+
+    def find_by_id(self, connection_id):
+        return self._by_id.get(connection_id)
+
     def _monitor_connection(self, connection_o):
         connection = Connection(self._bus, connection_o)
         connection.connect('removed', self._connection_removed_cb)
+        connection.connect('updated', self._connection_updated_cb)
         self._connections.append(connection)
+        if not self._ready:
+            self._loading.add(connection)
 
     def _new_connection_cb(self, connection_o):
         self._monitor_connection(connection_o)
 
+    def _connection_updated_cb(self, connection):
+        self._unindex(connection)
+        self._index(connection)
+
+        if connection in self._loading:
+            self._loading.remove(connection)
+            self._check_ready()
+
     def _connection_removed_cb(self, connection):
         connection.disconnect_by_func(self._connection_removed_cb)
+        connection.disconnect_by_func(self._connection_updated_cb)
         self._connections.remove(connection)
+        self._unindex(connection)
+
+        if connection in self._loading:
+            self._loading.remove(connection)
+            self._check_ready()
+
+    def _index(self, connection):
+        keys = (connection.get_ssid(), connection.get_id())
+        self._keys[connection] = keys
+        for index, position in ((self._by_ssid, self._SSID),
+                                (self._by_id, self._ID)):
+            key = keys[position]
+            if key is None:
+                continue
+
+            # the settings arrive in any order, keep the first connection
+            # of the list rather than the first one that was loaded
+            current = index.get(key)
+            if current is None or \
+                    self._connections.index(connection) < \
+                    self._connections.index(current):
+                index[key] = connection
+
+    def _unindex(self, connection):
+        keys = self._keys.pop(connection, None)
+        if keys is None:
+            return
+
+        for index, position in ((self._by_ssid, self._SSID),
+                                (self._by_id, self._ID)):
+            key = keys[position]
+            if key is None or index.get(key) is not connection:
+                continue
+
+            del index[key]
+            # another connection can have the same key, the first one is
+            # used, as a search in the list would find it
+            for other in self._connections:
+                if other in self._keys and \
+                        self._keys[other][position] == key:
+                    index[key] = other
+                    break
 
 
 def get_connections():
@@ -868,21 +994,28 @@ def get_connections():
     return _connections
 
 
+def call_when_connections_ready(callback, *args):
+    """Call callback once the settings of the connections are loaded
+
+    Code that adds a connection when it can't find it must wait for this,
+    the connections are not all known before.
+    """
+    connections = get_connections()
+    if connections.is_ready():
+        callback(*args)
+    else:
+        connections.connect('ready', lambda connections: callback(*args))
+
+
 def find_connection_by_ssid(ssid):
     # FIXME: this check should be more extensive.
     # it should look at mode (infra/adhoc), band, security, and really
     # anything that is stored in the settings.
-    for connection in get_connections().get_list():
-        if connection.get_ssid() == ssid:
-            return connection
-    return None
+    return get_connections().find_by_ssid(ssid)
 
 
 def find_connection_by_id(connection_id):
-    for connection in get_connections().get_list():
-        if connection.get_id() == connection_id:
-            return connection
-    return None
+    return get_connections().find_by_id(connection_id)
 
 
 def _add_connection_reply_cb(connection):
@@ -1002,6 +1135,11 @@ def create_gsm_connection(username, password, number, apn, pin):
     add_connection(settings)
 
 
+def _migrate_old_gsm_connection_when_ready():
+    call_when_connections_ready(_migrate_old_gsm_connection)
+    return False
+
+
 def _migrate_old_gsm_connection():
     if find_gsm_connection():
         # don't attempt migration if a NM-level connection already exists
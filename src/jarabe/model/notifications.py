@@ -18,6 +18,8 @@ import sys
 import logging
 
 import dbus
+import dbus.service
+from gi.repository import GLib
 
 from sugar3 import dispatch
 
@@ -28,19 +30,69 @@ _DBUS_SERVICE = 'org.freedesktop.Notifications'
 _DBUS_IFACE = 'org.freedesktop.Notifications'
 _DBUS_PATH = '/org/freedesktop/Notifications'
 
+_MAX_VISIBLE = 3
+_DEFAULT_EXPIRE_TIMEOUT = 5000
+
+# reasons of NotificationClosed, from the desktop notifications spec
+CLOSED_EXPIRED = 1
+CLOSED_DISMISSED = 2
+CLOSED_BY_CALL = 3
+CLOSED_UNDEFINED = 4
+
 _instance = None
 
 
+class _Notification(object):
+
+    def __init__(self, notification_id, app_name):
+        self.notification_id = notification_id
+        self.app_name = app_name
+        self.properties = {}
+        self.visible = False
+        self.timeout_sid = None
+
+
 class NotificationService(dbus.service.Object):
-    def __init__(self):
+    """Desktop notifications service
+
+    At most max_visible notifications are shown at the same time, the
+    others wait in a queue until some are closed. A new notification
+    from an application that has one shown or queued already takes its
+    place, so a chatty application can not flood the screen; the one
+    replaced is closed.
+
+    notification_received is sent when a notification has to be shown,
+    with replaces_id set to the notification whose window should be
+    reused, if any, and notification_cancelled when it has to go away.
+    """
+
+    def __init__(self, max_visible=_MAX_VISIBLE):
         bus = dbus.SessionBus()
         bus_name = dbus.service.BusName(_DBUS_SERVICE, bus=bus)
         dbus.service.Object.__init__(self, bus_name, _DBUS_PATH)
 
         self._notification_counter = 0
+        self._max_visible = max_visible
+        self._notifications = {}
+        self._queue = []
         self.notification_received = dispatch.Signal()
         self.notification_cancelled = dispatch.Signal()
 
+    def _new_id(self):
+        if self._notification_counter == sys.maxint:
+            self._notification_counter = 1
+        else:
+            self._notification_counter += 1
+        return self._notification_counter
+
+    def _find_by_app_name(self, app_name):
+        if not app_name:
+            return None
+        for notification in self._notifications.itervalues():
+            if notification.app_name == app_name:
+                return notification
+        return None
+
     @dbus.service.method(_DBUS_IFACE,
                          in_signature='susssava{sv}i', out_signature='u')
     def Notify(self, app_name, replaces_id, app_icon, summary, body, actions,
@@ -50,30 +102,96 @@ class NotificationService(dbus.service.Object):
                       '<app_icon>', summary, body, actions, '<hints>',
                       expire_timeout])
 
-        if replaces_id > 0:
-            notification_id = replaces_id
-        else:
-            if self._notification_counter == sys.maxint:
-                self._notification_counter = 1
+        properties = {'app_name': app_name,
+                      'app_icon': app_icon,
+                      'summary': summary,
+                      'body': body,
+                      'actions': actions,
+                      'hints': hints,
+                      'expire_timeout': expire_timeout}
+
+        notification = self._notifications.get(replaces_id)
+        if notification is not None:
+            notification.properties = properties
+            if notification.visible:
+                self._show(notification, notification.notification_id)
+            return notification.notification_id
+
+        coalesced = self._find_by_app_name(app_name)
+
+        notification = _Notification(self._new_id(), app_name)
+        notification.properties = properties
+        self._notifications[notification.notification_id] = notification
+
+        if coalesced is not None:
+            self._remove(coalesced)
+            if coalesced.visible:
+                self._show(notification, coalesced.notification_id)
             else:
-                self._notification_counter += 1
-            notification_id = self._notification_counter
-
-        self.notification_received.send(self,
-                                        app_name=app_name,
-                                        replaces_id=replaces_id,
-                                        app_icon=app_icon,
-                                        summary=summary,
-                                        body=body,
-                                        actions=actions,
-                                        hints=hints,
-                                        expire_timeout=expire_timeout)
+                self._queue[self._queue.index(coalesced)] = notification
+            self.NotificationClosed(coalesced.notification_id,
+                                    CLOSED_UNDEFINED)
+        elif self._count_visible() < self._max_visible:
+            self._show(notification)
+        else:
+            self._queue.append(notification)
+
+        return notification.notification_id
+
+    def _count_visible(self):
+        return len([notification for notification
+                    in self._notifications.itervalues()
+                    if notification.visible])
+
+    def _show(self, notification, replaces_id=0):
+        notification.visible = True
+        if notification.timeout_sid is not None:
+            GLib.source_remove(notification.timeout_sid)
+            notification.timeout_sid = None
+
+        expire_timeout = notification.properties['expire_timeout']
+        if expire_timeout == -1:
+            expire_timeout = _DEFAULT_EXPIRE_TIMEOUT
+        if expire_timeout > 0:
+            notification.timeout_sid = GLib.timeout_add(
+                expire_timeout, self.__expired_cb, notification)
+
+        self.notification_received.send(
+            self, notification_id=notification.notification_id,
+            replaces_id=replaces_id, **notification.properties)
+
+    def __expired_cb(self, notification):
+        notification.timeout_sid = None
+        self.close_notification(notification.notification_id,
+                                CLOSED_EXPIRED)
+        return False
+
+    def _remove(self, notification):
+        del self._notifications[notification.notification_id]
+        if notification.timeout_sid is not None:
+            GLib.source_remove(notification.timeout_sid)
+            notification.timeout_sid = None
+
+    def close_notification(self, notification_id, reason=CLOSED_DISMISSED):
+        """Close a notification, the user dismissed it by default"""
+        notification = self._notifications.get(notification_id)
+        if notification is None:
+            return
+
+        self._remove(notification)
+        if notification.visible:
+            self.notification_cancelled.send(self,
+                                             notification_id=notification_id)
+        else:
+            self._queue.remove(notification)
+        self.NotificationClosed(notification_id, reason)
 
-        return notification_id
+        while self._queue and self._count_visible() < self._max_visible:
+            self._show(self._queue.pop(0))
 
     @dbus.service.method(_DBUS_IFACE, in_signature='u', out_signature='')
     def CloseNotification(self, notification_id):
-        self.notification_cancelled.send(self, notification_id=notification_id)
+        self.close_notification(notification_id, CLOSED_BY_CALL)
 
     @dbus.service.method(_DBUS_IFACE, in_signature='', out_signature='as')
     def GetCapabilities(self):
@@ -17,6 +17,7 @@
 
 import logging
 import time
+from collections import deque
 
 from gi.repository import Gio
 from gi.repository import Wnck
@@ -37,6 +38,8 @@ _SERVICE_NAME = 'org.laptop.Activity'
 _SERVICE_PATH = '/org/laptop/Activity'
 _SERVICE_INTERFACE = 'org.laptop.Activity'
 
+_LAUNCH_TIMES_SIZE = 100
+
 _model = None
 
 
@@ -401,6 +404,10 @@ class ShellModel(GObject.GObject):
         self._zoom_level = self.ZOOM_HOME
         self._current_activity = None
         self._activities = []
+        self._activities_by_id = {}
+        self._activities_by_xid = {}
+        self._launch_times = deque(maxlen=_LAUNCH_TIMES_SIZE)
+        self._pending_launch_times = {}
         self._shared_activities = {}
         self._active_activity = None
         self._tabbing_activity = None
@@ -607,8 +614,15 @@ class ShellModel(GObject.GObject):
                 home_activity.add_window(window, is_main_window(window,
                                                                 home_activity))
 
+            self._activities_by_xid[xid] = home_activity
+
+            launch_times = self._pending_launch_times.get(activity_id)
+            if launch_times is not None and not launch_times[3]:
+                launch_times[3] = time.time()
+
             if is_main_window(window, home_activity):
                 self.emit('launch-completed', home_activity)
+                self._finish_launch_times(activity_id, time.time())
                 startup_time = time.time() - home_activity.get_launch_time()
                 logging.debug('%s launched in %f seconds.',
                               activity_id, startup_time)
@@ -620,7 +634,7 @@ class ShellModel(GObject.GObject):
         if window.get_window_type() == Wnck.WindowType.NORMAL or \
                 window.get_window_type() == Wnck.WindowType.SPLASHSCREEN:
             xid = window.get_xid()
-            activity = self._get_activity_by_xid(xid)
+            activity = self._activities_by_xid.pop(xid, None)
             if activity is not None:
                 activity.remove_window_by_xid(xid)
                 if activity.get_window() is None:
@@ -629,16 +643,10 @@ class ShellModel(GObject.GObject):
                     self._remove_activity(activity)
 
     def _get_activity_by_xid(self, xid):
-        for home_activity in self._activities:
-            if home_activity.has_xid(xid):
-                return home_activity
-        return None
+        return self._activities_by_xid.get(xid)
 
     def get_activity_by_id(self, activity_id):
-        for home_activity in self._activities:
-            if home_activity.get_activity_id() == activity_id:
-                return home_activity
-        return None
+        return self._activities_by_id.get(activity_id)
 
     def _active_window_changed_cb(self, screen, previous_window=None):
         window = screen.get_active_window()
@@ -679,6 +687,9 @@ class ShellModel(GObject.GObject):
 
     def _add_activity(self, home_activity):
         self._activities.append(home_activity)
+        activity_id = home_activity.get_activity_id()
+        if activity_id is not None:
+            self._activities_by_id.setdefault(activity_id, home_activity)
         self.emit('activity-added', home_activity)
 
     def _remove_activity(self, home_activity):
@@ -697,6 +708,18 @@ class ShellModel(GObject.GObject):
         self.emit('activity-removed', home_activity)
         self._activities.remove(home_activity)
 
+        activity_id = home_activity.get_activity_id()
+        if self._activities_by_id.get(activity_id) is home_activity:
+            del self._activities_by_id[activity_id]
+            for other_activity in self._activities:
+                if other_activity.get_activity_id() == activity_id:
+                    self._activities_by_id[activity_id] = other_activity
+                    break
+        for xid, activity in self._activities_by_xid.items():
+            if activity is home_activity:
+                del self._activities_by_xid[xid]
+        self._finish_launch_times(activity_id, 0)
+
     def notify_launch(self, activity_id, service_name):
         registry = get_registry()
         activity_info = registry.get_bundle(service_name)
@@ -710,6 +733,9 @@ class ShellModel(GObject.GObject):
 
         self._set_active_activity(home_activity)
 
+        self._pending_launch_times[activity_id] = \
+            [service_name, activity_id, home_activity.get_launch_time(), 0, 0]
+
         self.emit('launch-started', home_activity)
 
         # FIXME: better learn about finishing processes by receiving a signal.
@@ -722,6 +748,7 @@ class ShellModel(GObject.GObject):
         if home_activity:
             logging.debug('Activity %s (%s) launch failed', activity_id,
                           home_activity.get_type())
+            self._finish_launch_times(activity_id, 0)
             if self.get_launcher(activity_id) is not None:
                 self.emit('launch-failed', home_activity)
             else:
@@ -744,6 +771,24 @@ class ShellModel(GObject.GObject):
             self.notify_launch_failed(activity_id)
         return False
 
+    def _finish_launch_times(self, activity_id, completion_time):
+        launch_times = self._pending_launch_times.pop(activity_id, None)
+        if launch_times is not None:
+            launch_times[4] = completion_time
+            self._launch_times.append(tuple(launch_times))
+
+    def get_launch_times(self):
+        """Return the timestamps of the most recent activity launches
+
+        Each launch is a (bundle_id, activity_id, started, window_mapped,
+        completed) tuple. Started is when the launch was notified, window
+        mapped is when the first window of the activity appeared, usually
+        the launcher, and completed is when its main window appeared.
+        Timestamps that were never reached, like the completion of a
+        failed launch, are 0.
+        """
+        return list(self._launch_times)
+
     def push_modal(self):
         self._modal_dialogs_counter += 1
 
@@ -30,7 +30,10 @@ DEFAULT_PITCH = 0
 
 DEFAULT_RATE = 0
 
+_MAX_QUEUED_UTTERANCES = 10
+
 _speech_manager = None
+_voices = None
 
 
 class SpeechManager(GObject.GObject):
@@ -135,6 +138,12 @@ class SpeechManager(GObject.GObject):
 
 
 class _GstSpeechPlayer(GObject.GObject):
+    """Speak utterances one after the other
+
+    A single espeak pipeline is built and reused, it is only rebuilt
+    after an error. Utterances that arrive while another one is being
+    spoken wait in a queue instead of interrupting it.
+    """
 
     __gsignals__ = {
         'play': (GObject.SignalFlags.RUN_FIRST, None, []),
@@ -145,9 +154,11 @@ class _GstSpeechPlayer(GObject.GObject):
     def __init__(self):
         GObject.GObject.__init__(self)
         self._pipeline = None
+        self._queue = []
+        self._speaking = False
 
     def restart_sound_device(self):
-        if self._pipeline is None:
+        if self._pipeline is None or not self._speaking:
             logging.debug('Trying to restart not initialized sound device')
             return
 
@@ -156,7 +167,7 @@ class _GstSpeechPlayer(GObject.GObject):
         self.emit('play')
 
     def pause_sound_device(self):
-        if self._pipeline is None:
+        if self._pipeline is None or not self._speaking:
             return
 
         self._pipeline.set_state(Gst.State.PAUSED)
@@ -164,29 +175,43 @@ class _GstSpeechPlayer(GObject.GObject):
         self.emit('pause')
 
     def stop_sound_device(self):
-        if self._pipeline is None:
+        del self._queue[:]
+        if self._pipeline is None or not self._speaking:
             return
 
+        self._speaking = False
         self._pipeline.set_state(Gst.State.NULL)
         power.get_power_manager().restore_suspend()
         self.emit('stop')
 
-    def make_pipeline(self, command):
+    def make_pipeline(self):
         if self._pipeline is not None:
-            self.stop_sound_device()
-            del self._pipeline
+            return
 
-        self._pipeline = Gst.parse_launch(command)
+        self._pipeline = Gst.parse_launch('espeak name=espeak ! autoaudiosink')
 
         bus = self._pipeline.get_bus()
         bus.add_signal_watch()
         bus.connect('message', self.__pipe_message_cb)
 
     def __pipe_message_cb(self, bus, message):
-        if message.type in (Gst.MessageType.EOS, Gst.MessageType.ERROR):
-            self._pipeline.set_state(Gst.State.NULL)
+        if message.type not in (Gst.MessageType.EOS, Gst.MessageType.ERROR):
+            return
+
+        self._pipeline.set_state(Gst.State.NULL)
+        if message.type == Gst.MessageType.ERROR:
+            logging.error('Speech pipeline error: %s',
+                          message.parse_error()[0].message)
+            bus.remove_signal_watch()
             self._pipeline = None
-            power.get_power_manager().restore_suspend()
+            del self._queue[:]
+
+        self._speaking = False
+        # every utterance inhibits suspend again when it starts playing
+        power.get_power_manager().restore_suspend()
+        if self._queue:
+            self._speak_next()
+        else:
             self.emit('stop')
 
     def speak(self, pitch, rate, voice_name, text):
@@ -194,26 +219,42 @@ class _GstSpeechPlayer(GObject.GObject):
         if not [i for i in text if i.isalnum()]:
             return
 
-        self.make_pipeline('espeak name=espeak ! autoaudiosink')
-        src = self._pipeline.get_by_name('espeak')
+        if len(self._queue) >= _MAX_QUEUED_UTTERANCES:
+            logging.debug('Too many utterances queued, dropping the oldest')
+            self._queue.pop(0)
+        self._queue.append((pitch, rate, voice_name, text))
 
+        if not self._speaking:
+            self._speak_next()
+
+    def _speak_next(self):
+        pitch, rate, voice_name, text = self._queue.pop(0)
+
+        self.make_pipeline()
+        # the pipeline is in the NULL state, where espeak takes a new text
+        src = self._pipeline.get_by_name('espeak')
         src.props.text = text
         src.props.pitch = pitch
         src.props.rate = rate
         src.props.voice = voice_name
         src.props.track = 2  # track for marks
 
+        self._speaking = True
         self.restart_sound_device()
 
     def get_all_voices(self):
-        all_voices = {}
-        for voice in Gst.ElementFactory.make('espeak', None).props.voices:
-            name, language, dialect = voice
-            if dialect != 'none':
-                all_voices[language + '_' + dialect] = name
-            else:
-                all_voices[language] = name
-        return all_voices
+        global _voices
+
+        # listing the voices loads all of them, do it only once
+        if _voices is None:
+            _voices = {}
+            for voice in Gst.ElementFactory.make('espeak', None).props.voices:
+                name, language, dialect = voice
+                if dialect != 'none':
+                    _voices[language + '_' + dialect] = name
+                else:
+                    _voices[language] = name
+        return dict(_voices)
 
     def get_default_voice(self):
         """Try to figure out the default voice, from the current locale ($LANG)
@@ -0,0 +1,64 @@
+# Copyright (C) 2013 One Laptop per Child
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+"""Thumbnails of the windows of the running activities
+
+The thumbnails are kept by activity id, only the most recently used ones
+are kept so that a lot of open activities don't take a lot of memory.
+"""
+
+from collections import OrderedDict
+
+_MAX_THUMBNAILS = 12
+
+_store = None
+
+
+class ThumbnailStore(object):
+    """Keep up to max_size thumbnails, dropping the least recently used"""
+
+    def __init__(self, max_size=_MAX_THUMBNAILS):
+        self._max_size = max_size
+        self._thumbnails = OrderedDict()
+
+    def put(self, activity_id, thumbnail):
+        self._thumbnails.pop(activity_id, None)
+        self._thumbnails[activity_id] = thumbnail
+        while len(self._thumbnails) > self._max_size:
+            self._thumbnails.popitem(last=False)
+
+    def get(self, activity_id):
+        """Return the thumbnail of activity_id, or None"""
+        thumbnail = self._thumbnails.pop(activity_id, None)
+        if thumbnail is not None:
+            self._thumbnails[activity_id] = thumbnail
+        return thumbnail
+
+    def remove(self, activity_id):
+        self._thumbnails.pop(activity_id, None)
+
+    def __contains__(self, activity_id):
+        return activity_id in self._thumbnails
+
+    def __len__(self):
+        return len(self._thumbnails)
+
+
+def get_store():
+    global _store
+    if _store is None:
+        _store = ThumbnailStore()
+    return _store
@@ -49,10 +49,12 @@ An example::
 """
 
 import logging
-from xml.etree.ElementTree import XML
+from xml.etree.ElementTree import XMLParser
+from xml.etree.ElementTree import ParseError
 
 from gi.repository import GLib
 from gi.repository import GObject
+from gi.repository import Gio
 
 from sugar3.bundle.bundleversion import NormalizedVersion
 from sugar3.bundle.bundleversion import InvalidVersionError
@@ -66,56 +68,84 @@ _FIND_DESCRIPTION = \
 _FIND_VERSION = './/{http://www.mozilla.org/2004/em-rdf#}version'
 _FIND_LINK = './/{http://www.mozilla.org/2004/em-rdf#}updateLink'
 _FIND_SIZE = './/{http://www.mozilla.org/2004/em-rdf#}updateSize'
+_FIND_HASH = './/{http://www.mozilla.org/2004/em-rdf#}updateHash'
 
 _UPDATE_PATH = 'http://activities.sugarlabs.org/services/update-aslo.php'
+_UPDATE_KEYS_PATH = 'org.sugarlabs.update'
+_CONCURRENT_CHECKS_KEY = 'concurrent-checks'
 
 _logger = logging.getLogger('ASLO')
 
 
 class _UpdateChecker(GObject.GObject):
+    """Check for an update of one bundle
+
+    The XML answer of the server is parsed as it arrives.
+    """
+
     __gsignals__ = {
         'check-complete': (GObject.SignalFlags.RUN_FIRST, None, (object,)),
     }
-    _CHUNK_SIZE = 10240
 
-    def __init__(self):
+    def __init__(self, bundle):
         GObject.GObject.__init__(self)
-        self._bundle = None
+        self._bundle = bundle
+        self._parser = None
+        self._downloader = None
 
-    def check(self, bundle):
+    def check(self):
         # ASLO knows only about stable SP releases
         major, minor = config.version.split('.')[0:2]
         sp_version = '%s.%s' % (major, int(minor) + int(minor) % 2)
 
         url = '%s?id=%s&appVersion=%s' % \
-            (_UPDATE_PATH, bundle.get_bundle_id(), sp_version)
-
-        self._bundle = bundle
+            (_UPDATE_PATH, self._bundle.get_bundle_id(), sp_version)
 
         _logger.debug('Fetch %s', url)
+        self._parser = XMLParser()
         self._downloader = Downloader(url)
+        self._downloader.connect('got-chunk', self.__downloader_got_chunk_cb)
         self._downloader.connect('complete', self.__downloader_complete_cb)
-        self._downloader.download()
+        self._downloader.download_chunked()
+
+    def cancel(self):
+        if self._downloader is not None:
+            self._downloader.cancel()
+
+    def __downloader_got_chunk_cb(self, downloader, data):
+        if self._parser is None:
+            return
+        try:
+            self._parser.feed(data.get_data())
+        except ParseError, e:
+            _logger.error('Invalid XML update data for %s: %s',
+                          self._bundle.get_bundle_id(), e)
+            self._parser = None
 
     def __downloader_complete_cb(self, downloader, result):
+        self._downloader = None
         if isinstance(result, Exception):
             self.emit('check-complete', result)
             return
 
-        if result is None:
-            _logger.error('No XML update data returned from ASLO')
+        document = None
+        if self._parser is not None:
+            try:
+                document = self._parser.close()
+            except ParseError, e:
+                _logger.error('Invalid XML update data for %s: %s',
+                              self._bundle.get_bundle_id(), e)
+
+        if document is None:
+            self.emit('check-complete',
+                      ValueError('No XML update data returned from ASLO'))
             return
 
-        document = XML(result.get_data())
-
         if document.find(_FIND_DESCRIPTION) is None:
             _logger.debug('Bundle %s not available in the server for the '
                           'version %s',
                           self._bundle.get_bundle_id(),
                           config.version)
-            version = None
-            link = None
-            size = None
             self.emit('check-complete', None)
             return
 
@@ -134,9 +164,16 @@ class _UpdateChecker(GObject.GObject):
             _logger.exception('Exception occured while parsing size')
             size = 0
 
+        sha256 = None
+        hash_element = document.find(_FIND_HASH)
+        if hash_element is not None and hash_element.text and \
+                hash_element.text.startswith('sha256:'):
+            sha256 = hash_element.text[len('sha256:'):].strip().lower()
+
         if version > NormalizedVersion(self._bundle.get_activity_version()):
             result = BundleUpdate(self._bundle.get_bundle_id(),
-                                  self._bundle.get_name(), version, link, size)
+                                  self._bundle.get_name(), version, link, size,
+                                  sha256)
         else:
             result = None
 
@@ -146,40 +183,78 @@ class _UpdateChecker(GObject.GObject):
 class AsloUpdater(object):
     """
     Track state while querying Activites.SugarLabs.Org for activity updates.
+
+    Up to max_checks bundles are checked at the same time, the number is
+    read from the settings if not given.
     """
 
-    def __init__(self):
+    def __init__(self, max_checks=None):
+        if max_checks is None:
+            settings = Gio.Settings(_UPDATE_KEYS_PATH)
+            max_checks = settings.get_int(_CONCURRENT_CHECKS_KEY)
+        self._max_checks = max(1, max_checks)
         self._completion_cb = None
         self._progress_cb = None
+        self._error_cb = None
         self._cancelling = False
-        self._updates = []
-        self._checker = _UpdateChecker()
-        self._checker.connect('check-complete', self._check_complete_cb)
+        self._finished = True
+        self._results = []
+        self._checkers = {}
+        self._bundles_to_check = []
+        self._total_bundles_to_check = 0
+        self._checked = 0
+
+    def _check_complete_cb(self, checker, result, bundle, index):
+        del self._checkers[checker]
 
-    def _check_complete_cb(self, checker, result):
         if isinstance(result, Exception):
             logging.warning("Failed to check bundle: %r", result)
         elif isinstance(result, BundleUpdate):
-            self._updates.append(result)
+            self._results[index] = result
 
         if self._cancelling:
-            self._completion_cb(None)
-        else:
-            GLib.idle_add(self._check_next_update)
-
-    def _check_next_update(self):
-        total = self._total_bundles_to_check
-        current = total - len(self._bundles_to_check)
-        progress = current / float(total)
-
-        if not self._bundles_to_check:
-            self._completion_cb(self._updates)
+            self._finish(None)
             return
 
-        bundle = self._bundles_to_check.pop()
-        _logger.debug("Checking %s", bundle.get_bundle_id())
+        self._checked += 1
+        progress = self._checked / float(self._total_bundles_to_check)
         self._progress_cb(bundle.get_name(), progress)
-        self._checker.check(bundle)
+
+        GLib.idle_add(self._check_next_updates)
+
+    def _check_next_updates(self):
+        if self._finished:
+            return False
+
+        if self._cancelling:
+            self._finish(None)
+            return False
+
+        while self._bundles_to_check and \
+                len(self._checkers) < self._max_checks:
+            # bundles are checked in the order of the serial updater, from
+            # the end of the list, and the results kept in that order
+            index = self._total_bundles_to_check - \
+                len(self._bundles_to_check)
+            bundle = self._bundles_to_check.pop()
+            _logger.debug("Checking %s", bundle.get_bundle_id())
+
+            checker = _UpdateChecker(bundle)
+            checker.connect('check-complete', self._check_complete_cb,
+                            bundle, index)
+            self._checkers[checker] = bundle
+            checker.check()
+
+        if not self._checkers:
+            self._finish([result for result in self._results
+                          if result is not None])
+        return False
+
+    def _finish(self, updates):
+        if self._finished:
+            return
+        self._finished = True
+        self._completion_cb(updates)
 
     def fetch_update_info(self, installed_bundles, auto, progress_cb,
                           completion_cb, error_cb):
@@ -187,10 +262,15 @@ class AsloUpdater(object):
         self._progress_cb = progress_cb
         self._error_cb = error_cb
         self._cancelling = False
-        self._updates = []
-        self._bundles_to_check = installed_bundles
+        self._finished = False
+        self._bundles_to_check = list(installed_bundles)
         self._total_bundles_to_check = len(self._bundles_to_check)
-        self._check_next_update()
+        self._results = [None] * self._total_bundles_to_check
+        self._checked = 0
+        self._progress_cb(None, 0)
+        self._check_next_updates()
 
     def cancel(self):
         self._cancelling = True
+        for checker in self._checkers.keys():
+            checker.cancel()
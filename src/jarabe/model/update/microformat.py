@@ -25,6 +25,7 @@ http://wiki.sugarlabs.org/go/Activity_Team/Activity_Microformat
 import os
 import locale
 import logging
+from threading import Thread, Lock
 from StringIO import StringIO
 from ConfigParser import ConfigParser
 from zipfile import ZipFile
@@ -45,6 +46,11 @@ from jarabe.util.downloader import Downloader
 _logger = logging.getLogger('microformat')
 _MICROFORMAT_URL_PATH = 'org.sugarlabs.update'
 _MICROFORMAT_URL_KEY = 'microformat-update-url'
+_CONCURRENT_CHECKS_KEY = 'concurrent-checks'
+
+# (url, version) -> [name, size] of the bundles looked up already
+_metadata_cache = {}
+_lookup_queue = None
 
 
 class _UpdateHTMLParser(HTMLParser):
@@ -171,7 +177,18 @@ class MicroformatUpdater(object):
           lookup the size of the download.
        b) If we don't have the activity installed, use MetadataLookup
           to lookup activity name and size.
+    Several updates are checked at the same time, and the results of the
+    lookups are cached for the next time the same bundles are checked.
     """
+    def __init__(self, max_checks=None):
+        if max_checks is None:
+            settings = Gio.Settings(_MICROFORMAT_URL_PATH)
+            max_checks = settings.get_int(_CONCURRENT_CHECKS_KEY)
+        self._max_checks = max(1, max_checks)
+        self._finished = True
+        self._checks = 0
+        self._results = []
+
     def _query(self):
         settings = Gio.Settings(_MICROFORMAT_URL_PATH)
         url = settings.get_string(_MICROFORMAT_URL_KEY)
@@ -202,7 +219,7 @@ class MicroformatUpdater(object):
         self._parser.close()
         _logger.debug("Found %d activities", len(self._parser.results))
         self._filter_results()
-        self._check_next_update()
+        self._check_next_updates()
 
     def _filter_results(self):
         # Remove updates for which we already have an equivalent or newer
@@ -219,68 +236,113 @@ class MicroformatUpdater(object):
             bundle_update = BundleUpdate(bundle_id, name, data[0], data[1], 0)
             self._bundles_to_check.append(bundle_update)
         self._total_bundles_to_check = len(self._bundles_to_check)
+        self._results = [None] * self._total_bundles_to_check
         _logger.debug("%d results after filter", self._total_bundles_to_check)
 
-    def _check_next_update(self):
-        if self._cancelling or len(self._bundles_to_check) == 0:
-            self._completion_cb(self._updates)
-            return
-
-        total = self._total_bundles_to_check
-        current = total - len(self._bundles_to_check)
-        progress = current / float(total)
-
-        self._bundle_update = self._bundles_to_check.pop()
-        _logger.debug("Check %s", self._bundle_update.bundle_id)
+    def _check_next_updates(self):
+        if self._finished:
+            return False
+
+        if self._cancelling or not self._bundles_to_check:
+            if self._checks == 0:
+                self._finished = True
+                self._completion_cb([bundle_update for bundle_update
+                                     in self._results
+                                     if bundle_update is not None])
+            return False
+
+        while self._bundles_to_check and self._checks < self._max_checks:
+            # keep the results in the order in which the updates are taken
+            index = self._total_bundles_to_check - \
+                len(self._bundles_to_check)
+            bundle_update = self._bundles_to_check.pop()
+            self._checks += 1
+            self._check_update(bundle_update, index)
+        return False
+
+    def _check_update(self, bundle_update, index):
+        _logger.debug("Check %s", bundle_update.bundle_id)
 
         # There is no need for a special name lookup for an automatic update.
         # The name lookup is only for UI purposes, but we are running in the
         # background.
-        if self._bundle_update.name is None and self._auto:
-            self._bundle_update.name = self._bundle_update.bundle_id
+        if bundle_update.name is None and self._auto:
+            bundle_update.name = bundle_update.bundle_id
+
+        key = (bundle_update.link, str(bundle_update.version))
+        name, size = _metadata_cache.get(key, (None, None))
+
+        if bundle_update.name is not None:
+            if size is not None:
+                bundle_update.size = size
+                self._check_done(bundle_update, index)
+                return
 
-        if self._bundle_update.name is not None:
             # if we know the name, we just perform an asynchronous size check
             _logger.debug("Performing async size lookup")
-            size_check = Downloader(self._bundle_update.link)
-            size_check.connect('complete', self._size_lookup_cb)
+            size_check = Downloader(bundle_update.link)
+            size_check.connect('complete', self._size_lookup_cb,
+                               bundle_update, index)
             size_check.get_size()
-            self._progress_cb(self._bundle_update.name, progress)
         else:
+            if name is not None:
+                bundle_update.name = name
+                bundle_update.size = size
+                self._check_done(bundle_update, index)
+                return
+
             # if we don't know the name, we run a metadata lookup and get
             # the size and name that way
             _logger.debug("Performing metadata lookup")
-            namelookup = MetadataLookup(self._bundle_update.link)
-            namelookup.connect('complete', self._name_lookup_complete)
+            namelookup = MetadataLookup(bundle_update.link)
+            namelookup.connect('complete', self._name_lookup_complete,
+                               bundle_update, index)
             namelookup.run()
-            self._progress_cb(self._bundle_update.bundle_id, progress)
 
-    def _size_lookup_cb(self, downloader, result):
+    def _check_done(self, bundle_update, index):
+        self._checks -= 1
+        if bundle_update is not None:
+            self._results[index] = bundle_update
+
+        total = self._total_bundles_to_check
+        current = total - len(self._bundles_to_check) - self._checks
+        progress = current / float(total)
+        name = bundle_update.name if bundle_update else None
+        self._progress_cb(name, progress)
+
+        GLib.idle_add(self._check_next_updates)
+
+    def _size_lookup_cb(self, downloader, result, bundle_update, index):
         if isinstance(result, Exception):
             _logger.warning("Failed to perform size lookup: %s", result)
-        else:
-            self._bundle_update.size = result
-            self._updates.append(self._bundle_update)
+            self._check_done(None, index)
+            return
+
+        key = (bundle_update.link, str(bundle_update.version))
+        _metadata_cache.setdefault(key, [None, None])[1] = result
 
-        GLib.idle_add(self._check_next_update)
+        bundle_update.size = result
+        self._check_done(bundle_update, index)
 
-    def _name_lookup_complete(self, lookup, result, size):
+    def _name_lookup_complete(self, lookup, result, size, bundle_update,
+                              index):
         _logger.debug("Name lookup result: %r", result)
         if size is None:
             # if the size lookup failed, assume this update is bad
-            self._check_next_update()
+            self._check_done(None, index)
             return
 
         if result is None or isinstance(result, Exception):
             # if we failed to find the name, add the update anyway, using the
             # bundle_id as the best name we have
-            self._bundle_update.name = self._bundle_update.bundle_id
+            bundle_update.name = bundle_update.bundle_id
         else:
-            self._bundle_update.name = result
+            bundle_update.name = result
+            key = (bundle_update.link, str(bundle_update.version))
+            _metadata_cache[key] = [result, size]
 
-        self._bundle_update.size = size
-        self._updates.append(self._bundle_update)
-        self._check_next_update()
+        bundle_update.size = size
+        self._check_done(bundle_update, index)
 
     def fetch_update_info(self, installed_bundles, auto, progress_cb,
                           completion_cb, error_cb):
@@ -288,7 +350,9 @@ class MicroformatUpdater(object):
         self._progress_cb = progress_cb
         self._error_cb = error_cb
         self._cancelling = False
-        self._updates = []
+        self._finished = False
+        self._checks = 0
+        self._results = []
         self._bundles_to_check = []
         self._total_bundles_to_check = 0
         self._auto = auto
@@ -298,6 +362,43 @@ class MicroformatUpdater(object):
         self._cancelling = True
 
 
+class _LookupQueue(object):
+    """Run metadata lookups one after the other in a thread"""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._queue = []
+        self._thread_running = False
+
+    def enqueue(self, lookup):
+        self._lock.acquire()
+        self._queue.append(lookup)
+        if not self._thread_running:
+            self._thread_running = True
+            Thread(target=self._thread_func).start()
+        self._lock.release()
+
+    def _thread_func(self):
+        while True:
+            self._lock.acquire()
+            if len(self._queue) == 0:
+                self._thread_running = False
+                self._lock.release()
+                return
+
+            lookup = self._queue.pop(0)
+            self._lock.release()
+
+            lookup.run_sync()
+
+
+def _get_lookup_queue():
+    global _lookup_queue
+    if _lookup_queue is None:
+        _lookup_queue = _LookupQueue()
+    return _lookup_queue
+
+
 class MetadataLookup(GObject.GObject):
     """
     Look up the localized activity name and size of a bundle.
@@ -315,6 +416,11 @@ class MetadataLookup(GObject.GObject):
         self._size = None
 
     def run(self):
+        """Look up the name in a thread, complete is emitted in the main
+        loop"""
+        _get_lookup_queue().enqueue(self)
+
+    def run_sync(self):
         # Perform the name lookup, catch any exceptions, and report the result.
         try:
             name = self._do_name_lookup()
@@ -323,7 +429,7 @@ class MetadataLookup(GObject.GObject):
             self._complete(e)
 
     def _do_name_lookup(self):
-        fd = httprange.open(self._url)
+        fd = httprange.open(self._url, blocking=True)
         self._size = fd.size()
         return self._name_from_fd(fd)
 
@@ -35,6 +35,7 @@ _UPDATE_KEYS_PATH = 'org.sugarlabs.update'
 _LAST_UPDATE_KEY = 'last-activity-update'
 _UPDATE_FREQUENCY_KEY = 'auto-update-frequency'
 _UPDATE_BACKEND_KEY = 'backend'
+_CONCURRENT_DOWNLOADS_KEY = 'concurrent-downloads'
 _URGENT_TRIGGER_FILE = os.path.expanduser('~/.sugar-update')
 
 STATE_IDLE = 0
@@ -74,15 +75,22 @@ class Updater(GObject.GObject):
         _logger.debug("Use backend %s.%s", module_name, class_name)
         module = importlib.import_module("jarabe.model.update." + module_name)
         self._model = getattr(module, class_name)()
+        self._max_downloads = settings.get_int(_CONCURRENT_DOWNLOADS_KEY)
 
         self._updates = None
         self._bundles_to_update = None
         self._total_bundles_to_update = 0
-        self._bundle_update = None
         self._bundles_updated = None
         self._bundles_failed = None
 
-        self._downloader = None
+        # bundle updates being downloaded, by downloader
+        self._downloaders = {}
+        # download progress of each update, by bundle id
+        self._download_progress = {}
+        # downloaded updates waiting to be installed, and their archives
+        self._installs = []
+        self._installing = False
+        self._installed = 0
         self._cancelling = False
         self._state = STATE_IDLE
         self._auto = False
@@ -147,78 +155,118 @@ class Updater(GObject.GObject):
         self._total_bundles_to_update = len(self._bundles_to_update)
         _logger.debug("Starting update of %d activities",
                       self._total_bundles_to_update)
-        self._download_next_update()
-
-    def _download_next_update(self):
-        if self._cancelling:
-            self._finished(True)
-            return
-
-        if len(self._bundles_to_update) == 0:
-            self._finished()
-            return
 
+        self._downloaders = {}
+        self._download_progress = {}
+        self._installs = []
+        self._installing = False
+        self._installed = 0
         self._state = STATE_DOWNLOADING
-        self._bundle_update = self._bundles_to_update.pop()
-        _logger.debug("Downloading update for %s",
-                      self._bundle_update.bundle_id)
+        self._download_next_updates()
 
+    def _emit_progress(self, state, bundle_name):
+        # each update counts once for its download and once for its install
         total = self._total_bundles_to_update * 2
-        current = total - len(self._bundles_to_update) * 2 - 2
-        progress = current / float(total)
-        self.emit('progress', self._state, self._bundle_update.name, progress)
+        current = sum(self._download_progress.values()) + self._installed
+        self.emit('progress', state, bundle_name, current / float(total))
+
+    def _download_next_updates(self):
+        # Downloads run concurrently, and each update is queued for install
+        # as soon as it is downloaded
+        while not self._cancelling and self._bundles_to_update and \
+                len(self._downloaders) < self._max_downloads:
+            bundle_update = self._bundles_to_update.pop()
+            _logger.debug("Downloading update for %s",
+                          bundle_update.bundle_id)
+
+            downloader = Downloader(bundle_update.link)
+            downloader.connect('progress', self.__downloader_progress_cb,
+                               bundle_update)
+            downloader.connect('complete', self.__downloader_complete_cb,
+                               bundle_update)
+            self._downloaders[downloader] = bundle_update
+            self._download_progress[bundle_update.bundle_id] = 0
+            self._emit_progress(STATE_DOWNLOADING, bundle_update.name)
+            downloader.download_to_temp()
+
+        self._check_finished()
+        return False
 
-        self._downloader = Downloader(self._bundle_update.link)
-        self._downloader.connect('progress', self.__downloader_progress_cb)
-        self._downloader.connect('complete', self.__downloader_complete_cb)
-        self._downloader.download_to_temp()
+    def __downloader_complete_cb(self, downloader, result, bundle_update):
+        del self._downloaders[downloader]
+        self._download_progress[bundle_update.bundle_id] = 1
 
-    def __downloader_complete_cb(self, downloader, result):
+        file_path = downloader.get_local_file_path()
         if self._cancelling:
-            self._cleanup_downloader()
-            self._finished(True)
-            return
-
-        if isinstance(result, Exception):
+            self._remove_archive(file_path)
+        elif isinstance(result, Exception):
             _logger.error('Error downloading update: %s', result)
-            self._cleanup_downloader()
-            self._bundles_failed.append(self._bundle_update)
-            self._download_next_update()
+            self._bundles_failed.append(bundle_update)
+            # there is nothing left to install for this update
+            self._installed += 1
+        elif bundle_update.sha256 is not None and \
+                bundle_update.sha256 != downloader.get_sha256():
+            _logger.error('Corrupted download of %s, expected SHA-256 %s '
+                          'but got %s', bundle_update.bundle_id,
+                          bundle_update.sha256, downloader.get_sha256())
+            self._remove_archive(file_path)
+            self._bundles_failed.append(bundle_update)
+            self._installed += 1
         else:
-            self._install_update(self._bundle_update,
-                                 self._downloader.get_local_file_path())
-            self._downloader = None
+            self._installs.append((bundle_update, file_path))
+            self._install_next_update()
 
-    def __downloader_progress_cb(self, downloader, progress):
-        total = self._total_bundles_to_update * 2
-        current = total - len(self._bundles_to_update) * 2 - 2 + progress
-        progress = current / float(total)
-        self.emit('progress', self._state, self._bundle_update.name, progress)
+        if not self._bundles_to_update and not self._downloaders:
+            self._state = STATE_UPDATING
+
+        # do it in idle so the UI has a chance to refresh
+        GLib.idle_add(self._download_next_updates)
+
+    def __downloader_progress_cb(self, downloader, progress, bundle_update):
+        self._download_progress[bundle_update.bundle_id] = progress
+        self._emit_progress(STATE_DOWNLOADING, bundle_update.name)
 
-    def _install_update(self, bundle_update, local_file_path):
-        self._state = STATE_UPDATING
-        total = self._total_bundles_to_update
-        current = total - len(self._bundles_to_update) - 0.5
-        progress = current / float(total)
+    def _install_next_update(self):
+        # Installs are done one at a time, in the order downloads finish
+        if self._installing or not self._installs:
+            return
 
+        if self._cancelling:
+            for bundle_update_, file_path in self._installs:
+                self._remove_archive(file_path)
+            self._installs = []
+            self._check_finished()
+            return
+
+        bundle_update, file_path = self._installs.pop(0)
         _logger.debug("Installing update for %s", bundle_update.bundle_id)
-        self.emit('progress', self._state, bundle_update.name, progress)
+        self._emit_progress(STATE_UPDATING, bundle_update.name)
 
-        current += 0.5
-        bundle = bundle_from_archive(local_file_path)
+        try:
+            bundle = bundle_from_archive(file_path)
+        except Exception:
+            _logger.exception('Invalid update archive for %s',
+                              bundle_update.bundle_id)
+            self._remove_archive(file_path)
+            self._bundles_failed.append(bundle_update)
+            self._installed += 1
+            GLib.idle_add(self._install_next_update)
+            self._check_finished()
+            return
+
+        self._installing = True
         registry = bundleregistry.get_registry()
-        registry.install_async(bundle, self._bundle_installed_cb, current)
+        registry.install_async(bundle, self._bundle_installed_cb,
+                               bundle_update)
 
-    def _bundle_installed_cb(self, bundle, result, progress):
+    def _bundle_installed_cb(self, bundle, result, bundle_update):
         _logger.debug("%s installed: %r", bundle.get_bundle_id(), result)
-        progress = progress / float(self._total_bundles_to_update)
-        self.emit('progress', self._state, bundle.get_name(), progress)
+        self._installing = False
+        self._installed += 1
+        self._emit_progress(STATE_UPDATING, bundle.get_name())
 
         # Remove downloaded bundle archive
-        try:
-            os.unlink(bundle.get_path())
-        except OSError:
-            pass
+        self._remove_archive(bundle.get_path())
 
         if result is True:
             self._bundles_updated.append(bundle)
@@ -226,7 +274,20 @@ class Updater(GObject.GObject):
             self._bundles_failed.append(bundle)
 
         # do it in idle so the UI has a chance to refresh
-        GLib.idle_add(self._download_next_update)
+        GLib.idle_add(self._install_next_update)
+        self._check_finished()
+
+    def _check_finished(self):
+        if self._state not in (STATE_DOWNLOADING, STATE_UPDATING):
+            return
+
+        if self._downloaders or self._installing or self._installs:
+            return
+
+        if self._cancelling:
+            self._finished(True)
+        elif not self._bundles_to_update:
+            self._finished()
 
     def _finished(self, cancelled=False):
         self._state = STATE_IDLE
@@ -251,19 +312,19 @@ class Updater(GObject.GObject):
 
         self._cancelling = True
         self._model.cancel()
-        if self._downloader:
-            self._downloader.cancel()
+        # the partial downloads are kept, to be resumed the next time
+        for downloader in self._downloaders.keys():
+            downloader.cancel()
+        self._install_next_update()
 
-    def _cleanup_downloader(self):
-        if self._downloader is None:
+    def _remove_archive(self, file_path):
+        if file_path is None:
             return
 
-        file_path = self._downloader.get_local_file_path()
-        if file_path is not None:
-            try:
-                os.unlink(file_path)
-            except OSError:
-                pass
+        try:
+            os.unlink(file_path)
+        except OSError:
+            pass
 
 
 def get_instance():
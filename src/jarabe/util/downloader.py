@@ -16,25 +16,96 @@
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301 USA
 
 import os
+import logging
+import hashlib
 from urlparse import urlparse
 import tempfile
 
 from gi.repository import GObject
+from gi.repository import GLib
 from gi.repository import Soup
 from gi.repository import Gio
 
 from jarabe import config
+from jarabe.util import httpcache
 from sugar3 import env
 
 _session = None
 
 SOUP_STATUS_CANCELLED = 1
+SOUP_STATUS_PARTIAL_CONTENT = 206
+SOUP_STATUS_NOT_MODIFIED = 304
+
+_MAX_CACHED_CHUNKS_SIZE = 1024 * 1024
+_HASH_BLOCK_SIZE = 64 * 1024
 
 
 def soup_status_is_successful(status):
     return status >= 200 and status < 300
 
 
+class _FileHasher(object):
+    """Compute the SHA-256 of a file, or of its first size bytes, with
+    asynchronous reads
+
+    callback is called with the hash object, or None and the error.
+    """
+
+    def __init__(self, path, size, callback):
+        self._remaining = size
+        self._callback = callback
+        self._sha256 = hashlib.sha256()
+        self._stream = None
+
+        Gio.File.new_for_path(path).read_async(
+            GLib.PRIORITY_LOW, None, self.__read_cb, None)
+
+    def __read_cb(self, gfile, result, user_data):
+        try:
+            self._stream = gfile.read_finish(result)
+        except GLib.GError, e:
+            logging.error('Could not read %s: %s', gfile.get_path(), e)
+            self._callback(None, e)
+            return
+
+        self._read_block()
+
+    def _read_block(self):
+        size = _HASH_BLOCK_SIZE
+        if self._remaining is not None:
+            size = min(self._remaining, size)
+        if size == 0:
+            self._finish(None)
+            return
+
+        self._stream.read_bytes_async(size, GLib.PRIORITY_LOW, None,
+                                      self.__read_bytes_cb, None)
+
+    def __read_bytes_cb(self, stream, result, user_data):
+        try:
+            data = stream.read_bytes_finish(result).get_data() or ''
+        except GLib.GError, e:
+            logging.error('Could not read stream: %s', e)
+            self._finish(e)
+            return
+
+        if not data:
+            self._finish(None)
+            return
+
+        self._sha256.update(data)
+        if self._remaining is not None:
+            self._remaining -= len(data)
+        self._read_block()
+
+    def _finish(self, error):
+        self._stream.close_async(GLib.PRIORITY_LOW, None, None, None)
+        if error is None:
+            self._callback(self._sha256, None)
+        else:
+            self._callback(None, error)
+
+
 def get_soup_session():
     global _session
     if _session is None:
@@ -59,17 +130,31 @@ class Downloader(GObject.GObject):
                      (object,)),
     }
 
-    def __init__(self, url, session=None, request_headers=None):
+    def __init__(self, url, session=None, request_headers=None, cache=None):
         GObject.GObject.__init__(self)
         self._uri = Soup.URI.new(url)
+        self._url = self._uri.to_string(False)
         self._session = session or get_soup_session()
+        self._cache = cache or httpcache.get_cache()
         self._pending_buffers = []
         self._downloaded_size = 0
         self._total_size = 0
+        self._transferred_size = 0
+        self._cached_size = 0
         self._cancelling = False
         self._status_code = None
         self._output_file = None
         self._output_stream = None
+        self._local_file_path = None
+        self._resume_offset = 0
+        self._cache_validators = None
+        self._validators = None
+        self._chunks = None
+        self._cacheable = False
+        self._sha256 = None
+        self._hasher = None
+        self._hash_error = None
+        self._digest = None
         self._message = None
         self._request_headers = request_headers
 
@@ -82,19 +167,54 @@ class Downloader(GObject.GObject):
                 self._message.request_headers.append(
                     header_key, self._request_headers[header_key])
 
+    def _setup_conditional_message(self):
+        # Ask the server to only send the content if it changed since it
+        # was cached
+        self._setup_message()
+        self._cacheable = True
+        self._cache_validators = self._cache.lookup(self._url)
+        if self._cache_validators is None:
+            return
+
+        headers = self._message.request_headers
+        if 'etag' in self._cache_validators:
+            headers.append('If-None-Match', self._cache_validators['etag'])
+        if 'last-modified' in self._cache_validators:
+            headers.append('If-Modified-Since',
+                           self._cache_validators['last-modified'])
+
+    def _setup_resume(self):
+        # Continue an interrupted download, if the server still has the
+        # same content
+        validators = self._cache.get_partial_validators(self._url)
+        if validators is None:
+            return
+
+        offset = os.path.getsize(self._output_file.get_path())
+        if offset == 0:
+            return
+
+        self._resume_offset = offset
+        self._message.request_headers.set_range(offset, -1)
+        if_range = validators.get('etag', validators.get('last-modified'))
+        self._message.request_headers.append('If-Range', if_range)
+
     def download_to_temp(self):
         """
         Download the contents of the provided URL to temporary file storage.
         Use .get_local_file_path() to find the location of where the file
         is saved. Upon completion, a successful download is indicated by a
         result of None in the complete signal parameters.
+        An interrupted download is resumed from where it stopped.
         """
-        url = self._uri.to_string(False)
-        temp_file_path = self._get_temp_file_path(url)
-        self._output_file = Gio.File.new_for_path(temp_file_path)
-        self._output_stream = self._output_file.create(
-            Gio.FileCreateFlags.PRIVATE, None)
-        self.download_chunked()
+        self._output_file = Gio.File.new_for_path(
+            self._cache.get_partial_path(self._url))
+        self._sha256 = hashlib.sha256()
+        self._setup_conditional_message()
+        if self._cache_validators is None:
+            self._setup_resume()
+        self._message.response_body.set_accumulate(False)
+        self._session.queue_message(self._message, self._message_cb, None)
 
     def download_chunked(self):
         """
@@ -103,7 +223,8 @@ class Downloader(GObject.GObject):
         signal. Upon completion, a successful download is indicated by a
         reuslt of None in the complete signal parameters.
         """
-        self._setup_message()
+        self._setup_conditional_message()
+        self._chunks = []
         self._message.response_body.set_accumulate(False)
         self._session.queue_message(self._message, self._message_cb, None)
 
@@ -115,9 +236,11 @@ class Downloader(GObject.GObject):
         The start and end parameters can optionally be set to perform a
         partial read of the remote data.
         """
-        self._setup_message()
         if start is not None:
+            self._setup_message()
             self._message.request_headers.set_range(start, end)
+        else:
+            self._setup_conditional_message()
         self._session.queue_message(self._message, self._message_cb, None)
 
     def get_size(self):
@@ -136,9 +259,54 @@ class Downloader(GObject.GObject):
         self._cancelling = True
         self._session.cancel_message(self._message, SOUP_STATUS_CANCELLED)
 
+    def get_transferred_size(self):
+        """Return the number of bytes received from the network"""
+        return self._transferred_size
+
+    def get_cached_size(self):
+        """Return the number of bytes that did not need to be downloaded,
+        because they were cached or a previous download was resumed
+        """
+        return self._cached_size
+
+    def get_sha256(self):
+        """Return the SHA-256 hex digest of the file saved by
+        download_to_temp(), once it is complete
+        """
+        return self._digest
+
     def _headers_cb(self, message, user_data):
-        if soup_status_is_successful(message.status_code):
-            self._total_size = message.response_headers.get_content_length()
+        if not soup_status_is_successful(message.status_code):
+            return
+
+        self._total_size = message.response_headers.get_content_length()
+        self._validators = httpcache.get_validators(message.response_headers)
+
+        if self._output_file is None or self._output_stream is not None:
+            return
+
+        if message.status_code == SOUP_STATUS_PARTIAL_CONTENT and \
+                self._resume_offset > 0:
+            self._output_stream = self._output_file.append_to(
+                Gio.FileCreateFlags.PRIVATE, None)
+            self._downloaded_size = self._resume_offset
+            self._cached_size = self._resume_offset
+            self._total_size += self._resume_offset
+            # the received data is only written, and hashed, once the
+            # data that is already there has been hashed
+            self._sha256 = None
+            self._hasher = _FileHasher(self._output_file.get_path(),
+                                       self._resume_offset,
+                                       self.__partial_hashed_cb)
+        else:
+            self._resume_offset = 0
+            self._sha256 = hashlib.sha256()
+            self._cache.remove_partial(self._url)
+            self._output_stream = self._output_file.replace(
+                None, False, Gio.FileCreateFlags.PRIVATE, None)
+            if self._validators is not None:
+                self._cache.set_partial_validators(self._url,
+                                                   self._validators)
 
     def _got_chunk_cb(self, message, buf):
         if self._cancelling or \
@@ -146,10 +314,37 @@ class Downloader(GObject.GObject):
             return
 
         data = buf.get_as_bytes()
+        self._transferred_size += data.get_size()
         self.emit('got-chunk', data)
         if self._output_stream:
             self._pending_buffers.append(data)
             self._write_next_buffer()
+        elif self._chunks is not None:
+            # keep small documents to cache them once complete
+            self._chunks.append(data.get_data())
+            if self._transferred_size > _MAX_CACHED_CHUNKS_SIZE:
+                self._chunks = None
+
+    def __partial_hashed_cb(self, sha256, error):
+        self._hasher = None
+        if error is not None:
+            self._hash_error = error
+            if self._status_code is None:
+                # completes once the message is cancelled
+                self.cancel()
+                return
+        else:
+            self._sha256 = sha256
+        self._check_if_finished()
+
+    def __cached_file_hashed_cb(self, sha256, error):
+        self._hasher = None
+        if error is not None:
+            self._emit_complete(error)
+            return
+
+        self._digest = sha256.hexdigest()
+        self._emit_complete(None)
 
     def __write_async_cb(self, output_stream, result, user_data):
         count = output_stream.write_bytes_finish(result)
@@ -166,10 +361,25 @@ class Downloader(GObject.GObject):
             self._output_stream.close(None)
 
         result = None
-        if soup_status_is_successful(self._status_code):
+        if self._hash_error is not None:
+            # the partial file can't be read, start from scratch next time
+            self._cache.remove_partial(self._url)
+            result = self._hash_error
+        elif self._status_code == SOUP_STATUS_NOT_MODIFIED and \
+                self._cache_validators is not None:
+            try:
+                result = self._complete_from_cache()
+            except (IOError, OSError), e:
+                result = e
+            if self._hasher is not None:
+                # complete once the digest of the cached file is known
+                return
+        elif soup_status_is_successful(self._status_code):
             if self._message.method == "HEAD":
                 # this is a get_size request
                 result = self._total_size
+            elif self._output_file is not None:
+                self._finish_output_file()
             elif self._message.response_body.get_accumulate():
                 # the message body must be flattened so that it can be
                 # retrieved as GBytes because response_body.data gets
@@ -177,10 +387,71 @@ class Downloader(GObject.GObject):
                 # string
                 # https://bugzilla.gnome.org/show_bug.cgi?id=704105
                 result = self._message.response_body.flatten().get_as_bytes()
+                if self._cacheable:
+                    self._store_data(result.get_data() or '')
+            elif self._chunks is not None:
+                self._store_data(''.join(self._chunks))
         else:
+            if self._output_file is not None and self._status_code >= 100:
+                # only keep the partial file after network errors, the
+                # server will send the same error again when resuming
+                self._cache.remove_partial(self._url)
             result = IOError("HTTP error code %d" % self._status_code)
+
+        self._emit_complete(result)
+
+    def _emit_complete(self, result):
+        logging.debug('%s: %d bytes transferred, %d bytes from cache',
+                      self._url, self._transferred_size, self._cached_size)
         self.emit('complete', result)
 
+    def _store_data(self, data):
+        if self._validators is None:
+            return
+        validators = dict(self._validators,
+                          sha256=hashlib.sha256(data).hexdigest())
+        try:
+            self._cache.store_data(self._url, validators, data)
+        except (IOError, OSError), e:
+            logging.warning('Could not cache %s: %s', self._url, e)
+
+    def _finish_output_file(self):
+        partial_path = self._output_file.get_path()
+        self._digest = self._sha256.hexdigest()
+        if self._validators is not None:
+            try:
+                self._cache.store_file(self._url,
+                                       dict(self._validators,
+                                            sha256=self._digest),
+                                       partial_path)
+            except (IOError, OSError), e:
+                logging.warning('Could not cache %s: %s', self._url, e)
+
+        self._local_file_path = self._get_temp_file_path(self._url)
+        os.rename(partial_path, self._local_file_path)
+        self._cache.remove_partial(self._url)
+
+    def _complete_from_cache(self):
+        self._cached_size = self._cache_validators.get('size', 0)
+        if self._output_file is not None:
+            self._local_file_path = self._get_temp_file_path(self._url)
+            self._cached_size = self._cache.copy_to(self._url,
+                                                    self._local_file_path)
+            self._digest = self._cache_validators.get('sha256')
+            if self._digest is None:
+                # entries cached by older versions have no digest
+                self._hasher = _FileHasher(self._local_file_path, None,
+                                           self.__cached_file_hashed_cb)
+            return None
+
+        data = self._cache.read(self._url)
+        self._cached_size = len(data)
+        if self._message.response_body.get_accumulate():
+            return GLib.Bytes.new(data)
+
+        self.emit('got-chunk', GLib.Bytes.new(data))
+        return None
+
     def _check_if_finished(self):
         # To finish (for both successful completion and cancellation), we
         # require two conditions to become true:
@@ -191,6 +462,9 @@ class Downloader(GObject.GObject):
             self._complete()
             return
 
+        if self._hasher is not None:
+            return
+
         if self._cancelling or not self._pending_buffers:
             if self._status_code is not None \
                     and not self._output_stream.has_pending():
@@ -200,8 +474,10 @@ class Downloader(GObject.GObject):
         self._write_next_buffer()
 
     def _write_next_buffer(self):
-        if not self._output_stream.has_pending():
+        if self._hasher is None and self._pending_buffers and \
+                not self._output_stream.has_pending():
             data = self._pending_buffers.pop(0)
+            self._sha256.update(data.get_data() or '')
             self._output_stream.write_bytes_async(data, GObject.PRIORITY_LOW,
                                                   None, self.__write_async_cb,
                                                   None)
@@ -222,5 +498,4 @@ class Downloader(GObject.GObject):
         return file_path
 
     def get_local_file_path(self):
-        if self._output_file:
-            return self._output_file.get_path()
+        return self._local_file_path
@@ -0,0 +1,209 @@
+# Copyright (C) 2013 One Laptop per Child
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301 USA
+
+"""
+An on-disk cache of HTTP responses, used by Downloader to revalidate
+content that was already fetched with conditional requests, and to resume
+interrupted downloads.
+
+Every entry is the body of a response, named after the SHA-1 of its URL,
+next to a JSON file with the URL and the validators (ETag, Last-Modified)
+that the server sent with it. The least recently used entries are removed
+when the cache grows larger than its maximum size. Unfinished downloads
+are kept in the same directory, with the .part extension.
+"""
+
+import errno
+import hashlib
+import json
+import logging
+import os
+import shutil
+
+from sugar3 import env
+
+_MAX_SIZE = 50 * 1024 * 1024
+_INFO_EXTENSION = '.json'
+_PARTIAL_EXTENSION = '.part'
+
+_cache = None
+
+
+def get_validators(headers):
+    """Return the validators of the response headers, or None"""
+    validators = {}
+    etag = headers.get_one('ETag')
+    if etag:
+        validators['etag'] = etag
+    last_modified = headers.get_one('Last-Modified')
+    if last_modified:
+        validators['last-modified'] = last_modified
+    return validators or None
+
+
+def _link_or_copy(source, destination):
+    try:
+        os.link(source, destination)
+    except OSError, e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+            raise
+        shutil.copyfile(source, destination)
+
+
+class HTTPCache(object):
+
+    def __init__(self, path, max_size=_MAX_SIZE):
+        self._path = path
+        self._max_size = max_size
+
+    def _get_path(self, url):
+        return os.path.join(self._path, hashlib.sha1(url).hexdigest())
+
+    def _ensure_path(self):
+        if not os.path.isdir(self._path):
+            os.makedirs(self._path)
+
+    def _read_info(self, info_path, url):
+        try:
+            with open(info_path) as info_file:
+                info = json.load(info_file)
+        except (IOError, ValueError):
+            return None
+
+        if info.get('url') != url:
+            return None
+        return info
+
+    def _write_info(self, info_path, url, validators, size=None):
+        info = dict(validators)
+        info['url'] = url
+        if size is not None:
+            info['size'] = size
+
+        with open(info_path, 'w') as info_file:
+            json.dump(info, info_file)
+
+    def lookup(self, url):
+        """Return the validators of the cached response for url, or None"""
+        path = self._get_path(url)
+        if not os.path.exists(path):
+            return None
+        return self._read_info(path + _INFO_EXTENSION, url)
+
+    def read(self, url):
+        """Return the cached response body for url"""
+        path = self._get_path(url)
+        with open(path) as body_file:
+            data = body_file.read()
+        os.utime(path + _INFO_EXTENSION, None)
+        return data
+
+    def copy_to(self, url, destination):
+        """Copy the cached response body for url to destination
+
+        Return the size of the copied file.
+        """
+        path = self._get_path(url)
+        _link_or_copy(path, destination)
+        os.utime(path + _INFO_EXTENSION, None)
+        return os.path.getsize(destination)
+
+    def store_data(self, url, validators, data):
+        if len(data) > self._max_size:
+            return
+
+        self._ensure_path()
+        path = self._get_path(url)
+        with open(path, 'w') as body_file:
+            body_file.write(data)
+        self._write_info(path + _INFO_EXTENSION, url, validators, len(data))
+        self._trim()
+
+    def store_file(self, url, validators, file_path):
+        size = os.path.getsize(file_path)
+        if size > self._max_size:
+            return
+
+        self._ensure_path()
+        path = self._get_path(url)
+        if os.path.exists(path):
+            os.unlink(path)
+        _link_or_copy(file_path, path)
+        self._write_info(path + _INFO_EXTENSION, url, validators, size)
+        self._trim()
+
+    def get_partial_path(self, url):
+        """Return the path where the download of url is kept until done"""
+        self._ensure_path()
+        return self._get_path(url) + _PARTIAL_EXTENSION
+
+    def get_partial_validators(self, url):
+        """Return the validators of an unfinished download of url, or None
+
+        The download can only be resumed if the server still sends the
+        same content, which is checked with these validators.
+        """
+        path = self.get_partial_path(url)
+        if not os.path.exists(path):
+            return None
+        return self._read_info(path + _INFO_EXTENSION, url)
+
+    def set_partial_validators(self, url, validators):
+        path = self.get_partial_path(url)
+        self._write_info(path + _INFO_EXTENSION, url, validators)
+
+    def remove_partial(self, url):
+        path = self.get_partial_path(url)
+        for file_path in [path, path + _INFO_EXTENSION]:
+            try:
+                os.unlink(file_path)
+            except OSError:
+                pass
+
+    def _trim(self):
+        entries = []
+        total_size = 0
+        for name in os.listdir(self._path):
+            if not name.endswith(_INFO_EXTENSION) or \
+                    name.endswith(_PARTIAL_EXTENSION + _INFO_EXTENSION):
+                continue
+
+            info_path = os.path.join(self._path, name)
+            path = info_path[:-len(_INFO_EXTENSION)]
+            try:
+                size = os.path.getsize(path)
+                entries.append((os.path.getmtime(info_path), size, path))
+            except OSError:
+                continue
+            total_size += size
+
+        entries.sort()
+        while total_size > self._max_size and entries:
+            mtime_, size, path = entries.pop(0)
+            logging.debug('Removing %s from the download cache', path)
+            for file_path in [path, path + _INFO_EXTENSION]:
+                try:
+                    os.unlink(file_path)
+                except OSError:
+                    pass
+            total_size -= size
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = HTTPCache(env.get_profile_path('downloads'))
+    return _cache
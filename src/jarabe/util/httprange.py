@@ -19,10 +19,16 @@ A simple HTTP-based file-like object that supports seek() via the HTTP
 Range header. This means it doesn't have to download the whole file just
 to read a small part of it. Uses Downloader as a backend, and runs the
 regular main loop while waiting for data.
+
+The blocking variant does plain blocking requests instead, so that it can
+be used from threads other than the main one.
 """
 
+import urllib2
+
 from gi.repository import Gtk
 
+from jarabe import config
 from jarabe.util.downloader import Downloader
 
 
@@ -55,12 +61,19 @@ class _HttpRangeFileObject(object):
     def tell(self):
         return self._offset
 
+    def _get_size(self):
+        self._do_download('get_size')
+        return self._result
+
+    def _get_range(self, start, end):
+        self._do_download('download', start=start, end=end)
+        return self._result.get_data()
+
     def size(self):
         if self._size is None:
-            self._do_download('get_size')
-            if self._result is None:
+            self._size = self._get_size()
+            if self._size is None:
                 raise IOError("No content length header")
-            self._size = self._result
         return self._size
 
     def read(self, size=-1):
@@ -71,8 +84,7 @@ class _HttpRangeFileObject(object):
 
         self._complete = False
 
-        self._do_download('download', start=self._offset, end=end - 1)
-        data = self._result.get_data()
+        data = self._get_range(self._offset, end - 1)
         self._offset += len(data)
         return data
 
@@ -85,5 +97,37 @@ class _HttpRangeFileObject(object):
             self._offset = self.size() + offset
 
 
-def open(url):
+class _HeadRequest(urllib2.Request):
+    def get_method(self):
+        return 'HEAD'
+
+
+class _BlockingHttpRangeFileObject(_HttpRangeFileObject):
+    def _open_url(self, request):
+        request.add_header('User-Agent', 'Sugar/%s' % config.version)
+        return urllib2.urlopen(request, timeout=60)
+
+    def _get_size(self):
+        response = self._open_url(_HeadRequest(self._url))
+        try:
+            length = response.info().getheader('Content-Length')
+        finally:
+            response.close()
+        if length is None:
+            return None
+        return int(length)
+
+    def _get_range(self, start, end):
+        request = urllib2.Request(self._url)
+        request.add_header('Range', 'bytes=%d-%d' % (start, end))
+        response = self._open_url(request)
+        try:
+            return response.read()
+        finally:
+            response.close()
+
+
+def open(url, blocking=False):
+    if blocking:
+        return _BlockingHttpRangeFileObject(url)
     return _HttpRangeFileObject(url)
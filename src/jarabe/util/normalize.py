@@ -29,3 +29,57 @@ def normalize_string(unicode_string):
 
     """
     return normalize('NFKD', unicode_string).encode('ASCII', 'ignore').lower()
+
+
+class SearchIndex(object):
+    """Normalized search keys for a collection of items.
+
+    The text of every item is normalized once, when it is added, so
+    matching a query is a plain substring lookup. When the query grows,
+    only the items that matched the previous query are checked again.
+
+    """
+
+    def __init__(self):
+        self._keys = {}
+        self._query = ''
+        self._matches = None
+
+    def add(self, item, text):
+        """Add item, or update its text if it is already indexed."""
+        if isinstance(text, str):
+            text = text.decode('utf-8')
+        key = normalize_string(text)
+        self._keys[item] = key
+        if self._matches is not None:
+            if key.find(self._query) > -1:
+                self._matches.add(item)
+            else:
+                self._matches.discard(item)
+
+    def remove(self, item):
+        self._keys.pop(item, None)
+        if self._matches is not None:
+            self._matches.discard(item)
+
+    def match(self, query):
+        """Return the set of items whose text contains query.
+
+        The query must already be normalized. The returned set is kept
+        up to date as items are added or removed, until the next call.
+
+        """
+        if self._matches is not None:
+            if query == self._query:
+                return self._matches
+            if query.find(self._query) > -1:
+                candidates = self._matches
+            else:
+                candidates = self._keys
+        else:
+            candidates = self._keys
+
+        self._matches = set([item for item in candidates
+                             if self._keys[item].find(query) > -1])
+        self._query = query
+        return self._matches
@@ -0,0 +1,235 @@
+# Copyright (C) 2013 One Laptop per Child
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301 USA
+
+"""
+Thumbnails of image files, cached as described by the freedesktop.org
+thumbnail managing standard so that they are shared with other desktops.
+
+A thumbnail is a PNG file named after the MD5 of the URI of the image,
+with the URI and the modification time of the image in its Thumb::URI
+and Thumb::MTime text chunks; it is outdated when the image changed.
+Thumbnails are made in the normal (128 px) size, or in the large
+(256 px) one when they are shown bigger than that. Images that can not
+be decoded get an empty thumbnail in the fail directory, so they are not
+tried again until they change.
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+import Queue
+from threading import Lock
+from threading import Thread
+
+from gi.repository import GdkPixbuf
+from gi.repository import GLib
+
+_NORMAL_SIZE = 128
+_LARGE_SIZE = 256
+_FAIL_DIR = os.path.join('fail', 'sugar')
+_WORKERS = 4
+_BATCH_INTERVAL = 100
+
+_cache = None
+
+
+class ThumbnailCache(object):
+
+    def __init__(self, path):
+        self._path = path
+
+    def _get_paths(self, uri, directory):
+        name = hashlib.md5(uri).hexdigest() + '.png'
+        return (os.path.join(self._path, directory, name),
+                os.path.join(self._path, _FAIL_DIR, name))
+
+    def _is_valid(self, pixbuf, uri, mtime):
+        return pixbuf.get_option('tEXt::Thumb::URI') == uri and \
+            pixbuf.get_option('tEXt::Thumb::MTime') == mtime
+
+    def _save(self, pixbuf, path, uri, mtime):
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory, 0700)
+
+        # write to a temporary file first, others may read the thumbnail
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.png')
+        os.close(fd)
+        try:
+            pixbuf.savev(temp_path, 'png',
+                         ['tEXt::Thumb::URI', 'tEXt::Thumb::MTime',
+                          'tEXt::Software'],
+                         [uri, mtime, 'Sugar'])
+            os.rename(temp_path, path)
+        except (GLib.GError, OSError), e:
+            logging.error('Could not save thumbnail %s: %s', path, e)
+            os.unlink(temp_path)
+
+    def get_thumbnail(self, file_path, size=_NORMAL_SIZE):
+        """Return the thumbnail of the image at file_path, or None
+
+        The thumbnail is at least size pixels big, if the image is, but
+        never bigger than the large size. It is created, or updated, if
+        needed. This can take a while for big images, better call it
+        from a thread.
+        """
+        if size > _NORMAL_SIZE:
+            directory, size = 'large', _LARGE_SIZE
+        else:
+            directory, size = 'normal', _NORMAL_SIZE
+
+        try:
+            mtime = str(int(os.stat(file_path).st_mtime))
+        except OSError:
+            return None
+
+        uri = GLib.filename_to_uri(os.path.abspath(file_path), None)
+        path, fail_path = self._get_paths(uri, directory)
+        for cached_path in [path, fail_path]:
+            if not os.path.exists(cached_path):
+                continue
+            try:
+                pixbuf = GdkPixbuf.Pixbuf.new_from_file(cached_path)
+            except GLib.GError:
+                continue
+            if self._is_valid(pixbuf, uri, mtime):
+                if cached_path == fail_path:
+                    return None
+                return pixbuf
+
+        image_format, width, height = GdkPixbuf.Pixbuf.get_file_info(
+            file_path)
+        if image_format is None:
+            return None
+
+        try:
+            if width > size or height > size:
+                pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_size(
+                    file_path, size, size)
+            else:
+                pixbuf = GdkPixbuf.Pixbuf.new_from_file(file_path)
+        except GLib.GError, e:
+            logging.debug('Could not load %s: %s', file_path, e)
+            failed = GdkPixbuf.Pixbuf.new(GdkPixbuf.Colorspace.RGB, True, 8,
+                                          1, 1)
+            failed.fill(0)
+            self._save(failed, fail_path, uri, mtime)
+            return None
+
+        self._save(pixbuf, path, uri, mtime)
+        return pixbuf
+
+
+class ThumbnailPool(object):
+    """Get the thumbnails of many images with a pool of threads
+
+    results_cb is called in the main loop with batches of
+    (file path, thumbnail or None) tuples as they are ready, in no
+    particular order. Once close() was called and all the images were
+    handled, done_cb is called. The thumbnails are made for being shown
+    at size pixels.
+    """
+
+    def __init__(self, results_cb, done_cb=None, cache=None,
+                 workers=_WORKERS, size=_NORMAL_SIZE):
+        self._results_cb = results_cb
+        self._size = size
+        self._done_cb = done_cb
+        self._cache = cache or get_cache()
+        self._workers = workers
+        self._threads = []
+        self._queue = Queue.Queue()
+        self._lock = Lock()
+        self._results = []
+        self._pending = 0
+        self._closed = False
+        self._stopped = False
+        self._flush_sid = None
+
+    def add(self, file_path):
+        """Queue an image, can be called from any thread"""
+        with self._lock:
+            self._pending += 1
+            if len(self._threads) < self._workers:
+                thread = Thread(target=self._thread_func)
+                thread.daemon = True
+                self._threads.append(thread)
+                thread.start()
+        self._queue.put(file_path)
+
+    def close(self):
+        """No more images will be added, can be called from any thread"""
+        with self._lock:
+            self._closed = True
+            for thread_ in self._threads:
+                self._queue.put(None)
+            self._schedule_flush()
+
+    def stop(self):
+        """Drop the queued images and the results not handed yet"""
+        with self._lock:
+            self._stopped = True
+            if self._flush_sid is not None:
+                GLib.source_remove(self._flush_sid)
+                self._flush_sid = None
+        for thread_ in self._threads:
+            self._queue.put(None)
+
+    def _thread_func(self):
+        while True:
+            file_path = self._queue.get()
+            if file_path is None or self._stopped:
+                return
+
+            try:
+                pixbuf = self._cache.get_thumbnail(file_path, self._size)
+            except Exception:
+                logging.exception('Could not get thumbnail of %s', file_path)
+                pixbuf = None
+
+            with self._lock:
+                self._results.append((file_path, pixbuf))
+                self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self._flush_sid is None and not self._stopped:
+            self._flush_sid = GLib.timeout_add(_BATCH_INTERVAL,
+                                               self.__flush_cb)
+
+    def __flush_cb(self):
+        with self._lock:
+            self._flush_sid = None
+            if self._stopped:
+                return False
+            results = self._results
+            self._results = []
+            self._pending -= len(results)
+            done = self._closed and self._pending == 0
+
+        if results:
+            self._results_cb(results)
+        if done and self._done_cb is not None:
+            self._done_cb()
+        return False
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = ThumbnailCache(os.path.join(GLib.get_user_cache_dir(),
+                                             'thumbnails'))
+    return _cache
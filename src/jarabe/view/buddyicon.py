@@ -30,9 +30,11 @@ class BuddyIcon(CanvasIcon):
                             pixel_size=pixel_size)
 
         self._filtered = False
+        self._normalized_nick = None
         self._buddy = buddy
         self._buddy.connect('notify::present', self.__buddy_notify_present_cb)
         self._buddy.connect('notify::color', self.__buddy_notify_color_cb)
+        self._buddy.connect('notify::nick', self.__buddy_notify_nick_cb)
 
         self.palette_invoker.props.toggle_palette = True
         self.palette_invoker.cache_palette = False
@@ -51,6 +53,9 @@ class BuddyIcon(CanvasIcon):
     def __buddy_notify_color_cb(self, buddy, pspec):
         self._update_color()
 
+    def __buddy_notify_nick_cb(self, buddy, pspec):
+        self._normalized_nick = None
+
     def _update_color(self):
         # keep the icon in the palette in sync with the view
         palette = self.get_palette()
@@ -66,8 +71,11 @@ class BuddyIcon(CanvasIcon):
                 palette.props.icon.props.xo_color = self._buddy.get_color()
 
     def set_filter(self, query):
-        normalized_name = normalize_string(
-            self._buddy.get_nick().decode('utf-8'))
-        self._filtered = (normalized_name.find(query) == -1) \
+        if self._normalized_nick is None:
+            self._normalized_nick = normalize_string(
+                self._buddy.get_nick().decode('utf-8'))
+        filtered = (self._normalized_nick.find(query) == -1) \
             and not self._buddy.is_owner()
-        self._update_color()
+        if filtered != self._filtered:
+            self._filtered = filtered
+            self._update_color()
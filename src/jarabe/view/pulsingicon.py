@@ -27,11 +27,51 @@ _INTERVAL = 100
 _STEP = math.pi / 10  # must be a fraction of pi, for clean caching
 _MINIMAL_ALPHA_VALUE = 0.33
 
+# The alpha value for every phase of the pulse, phases are counted in
+# steps so that all pulsing icons go through the same frames
+_ALPHA_FRAMES = [_MINIMAL_ALPHA_VALUE + (1 - _MINIMAL_ALPHA_VALUE) *
+                 (math.cos(step * _STEP) + 1) / 2
+                 for step in range(int(round(2 * math.pi / _STEP)))]
+
+
+class _PulseClock(object):
+    """Drive all the running pulsers from a single timeout
+
+    There is only one wakeup per interval no matter how many icons are
+    pulsing, and all of them are redrawn in the same main loop iteration.
+    """
+
+    def __init__(self):
+        self._pulsers = []
+        self._sid = None
+
+    def add(self, pulser):
+        if pulser not in self._pulsers:
+            self._pulsers.append(pulser)
+        if self._sid is None:
+            self._sid = GObject.timeout_add(_INTERVAL, self.__tick_cb)
+
+    def remove(self, pulser):
+        if pulser in self._pulsers:
+            self._pulsers.remove(pulser)
+        if not self._pulsers and self._sid is not None:
+            GObject.source_remove(self._sid)
+            self._sid = None
+
+    def __tick_cb(self):
+        for pulser in self._pulsers[:]:
+            pulser.tick()
+        return True
+
+
+_clock = _PulseClock()
+
 
 class Pulser(object):
     def __init__(self, icon):
-        self._pulse_hid = None
+        self._running = False
         self._icon = icon
+        self._xo_color = None
         self._phase = 0
         self._start_scale = 1.0
         self._end_scale = 1.0
@@ -51,34 +91,42 @@ class Pulser(object):
     def start(self, restart=False):
         if restart:
             self._phase = 0
-        if self._pulse_hid is None:
-            self._pulse_hid = GObject.timeout_add(_INTERVAL, self.__pulse_cb)
+        if not self._running:
+            self._running = True
+            self._xo_color = None
+            _clock.add(self)
         if self._start_scale != self._end_scale:
             self._icon.scale = self._start_scale + \
                 self._current_scale_step * self._current_zoom_step
 
     def stop(self):
-        if self._pulse_hid is not None:
-            GObject.source_remove(self._pulse_hid)
-            self._pulse_hid = None
-        self._icon.xo_color = self._icon.get_base_color()
+        if self._running:
+            _clock.remove(self)
+            self._running = False
+        self._xo_color = self._icon.get_base_color()
+        self._icon.xo_color = self._xo_color
         self._phase = 0
         self._icon.alpha = 1.0
 
     def update(self):
-        self._icon.xo_color = self._icon.base_color
-        self._icon.alpha = _MINIMAL_ALPHA_VALUE + \
-            (1 - _MINIMAL_ALPHA_VALUE) * (math.cos(self._phase) + 1) / 2
-
-    def __pulse_cb(self):
-        self._phase += _STEP
+        # Only touch the color when it changes, a new color means
+        # rendering the icon again while a new alpha is just a blit
+        self._set_xo_color(self._icon.base_color)
+        self._icon.alpha = _ALPHA_FRAMES[self._phase]
+
+    def _set_xo_color(self, xo_color):
+        if xo_color is None or xo_color != self._xo_color:
+            self._xo_color = xo_color
+            self._icon.xo_color = xo_color
+
+    def tick(self):
+        self._phase = (self._phase + 1) % len(_ALPHA_FRAMES)
         if self._current_zoom_step <= self._zoom_steps and \
                 self._start_scale != self._end_scale:
             self._icon.scale = self._start_scale + \
                 self._current_scale_step * self._current_zoom_step
             self._current_zoom_step += 1
         self.update()
-        return True
 
 
 class PulsingIcon(Icon):
@@ -181,6 +229,8 @@ class EventPulsingIcon(CanvasIcon):
         self._paused = False
         self._pulsing = False
 
+        # share the rendered surfaces between icons that look the same
+        kwargs.setdefault('cache', True)
         CanvasIcon.__init__(self, **kwargs)
 
         self.connect('destroy', self.__destroy_cb)
@@ -88,3 +88,11 @@ class UIService(dbus.service.Object):
                          in_signature='s', out_signature='')
     def NotifyLaunchFailure(self, activity_id):
         shell.get_model().notify_launch_failed(activity_id)
+
+    @dbus.service.method(_DBUS_SHELL_IFACE,
+                         in_signature='', out_signature='a(ssddd)')
+    def GetLaunchTimes(self):
+        """Return the timestamps of the most recent activity launches,
+        as (bundle_id, activity_id, started, window_mapped, completed)
+        """
+        return self._shell_model.get_launch_times()
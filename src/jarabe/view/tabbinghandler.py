@@ -18,8 +18,10 @@ import logging
 
 from gi.repository import GObject
 from gi.repository import Gdk
+from gi.repository import Gio
 
 from jarabe.model import shell
+from jarabe.view.tabbingswitcher import TabbingSwitcher
 
 
 _RAISE_DELAY = 250
@@ -33,6 +35,11 @@ class TabbingHandler(object):
         self._timeout = None
         self._keyboard = None
         self._mouse = None
+        self._switcher = None
+
+        settings = Gio.Settings('org.sugarlabs.frame')
+        if settings.get_boolean('tabbing-switcher'):
+            self._switcher = TabbingSwitcher(self, frame)
 
         display = Gdk.Display.get_default()
         device_manager = display.get_device_manager()
@@ -86,6 +93,8 @@ class TabbingHandler(object):
                 self._tabbing = False
             else:
                 self._frame.show()
+                if self._switcher is not None:
+                    self._switcher.popup()
 
     def __timeout_cb(self, event_time):
         self._activate_current(event_time)
@@ -166,6 +175,8 @@ class TabbingHandler(object):
         self._tabbing = False
 
         self._frame.hide()
+        if self._switcher is not None:
+            self._switcher.popdown()
 
         self._cancel_timeout()
         self._activate_current(event_time)
@@ -0,0 +1,227 @@
+# Copyright (C) 2013 One Laptop per Child
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+"""Overlay showing the thumbnails of the running activities while tabbing
+
+Grabbing a window can't be done while tabbing without making the switch
+feel slow, so the thumbnails are taken beforehand: shortly after an
+activity becomes active, when it is the one on screen, and then
+periodically while it stays active. The window of the activity is
+grabbed in the main loop. The grab is put off while tabbing, or while
+any window of the shell, like the frame, a notification or a palette,
+is shown, because the switch would stall or the window would end up in
+the thumbnail. Thumbnails are scaled down as they are grabbed and kept
+in the thumbnail store.
+"""
+
+import cairo
+from gi.repository import Gdk
+from gi.repository import GdkX11
+from gi.repository import GLib
+from gi.repository import Gtk
+from gi.repository import Pango
+
+from sugar3.graphics import style
+from sugar3.graphics.icon import Icon
+
+from jarabe.model import shell
+from jarabe.model import thumbnailstore
+
+
+_CAPTURE_DELAY = 1
+_CAPTURE_INTERVAL = 30
+_THUMBNAIL_WIDTH = style.GRID_CELL_SIZE * 3
+
+
+class ThumbnailCapturer(object):
+    """Keep the thumbnail of the active activity up to date
+
+    is_busy is called before grabbing a window, the grab is put off
+    while it returns True.
+    """
+
+    def __init__(self, store, is_busy):
+        self._store = store
+        self._is_busy = is_busy
+        self._capture_sid = None
+
+        shell_model = shell.get_model()
+        shell_model.connect('active-activity-changed',
+                            self.__active_activity_changed_cb)
+        shell_model.connect('activity-removed', self.__activity_removed_cb)
+
+    def __active_activity_changed_cb(self, shell_model, activity):
+        if self._capture_sid is not None:
+            GLib.source_remove(self._capture_sid)
+            self._capture_sid = None
+        if activity is not None:
+            self._capture_sid = GLib.timeout_add_seconds(
+                _CAPTURE_DELAY, self.__capture_cb, activity)
+
+    def __activity_removed_cb(self, shell_model, activity):
+        self._store.remove(activity.get_activity_id())
+
+    def __capture_cb(self, activity):
+        shell_model = shell.get_model()
+        if shell_model.get_active_activity() is not activity:
+            self._capture_sid = None
+            return False
+
+        if self._is_busy():
+            self._capture_sid = GLib.timeout_add_seconds(
+                _CAPTURE_DELAY, self.__capture_cb, activity)
+            return False
+
+        # only an activity on screen can be captured
+        if shell_model.zoom_level == shell.ShellModel.ZOOM_ACTIVITY and \
+                activity.get_window() is not None:
+            thumbnail = self._capture(activity.get_window().get_xid())
+            if thumbnail is not None:
+                self._store.put(activity.get_activity_id(), thumbnail)
+
+        self._capture_sid = GLib.timeout_add_seconds(
+            _CAPTURE_INTERVAL, self.__capture_cb, activity)
+        return False
+
+    def _capture(self, xid):
+        window = GdkX11.X11Window.foreign_new_for_display(
+            Gdk.Display.get_default(), xid)
+        if window is None:
+            return None
+
+        scale = _THUMBNAIL_WIDTH / float(window.get_width())
+        height = int(window.get_height() * scale)
+
+        surface = cairo.ImageSurface(cairo.FORMAT_RGB24, _THUMBNAIL_WIDTH,
+                                     height)
+        cr = cairo.Context(surface)
+        cr.scale(scale, scale)
+        Gdk.cairo_set_source_window(cr, window, 0, 0)
+        cr.get_source().set_filter(cairo.FILTER_GOOD)
+        cr.paint()
+        return surface
+
+
+class _ActivityTile(Gtk.EventBox):
+
+    def __init__(self, activity, thumbnail):
+        Gtk.EventBox.__init__(self)
+        self.activity = activity
+
+        box = Gtk.VBox()
+        box.set_border_width(style.DEFAULT_PADDING)
+        box.set_spacing(style.DEFAULT_PADDING)
+        self.add(box)
+
+        if thumbnail is not None:
+            area = Gtk.DrawingArea()
+            area.set_size_request(thumbnail.get_width(),
+                                  thumbnail.get_height())
+            area.connect('draw', self.__draw_cb, thumbnail)
+            box.pack_start(area, True, True, 0)
+        else:
+            icon = Icon(file=activity.get_icon_path(),
+                        xo_color=activity.get_icon_color(),
+                        pixel_size=style.XLARGE_ICON_SIZE)
+            icon.set_size_request(_THUMBNAIL_WIDTH, -1)
+            box.pack_start(icon, True, True, 0)
+
+        label = Gtk.Label(label=activity.get_title() or
+                          activity.get_activity_name() or '')
+        label.set_ellipsize(Pango.EllipsizeMode.END)
+        label.set_max_width_chars(20)
+        box.pack_start(label, False, False, 0)
+
+        self.set_selected(False)
+
+    def __draw_cb(self, area, cr, thumbnail):
+        cr.set_source_surface(thumbnail, 0, 0)
+        cr.paint()
+
+    def set_selected(self, selected):
+        if selected:
+            color = style.COLOR_BUTTON_GREY
+        else:
+            color = style.COLOR_TOOLBAR_GREY
+        self.modify_bg(Gtk.StateType.NORMAL, color.get_gdk_color())
+
+
+class TabbingSwitcher(Gtk.Window):
+    """Show the running activities while tabbing, highlighting the one
+    that would be activated
+    """
+
+    __gtype_name__ = 'SugarTabbingSwitcher'
+
+    def __init__(self, tabbing_handler, frame):
+        Gtk.Window.__init__(self, type=Gtk.WindowType.POPUP)
+        self.set_position(Gtk.WindowPosition.CENTER_ALWAYS)
+        self.modify_bg(Gtk.StateType.NORMAL,
+                       style.COLOR_TOOLBAR_GREY.get_gdk_color())
+
+        self._tabbing_handler = tabbing_handler
+        self._frame = frame
+        self._store = thumbnailstore.get_store()
+        self._capturer = ThumbnailCapturer(self._store, self._is_busy)
+
+        self._box = Gtk.HBox()
+        self._box.set_border_width(style.DEFAULT_SPACING)
+        self._box.set_spacing(style.DEFAULT_SPACING)
+        self.add(self._box)
+        self._box.show()
+
+        shell.get_model().connect('tabbing-activity-changed',
+                                  self.__tabbing_activity_changed_cb)
+
+    def _is_busy(self):
+        if self._tabbing_handler.is_tabbing() or self._frame.visible:
+            return True
+
+        # the frame panels, notifications, palettes and this window are
+        # drawn over the activity, only the home window is behind it
+        for window in Gtk.Window.list_toplevels():
+            if window.get_visible() and \
+                    window.get_type_hint() != Gdk.WindowTypeHint.DESKTOP:
+                return True
+        return False
+
+    def popup(self):
+        for tile in self._box.get_children():
+            tile.destroy()
+
+        for activity in shell.get_model():
+            if activity.get_window() is None:
+                continue
+            thumbnail = self._store.get(activity.get_activity_id())
+            tile = _ActivityTile(activity, thumbnail)
+            self._box.pack_start(tile, False, False, 0)
+            tile.show_all()
+
+        self._update_selection(shell.get_model().get_tabbing_activity())
+        self.show()
+
+    def popdown(self):
+        self.hide()
+        for tile in self._box.get_children():
+            tile.destroy()
+
+    def __tabbing_activity_changed_cb(self, shell_model, activity):
+        if self.get_visible():
+            self._update_selection(activity)
+
+    def _update_selection(self, activity):
+        for tile in self._box.get_children():
+            tile.set_selected(tile.activity is activity)
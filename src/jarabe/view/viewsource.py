@@ -16,12 +16,14 @@
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
+import codecs
 import os
 import shutil
 import sys
 import logging
 from gettext import gettext as _
 
+from gi.repository import GLib
 from gi.repository import GObject
 from gi.repository import Pango
 from gi.repository import Gtk
@@ -50,9 +52,27 @@ _EXCLUDE_NAMES = ['.deps', '.libs']
 
 _SOURCE_FONT = Pango.FontDescription('Monospace %d' % style.FONT_SIZE)
 
+# files are shown by pieces of this size, the next one is only read
+# when the user asks for it
+_READ_SIZE = 256 * 1024
+
 _logger = logging.getLogger('ViewSource')
 map_activity_to_window = {}
 
+_languages = None
+
+
+def _get_language_for_mime_type(mime_type):
+    global _languages
+    if _languages is None:
+        _languages = {}
+        language_manager = GtkSource.LanguageManager.get_default()
+        for language_id in language_manager.get_language_ids():
+            language = language_manager.get_language(language_id)
+            for language_mime_type in language.get_mime_types():
+                _languages.setdefault(language_mime_type, language)
+    return _languages.get(mime_type)
+
 
 def _is_web_activity(bundle_path):
     activity_bundle = ActivityBundle(bundle_path)
@@ -529,6 +549,7 @@ class FileViewer(Gtk.ScrolledWindow):
 
         self._tree_view = Gtk.TreeView()
         self._tree_view.connect('cursor-changed', self.__cursor_changed_cb)
+        self._tree_view.connect('test-expand-row', self.__test_expand_row_cb)
         self.add(self._tree_view)
         self._tree_view.show()
 
@@ -554,21 +575,57 @@ class FileViewer(Gtk.ScrolledWindow):
         self._tree_view.set_model(Gtk.TreeStore(str, str))
         self._model = self._tree_view.get_model()
         self._add_dir_to_model(path)
+        self._select_initial_file()
 
     def _add_dir_to_model(self, dir_path, parent=None):
-        for f in os.listdir(dir_path):
+        """Add the content of dir_path, but not of its subdirectories
+
+        Subdirectories get an empty placeholder row so they can be
+        expanded, their content is added when that happens.
+        """
+        try:
+            names = os.listdir(dir_path)
+        except OSError, e:
+            _logger.error('Could not list %s: %s', dir_path, e)
+            return
+
+        for f in names:
             if f.endswith(_EXCLUDE_EXTENSIONS) or f in _EXCLUDE_NAMES:
                 continue
 
             full_path = os.path.join(dir_path, f)
+            new_iter = self._model.append(parent, [f, full_path])
             if os.path.isdir(full_path):
-                new_iter = self._model.append(parent, [f, full_path])
-                self._add_dir_to_model(full_path, new_iter)
-            else:
-                current_iter = self._model.append(parent, [f, full_path])
-                if f == self._initial_filename:
-                    selection = self._tree_view.get_selection()
-                    selection.select_iter(current_iter)
+                self._model.append(new_iter, ['', None])
+
+    def _select_initial_file(self):
+        if not self._initial_filename:
+            return
+
+        # the initial file can be in a subdirectory, add the directories
+        # on the way to it
+        parent = None
+        for name in self._initial_filename.split(os.sep):
+            tree_iter = self._model.iter_children(parent)
+            while tree_iter is not None and \
+                    self._model.get_value(tree_iter, 0) != name:
+                tree_iter = self._model.iter_next(tree_iter)
+            if tree_iter is None:
+                return
+            if self._model.iter_has_child(tree_iter):
+                self._tree_view.expand_to_path(self._model.get_path(tree_iter))
+            parent = tree_iter
+
+        self._tree_view.get_selection().select_iter(parent)
+
+    def __test_expand_row_cb(self, treeview, tree_iter, path):
+        child_iter = self._model.iter_children(tree_iter)
+        if child_iter is not None and \
+                self._model.get_value(child_iter, 1) is None:
+            self._model.remove(child_iter)
+            self._add_dir_to_model(self._model.get_value(tree_iter, 1),
+                                   tree_iter)
+        return False
 
     def __selection_changed_cb(self, selection):
         model, tree_iter = selection.get_selected()
@@ -592,14 +649,17 @@ class FileViewer(Gtk.ScrolledWindow):
                 treeview.expand_row(path, False)
 
 
-class SourceDisplay(Gtk.ScrolledWindow):
+class SourceDisplay(Gtk.VBox):
     __gtype_name__ = 'SugarSourceDisplay'
 
     def __init__(self):
-        Gtk.ScrolledWindow.__init__(self)
+        Gtk.VBox.__init__(self)
 
-        self.props.hscrollbar_policy = Gtk.PolicyType.AUTOMATIC
-        self.props.vscrollbar_policy = Gtk.PolicyType.AUTOMATIC
+        scrolled_window = Gtk.ScrolledWindow()
+        scrolled_window.props.hscrollbar_policy = Gtk.PolicyType.AUTOMATIC
+        scrolled_window.props.vscrollbar_policy = Gtk.PolicyType.AUTOMATIC
+        self.pack_start(scrolled_window, True, True, 0)
+        scrolled_window.show()
 
         self._buffer = GtkSource.Buffer()
         self._buffer.set_highlight_syntax(True)
@@ -612,35 +672,120 @@ class SourceDisplay(Gtk.ScrolledWindow):
         self._source_view.set_right_margin_position(80)
         # self._source_view.set_highlight_current_line(True) #FIXME: Ugly color
         self._source_view.modify_font(_SOURCE_FONT)
-        self.add(self._source_view)
+        scrolled_window.add(self._source_view)
         self._source_view.show()
 
+        self._info_bar = Gtk.InfoBar()
+        self._info_bar.set_message_type(Gtk.MessageType.INFO)
+        self._info_bar.add_button(_('Load more'), Gtk.ResponseType.OK)
+        self._info_bar.connect('response', self.__info_bar_response_cb)
+        self._info_label = Gtk.Label()
+        self._info_bar.get_content_area().add(self._info_label)
+        self._info_label.show()
+        self.pack_start(self._info_bar, False, True, 0)
+
         self._file_path = None
+        self._stream = None
+        self._reading = False
+        self._cancellable = None
+        self._decoder = None
+        self._size = 0
+        self._offset = 0
 
     def _set_file_path(self, file_path):
         self._file_path = file_path
 
+        self._close_stream()
+        self._info_bar.hide()
+        self._buffer.set_text('')
         if self._file_path is None:
-            self._buffer.set_text('')
             return
 
         mime_type = mime.get_for_file(self._file_path)
         _logger.debug('Detected mime type: %r', mime_type)
 
-        language_manager = GtkSource.LanguageManager.get_default()
-        detected_language = None
-        for language_id in language_manager.get_language_ids():
-            language = language_manager.get_language(language_id)
-            if mime_type in language.get_mime_types():
-                detected_language = language
-                break
-
+        detected_language = _get_language_for_mime_type(mime_type)
         if detected_language is not None:
             _logger.debug('Detected language: %r',
                           detected_language.get_name())
-
         self._buffer.set_language(detected_language)
-        self._buffer.set_text(open(self._file_path, 'r').read())
+
+        try:
+            self._size = os.path.getsize(self._file_path)
+        except OSError, e:
+            _logger.error('Could not read %s: %s', self._file_path, e)
+            return
+
+        self._offset = 0
+        self._decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        self._cancellable = Gio.Cancellable()
+        gfile = Gio.File.new_for_path(self._file_path)
+        gfile.read_async(GLib.PRIORITY_DEFAULT, self._cancellable,
+                         self.__read_cb, self._cancellable)
+
+    def _close_stream(self):
+        if self._cancellable is not None:
+            self._cancellable.cancel()
+            self._cancellable = None
+        # a stream being read is closed once the read was cancelled
+        if self._stream is not None and not self._reading:
+            self._stream.close_async(GLib.PRIORITY_DEFAULT, None, None, None)
+        self._stream = None
+
+    def __read_cb(self, gfile, result, cancellable):
+        try:
+            stream = gfile.read_finish(result)
+        except GLib.GError, e:
+            if cancellable is self._cancellable:
+                _logger.error('Could not read %s: %s', gfile.get_path(), e)
+            return
+
+        if cancellable is not self._cancellable:
+            stream.close_async(GLib.PRIORITY_DEFAULT, None, None, None)
+            return
+
+        self._stream = stream
+        self._read_more()
+
+    def _read_more(self):
+        self._info_bar.hide()
+        self._reading = True
+        self._stream.read_bytes_async(_READ_SIZE, GLib.PRIORITY_DEFAULT,
+                                      self._cancellable,
+                                      self.__read_bytes_cb, self._cancellable)
+
+    def __read_bytes_cb(self, stream, result, cancellable):
+        self._reading = False
+        try:
+            data = stream.read_bytes_finish(result).get_data() or ''
+        except GLib.GError, e:
+            if cancellable is self._cancellable:
+                _logger.error('Could not read %s: %s', self._file_path, e)
+                self._close_stream()
+            else:
+                stream.close_async(GLib.PRIORITY_DEFAULT, None, None, None)
+            return
+
+        if cancellable is not self._cancellable:
+            stream.close_async(GLib.PRIORITY_DEFAULT, None, None, None)
+            return
+
+        self._offset += len(data)
+        final = not data or self._offset >= self._size
+        text = self._decoder.decode(data, final)
+        self._buffer.insert(self._buffer.get_end_iter(), text)
+
+        if final:
+            self._close_stream()
+        else:
+            self._info_label.set_text(
+                _('Showing %(shown)d KB of %(size)d KB') %
+                {'shown': self._offset / 1024, 'size': self._size / 1024})
+            self._info_bar.show()
+
+    def __info_bar_response_cb(self, info_bar, response_id):
+        if response_id == Gtk.ResponseType.OK and self._stream is not None:
+            self._read_more()
 
     def _get_file_path(self):
         return self._file_path
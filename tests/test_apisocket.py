@@ -0,0 +1,179 @@
+# Copyright (C) 2013, One Laptop per Child
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import dbus
+import dbus.service
+from dbus.mainloop.glib import DBusGMainLoop
+from gi.repository import GLib
+
+from jarabe.apisocket import DatastoreAPI
+from jarabe.apisocket import StreamWriter
+
+DBusGMainLoop(set_as_default=True)
+
+_DS_SERVICE = 'org.laptop.sugar.DataStore'
+_DS_PATH = '/org/laptop/sugar/DataStore'
+_DS_INTERFACE = 'org.laptop.sugar.DataStore'
+
+
+class FakeDataStore(dbus.service.Object):
+    def __init__(self, entries):
+        bus = dbus.SessionBus()
+        bus_name = dbus.service.BusName(_DS_SERVICE, bus=bus,
+                                        do_not_queue=True)
+        dbus.service.Object.__init__(self, bus_name, _DS_PATH)
+
+        self.entries = entries
+        self.calls = 0
+
+    @dbus.service.method(_DS_INTERFACE, in_signature='a{sv}as',
+                         out_signature='aa{sv}u')
+    def find(self, query, properties):
+        self.calls += 1
+
+        entries = self.entries
+        if 'uid' in query:
+            entries = [entry for entry in entries
+                       if entry['uid'] in query['uid']]
+
+        offset = query.get('offset', 0)
+        limit = query.get('limit', len(entries))
+        results = []
+        for entry in entries[offset:offset + limit]:
+            if properties:
+                entry = dict((key, value) for key, value in entry.items()
+                             if key in properties)
+            results.append(entry)
+
+        return results, len(entries)
+
+    @dbus.service.method(_DS_INTERFACE, in_signature='s',
+                         out_signature='a{sv}')
+    def get_properties(self, uid):
+        self.calls += 1
+
+        for entry in self.entries:
+            if entry['uid'] == uid:
+                return entry
+        return {}
+
+
+class FakeClient(object):
+    def __init__(self):
+        self.activity_id = None
+        self.results = {}
+
+    def send_result(self, request, result):
+        self.results[request['id']] = result
+
+    def send_error(self, request, error):
+        self.results[request['id']] = error
+
+
+def _wait_for(condition, timeout=10):
+    start = time.time()
+    while not condition() and time.time() - start < timeout:
+        GLib.MainContext.default().iteration(False)
+    return condition()
+
+
+class TestStreamWriter(unittest.TestCase):
+    def setUp(self):
+        self._tmp_dir = tempfile.mkdtemp()
+        self._path = os.path.join(self._tmp_dir, 'data')
+        self._errors = []
+
+    def tearDown(self):
+        shutil.rmtree(self._tmp_dir)
+
+    def _close(self, writer):
+        writer.close(self._errors.append)
+        self.assertTrue(_wait_for(lambda: self._errors))
+
+    def test_write(self):
+        writer = StreamWriter(self._path)
+        for i in range(100):
+            writer.write('x' * 100)
+        self._close(writer)
+
+        self.assertIsNone(self._errors[0])
+        self.assertEqual(100 * 100, os.path.getsize(self._path))
+
+    def test_too_much_queued(self):
+        writer = StreamWriter(self._path, max_queued_size=1024)
+        # nothing can be written before the main loop runs
+        for i in range(20):
+            writer.write('x' * 100)
+        self._close(writer)
+
+        self.assertIsNotNone(self._errors[0])
+
+
+class TestDatastoreAPI(unittest.TestCase):
+    def setUp(self):
+        entries = []
+        for i in range(500):
+            entries.append({'uid': 'uid-%d' % i,
+                            'title': 'Entry %d' % i,
+                            'mime_type': 'text/plain'})
+        self._data_store = FakeDataStore(entries)
+
+        self._client = FakeClient()
+        self._api = DatastoreAPI(self._client)
+        self._request_id = 0
+
+    def tearDown(self):
+        self._data_store.remove_from_connection()
+        dbus.SessionBus().release_name(_DS_SERVICE)
+
+    def _call(self, method, params):
+        self._request_id += 1
+        request = {'id': self._request_id, 'params': params}
+        getattr(self._api, method)(request)
+        self.assertTrue(_wait_for(
+            lambda: self._request_id in self._client.results))
+        return self._client.results[self._request_id]
+
+    def test_get_metadata_many_calls(self):
+        for size in [1, 10, 100, 500]:
+            self._data_store.calls = 0
+            uids = ['uid-%d' % i for i in reversed(range(size))]
+            result = self._call('get_metadata_many', [uids, ['title']])
+
+            self.assertEqual(1, self._data_store.calls)
+            self.assertEqual(size, len(result[0]))
+
+    def test_get_metadata_many_properties(self):
+        uids = ['uid-3', 'missing', 'uid-1']
+        result = self._call('get_metadata_many', [uids, ['title']])
+
+        self.assertEqual([{'title': 'Entry 3'}, None, {'title': 'Entry 1'}],
+                         result[0])
+
+    def test_find(self):
+        result = self._call('find', [{}, ['uid'], 10, 5])
+        entries, count = result
+
+        self.assertEqual(1, self._data_store.calls)
+        self.assertEqual(500, count)
+        self.assertEqual([{'uid': 'uid-%d' % i} for i in range(10, 15)],
+                         entries)
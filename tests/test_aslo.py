@@ -0,0 +1,151 @@
+# Copyright (C) 2013, One Laptop per Child
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import threading
+import unittest
+import urlparse
+import BaseHTTPServer
+import SocketServer
+
+from gi.repository import GLib
+
+from jarabe.model.update import aslo
+
+GLib.threads_init()
+
+_BUNDLES = 20
+
+_UPDATE_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<RDF:RDF xmlns:RDF="http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+         xmlns:em="http://www.mozilla.org/2004/em-rdf#">
+<RDF:Description about="urn:mozilla:extension:%(id)s">
+    <em:updates>
+        <RDF:Seq>
+            <RDF:li resource="urn:mozilla:extension:%(id)s:%(version)s"/>
+        </RDF:Seq>
+    </em:updates>
+</RDF:Description>
+<RDF:Description about="urn:mozilla:extension:%(id)s:%(version)s">
+    <em:version>%(version)s</em:version>
+    <em:targetApplication>
+        <RDF:Description>
+            <em:updateLink>http://example.com/%(id)s.xo</em:updateLink>
+            <em:updateSize>%(version)s</em:updateSize>
+        </RDF:Description>
+    </em:targetApplication>
+</RDF:Description>
+</RDF:RDF>
+"""
+
+_NO_UPDATE_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<RDF:RDF xmlns:RDF="http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+         xmlns:em="http://www.mozilla.org/2004/em-rdf#">
+</RDF:RDF>
+"""
+
+
+class _UpdateRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    def do_GET(self):
+        query = urlparse.parse_qs(urlparse.urlparse(self.path).query)
+        bundle_id = query['id'][0]
+        number = int(bundle_id.rsplit('.', 1)[1])
+
+        if number % 4 == 0:
+            data = _NO_UPDATE_XML
+        else:
+            data = _UPDATE_XML % {'id': bundle_id, 'version': number % 3 + 1}
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/xml')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _ThreadingHTTPServer(SocketServer.ThreadingMixIn,
+                           BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+class _MockBundle(object):
+    def __init__(self, number):
+        self._number = number
+
+    def get_bundle_id(self):
+        return 'org.sugarlabs.Test.%d' % self._number
+
+    def get_name(self):
+        return 'Test %d' % self._number
+
+    def get_activity_version(self):
+        return '1'
+
+
+class TestAsloUpdater(unittest.TestCase):
+    def setUp(self):
+        self._server = _ThreadingHTTPServer(('127.0.0.1', 0),
+                                            _UpdateRequestHandler)
+        self._server_thread = threading.Thread(
+            target=self._server.serve_forever)
+        self._server_thread.daemon = True
+        self._server_thread.start()
+
+        self._update_path = aslo._UPDATE_PATH
+        aslo._UPDATE_PATH = 'http://127.0.0.1:%d/update' % \
+            self._server.server_address[1]
+
+    def tearDown(self):
+        aslo._UPDATE_PATH = self._update_path
+        self._server.shutdown()
+        self._server_thread.join()
+
+    def _fetch(self, max_checks):
+        self._updates = None
+        self._progress = []
+        bundles = [_MockBundle(i) for i in range(_BUNDLES)]
+
+        updater = aslo.AsloUpdater(max_checks)
+        updater.fetch_update_info(bundles, False, self.__progress_cb,
+                                  self.__completion_cb, None)
+
+        context = GLib.MainContext.default()
+        while self._updates is None:
+            context.iteration(True)
+
+        return [(update.bundle_id, update.version, update.link, update.size)
+                for update in self._updates]
+
+    def __progress_cb(self, bundle_name, progress):
+        self._progress.append(progress)
+
+    def __completion_cb(self, updates):
+        self._updates = updates
+
+    def test_concurrent_results(self):
+        serial = self._fetch(1)
+        concurrent = self._fetch(8)
+
+        self.assertEqual(serial, concurrent)
+        self.assertEqual(10, len(concurrent))
+
+    def test_progress(self):
+        self._fetch(8)
+
+        self.assertEqual(sorted(self._progress), self._progress)
+        self.assertEqual(1.0, self._progress[-1])
@@ -15,12 +15,16 @@
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
 from gi.repository import GLib
+import logging
 import shutil
 import tempfile
+import time
 import unittest
 import os
 
 from jarabe.model import bundleregistry
+from jarabe.model import mimeregistry
+from sugar3.bundle.activitybundle import ActivityBundle
 from sugar3.bundle.helpers import bundle_from_archive
 
 GLib.threads_init()
@@ -34,6 +38,18 @@ os.environ["SUGAR_ACTIVITIES_DEFAULTS"] = \
 os.environ["SUGAR_MIME_DEFAULTS"] = \
     os.path.join(base_dir, "data", "mime.defaults")
 
+_BUNDLES = 200
+_LOOKUPS = 100
+
+_ACTIVITY_INFO = """[Activity]
+name = Mime Test %(number)d
+activity_version = 1
+bundle_id = org.sugarlabs.MimeTest%(number)d
+exec = sugar-activity mimetest.MimeTestActivity
+icon = activity-mimetest
+mime_types = text/x-mime-test-%(number)d;text/x-mime-test
+"""
+
 
 class TestBundleRegistry(unittest.TestCase):
     def setUp(self):
@@ -64,3 +80,87 @@ class TestBundleRegistry(unittest.TestCase):
         registry.install(bundle)
         installed_bundle = registry.get_bundle("org.sugarlabs.MyActivity")
         self.assertIsNotNone(installed_bundle)
+
+
+def _scan_activities_for_type(registry, mime_type):
+    """What get_activities_for_type did before the index"""
+    result = []
+
+    mime = mimeregistry.get_registry()
+    default_bundle_id = mime.get_default_activity(mime_type)
+    default_bundle = None
+
+    for bundle in registry:
+        if not isinstance(bundle, ActivityBundle):
+            continue
+        if mime_type in (bundle.get_mime_types() or []):
+            if bundle.get_bundle_id() == default_bundle_id:
+                default_bundle = bundle
+            elif registry.get_default_for_type(mime_type) == \
+                    bundle.get_bundle_id():
+                result.insert(0, bundle)
+            else:
+                result.append(bundle)
+
+    if default_bundle is not None:
+        result.insert(0, default_bundle)
+
+    return result
+
+
+class TestMimeIndex(unittest.TestCase):
+    def setUp(self):
+        self._activities_path = tempfile.mkdtemp()
+        self._registry = bundleregistry.get_registry()
+        self._paths = []
+        for number in range(_BUNDLES):
+            path = os.path.join(self._activities_path,
+                                'MimeTest%d.activity' % number)
+            os.makedirs(os.path.join(path, 'activity'))
+            with open(os.path.join(path, 'activity',
+                                   'activity.info'), 'w') as info:
+                info.write(_ACTIVITY_INFO % {'number': number})
+            self._registry.add_bundle(path)
+            self._paths.append(path)
+
+    def tearDown(self):
+        for path in self._paths:
+            self._registry.remove_bundle(path)
+        shutil.rmtree(self._activities_path)
+
+    def test_invalidate(self):
+        mime_type = 'text/x-mime-test-7'
+        self.assertEqual(1, len(self._registry.get_activities_for_type(
+            mime_type)))
+
+        self._registry.remove_bundle(self._paths.pop(7))
+        self.assertEqual([], self._registry.get_activities_for_type(
+            mime_type))
+
+    def test_lookup_time(self):
+        mime_types = ['text/x-mime-test', 'text/x-mime-test-42',
+                      'application/x-unknown']
+
+        start = time.time()
+        for i in range(_LOOKUPS):
+            for mime_type in mime_types:
+                expected = _scan_activities_for_type(self._registry,
+                                                     mime_type)
+        scan_time = time.time() - start
+
+        start = time.time()
+        for i in range(_LOOKUPS):
+            for mime_type in mime_types:
+                result = self._registry.get_activities_for_type(mime_type)
+        index_time = time.time() - start
+
+        for mime_type in mime_types:
+            self.assertEqual(
+                _scan_activities_for_type(self._registry, mime_type),
+                self._registry.get_activities_for_type(mime_type))
+        self.assertEqual(expected, result)
+
+        logging.info('%d MIME type lookups with %d bundles: %.3f s '
+                     'scanning, %.3f s with the index', _LOOKUPS * 3,
+                     _BUNDLES, scan_time, index_time)
+        self.assertLess(index_time, scan_time)
@@ -15,6 +15,9 @@
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
 import os
+import shutil
+import hashlib
+import tempfile
 import unittest
 import threading
 import SimpleHTTPServer
@@ -25,6 +28,7 @@ from gi.repository import GLib
 
 from sugar3 import env
 from jarabe.util.downloader import Downloader
+from jarabe.util.httpcache import HTTPCache
 
 profile_data_dir = os.path.join(env.get_profile_path(), 'data')
 if not os.path.isdir(profile_data_dir):
@@ -91,3 +95,155 @@ class TestDownloader(unittest.TestCase):
             Gtk.main_iteration()
 
         self.assertEqual(6, self._result)
+
+
+class _CachingRequestHandler(SimpleHTTPServer.SimpleHTTPRequestHandler):
+    """Serve files with an ETag, honouring If-None-Match and open ended
+    Range requests, and count the bytes of content sent"""
+
+    def do_GET(self):
+        try:
+            data = open(self.translate_path(self.path)).read()
+        except IOError:
+            self.send_error(404)
+            return
+
+        etag = '"%s"' % hashlib.sha1(data).hexdigest()
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        start = 0
+        range_header = self.headers.get('Range')
+        if range_header is not None and \
+                self.headers.get('If-Range', etag) == etag:
+            start = int(range_header.split('=')[1].split('-')[0])
+
+        if start > 0:
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes %d-%d/%d' %
+                             (start, len(data) - 1, len(data)))
+        else:
+            self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(data) - start))
+        self.end_headers()
+
+        self.wfile.write(data[start:])
+        self.server.bytes_sent += len(data) - start
+
+
+class TestDownloaderCache(unittest.TestCase):
+    def setUp(self):
+        self._server = SocketServer.TCPServer(("127.0.0.1", 0),
+                                              _CachingRequestHandler)
+        self._server.bytes_sent = 0
+        self._port = self._server.server_address[1]
+        self._server_thread = threading.Thread(
+            target=self._server.serve_forever)
+        self._server_thread.daemon = True
+        self._server_thread.start()
+
+        self._cache_dir = tempfile.mkdtemp()
+        self._cache = HTTPCache(self._cache_dir)
+        self._url = "http://127.0.0.1:%d/data/activity-1.xo" % self._port
+        self._data = open(os.path.join(data_dir, "activity-1.xo")).read()
+
+    def tearDown(self):
+        self._server.shutdown()
+        self._server_thread.join()
+        shutil.rmtree(self._cache_dir)
+
+    def download_complete_cb(self, downloader, result):
+        self._complete = True
+        self._result = result
+
+    def _download(self, method):
+        downloader = Downloader(self._url, cache=self._cache)
+        self._complete = False
+        downloader.connect('complete', self.download_complete_cb)
+        getattr(downloader, method)()
+
+        while not self._complete:
+            Gtk.main_iteration()
+
+        return downloader
+
+    def test_revalidate(self):
+        downloader = self._download('download')
+        self.assertEqual(self._data, self._result.get_data())
+        self.assertEqual(len(self._data), downloader.get_transferred_size())
+
+        downloader = self._download('download')
+        self.assertEqual(self._data, self._result.get_data())
+        self.assertEqual(0, downloader.get_transferred_size())
+        self.assertEqual(len(self._data), downloader.get_cached_size())
+        self.assertEqual(len(self._data), self._server.bytes_sent)
+
+    def test_revalidate_to_temp(self):
+        self._download('download_to_temp')
+        downloader = self._download('download_to_temp')
+
+        self.assertIsNone(self._result)
+        path = downloader.get_local_file_path()
+        self.assertEqual(self._data, open(path).read())
+        self.assertEqual(len(self._data), downloader.get_cached_size())
+        self.assertEqual(len(self._data), self._server.bytes_sent)
+        self.assertEqual(hashlib.sha256(self._data).hexdigest(),
+                         downloader.get_sha256())
+        os.unlink(path)
+
+    def test_revalidate_to_temp_from_data(self):
+        # an entry cached from memory has the digest of its data too
+        self._download('download')
+        self.assertEqual(hashlib.sha256(self._data).hexdigest(),
+                         self._cache.lookup(self._url)['sha256'])
+
+        downloader = self._download('download_to_temp')
+        self.assertIsNone(self._result)
+        self.assertEqual(hashlib.sha256(self._data).hexdigest(),
+                         downloader.get_sha256())
+        os.unlink(downloader.get_local_file_path())
+
+    def _write_partial(self, size, etag):
+        with open(self._cache.get_partial_path(self._url), 'w') as partial:
+            partial.write(self._data[:size])
+        self._cache.set_partial_validators(self._url, {'etag': etag})
+
+    def test_resume(self):
+        etag = '"%s"' % hashlib.sha1(self._data).hexdigest()
+        size = len(self._data) / 2
+        self._write_partial(size, etag)
+
+        downloader = self._download('download_to_temp')
+
+        self.assertIsNone(self._result)
+        path = downloader.get_local_file_path()
+        self.assertEqual(self._data, open(path).read())
+        self.assertEqual(len(self._data) - size,
+                         downloader.get_transferred_size())
+        self.assertEqual(size, downloader.get_cached_size())
+        self.assertEqual(len(self._data) - size, self._server.bytes_sent)
+        self.assertEqual(hashlib.sha256(self._data).hexdigest(),
+                         downloader.get_sha256())
+        os.unlink(path)
+
+    def test_resume_changed(self):
+        self._write_partial(len(self._data) / 2, '"outdated"')
+
+        downloader = self._download('download_to_temp')
+
+        path = downloader.get_local_file_path()
+        self.assertEqual(self._data, open(path).read())
+        self.assertEqual(len(self._data), self._server.bytes_sent)
+        os.unlink(path)
+
+    def test_size_limit(self):
+        cache = HTTPCache(self._cache_dir, max_size=10)
+        cache.store_data('http://example.com/a', {'etag': '"a"'}, 'a' * 6)
+        cache.store_data('http://example.com/b', {'etag': '"b"'}, 'b' * 6)
+
+        self.assertIsNone(cache.lookup('http://example.com/a'))
+        self.assertEqual('b' * 6, cache.read('http://example.com/b'))
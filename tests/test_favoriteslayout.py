@@ -0,0 +1,109 @@
+# Copyright (C) 2013, One Laptop per Child
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import logging
+import time
+import unittest
+
+from gi.repository import Gdk
+
+from jarabe.desktop.favoriteslayout import RingLayout
+
+_SIZES = [10, 30, 100, 300, 1000]
+
+
+class _MockIcon(object):
+    def __init__(self, name):
+        self.name = name
+        self.size = None
+        self.allocation = None
+        self.child_visible = True
+        self.size_requests = 0
+
+    def get_activity_name(self):
+        return self.name
+
+    def set_size(self, size):
+        self.size = size
+
+    def get_preferred_width(self):
+        self.size_requests += 1
+        return self.size, self.size
+
+    def get_preferred_height(self):
+        return self.size, self.size
+
+    def set_child_visible(self, visible):
+        self.child_visible = visible
+
+    def size_allocate(self, allocation):
+        self.allocation = allocation
+
+
+class TestRingLayout(unittest.TestCase):
+    def setUp(self):
+        self._allocation = Gdk.Rectangle()
+        self._allocation.x = 0
+        self._allocation.y = 0
+        self._allocation.width = 1200
+        self._allocation.height = 900
+
+    def _allocate(self, layout, children):
+        start = time.time()
+        layout.allocate_children(self._allocation, children)
+        return time.time() - start
+
+    def test_allocation_cache(self):
+        for count in _SIZES:
+            layout = RingLayout()
+            children = [_MockIcon('activity %04d' % i)
+                        for i in reversed(range(count))]
+
+            first = self._allocate(layout, children)
+            for child in children:
+                self.assertIsNotNone(child.allocation)
+                child.size_requests = 0
+
+            cached = self._allocate(layout, children)
+            for child in children:
+                self.assertEqual(0, child.size_requests)
+
+            logging.info('RingLayout, %d children: %.2f ms, cached %.2f ms',
+                         count, first * 1000, cached * 1000)
+
+    def test_child_set_change(self):
+        layout = RingLayout()
+        children = [_MockIcon('activity %02d' % i) for i in range(10)]
+        self._allocate(layout, children)
+
+        removed = children.pop()
+        layout.remove(removed)
+        for child in children:
+            child.size_requests = 0
+        self._allocate(layout, children)
+        for child in children:
+            self.assertEqual(1, child.size_requests)
+
+    def test_sort_order(self):
+        layout = RingLayout()
+        children = [_MockIcon(name) for name in ['b', 'c', 'a']]
+        self._allocate(layout, children)
+
+        # the first icon of the ring is placed at the top
+        top = min(children, key=lambda child: child.allocation.y)
+        self.assertEqual('a', top.name)
+        self.assertEqual(['b', 'c', 'a'],
+                         [child.name for child in children])
@@ -0,0 +1,139 @@
+# Copyright (C) 2013, One Laptop per Child
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import hashlib
+import time
+import unittest
+
+from gi.repository import Gio
+from gi.repository import GLib
+from gi.repository import GObject
+
+from jarabe.model import filetransfer
+
+_FILE_SIZE = 100 * 1024 * 1024
+_BLOCK_SIZE = 4096
+
+
+def _wait_for(condition, timeout=10):
+    start = time.time()
+    while not condition() and time.time() - start < timeout:
+        GLib.MainContext.default().iteration(False)
+        time.sleep(0.01)
+    return condition()
+
+
+class FakeFileTransfer(GObject.GObject):
+    transferred_bytes = GObject.property(type=int, default=0)
+    state = GObject.property(type=int, default=filetransfer.FT_STATE_OPEN)
+
+    def __init__(self, file_size):
+        GObject.GObject.__init__(self)
+        self.file_size = file_size
+
+
+class TestProgressThrottle(unittest.TestCase):
+    def setUp(self):
+        self._transfer = FakeFileTransfer(_FILE_SIZE)
+        self._writes = []
+
+    def _write(self, progress):
+        self._writes.append(progress)
+
+    def test_step(self):
+        throttle = filetransfer.ProgressThrottle(self._transfer, self._write,
+                                                 step=0.05, interval=60)
+        for transferred in xrange(0, _FILE_SIZE + 1, _BLOCK_SIZE):
+            self._transfer.props.transferred_bytes = transferred
+        throttle.stop()
+
+        self.assertLessEqual(len(self._writes), 22)
+        self.assertEqual(1.0, self._writes[-1])
+        self.assertEqual(sorted(self._writes), self._writes)
+
+    def test_interval(self):
+        filetransfer.ProgressThrottle(self._transfer, self._write,
+                                      step=1, interval=0.1)
+        for transferred in xrange(0, 100 * _BLOCK_SIZE, _BLOCK_SIZE):
+            self._transfer.props.transferred_bytes = transferred
+        self.assertEqual(1, len(self._writes))
+
+        # the pending progress is written once the interval is over
+        self.assertTrue(_wait_for(lambda: len(self._writes) == 2))
+        self.assertEqual(99 * _BLOCK_SIZE / float(_FILE_SIZE),
+                         self._writes[-1])
+
+    def test_completed(self):
+        filetransfer.ProgressThrottle(self._transfer, self._write,
+                                      step=1, interval=0.1)
+        self._transfer.props.transferred_bytes = _BLOCK_SIZE
+        self._transfer.props.transferred_bytes = 2 * _BLOCK_SIZE
+        self._transfer.props.state = filetransfer.FT_STATE_COMPLETED
+        self._transfer.props.transferred_bytes = 3 * _BLOCK_SIZE
+
+        time.sleep(0.2)
+        GLib.MainContext.default().iteration(False)
+        self.assertEqual(1, len(self._writes))
+
+
+class TestHashingSplicer(unittest.TestCase):
+    def setUp(self):
+        self._data = ''.join(chr(i % 251) for i in xrange(300 * 1024))
+        self._input = Gio.MemoryInputStream.new_from_bytes(
+            GLib.Bytes.new(self._data))
+        self._errors = []
+
+    def _splice_cb(self, error):
+        self._errors.append(error)
+
+    def test_splice(self):
+        output = Gio.MemoryOutputStream.new_resizable()
+        splicer = filetransfer.HashingSplicer(self._input, output, 'sha1')
+        splicer.splice_async(self._splice_cb)
+        self.assertTrue(_wait_for(lambda: self._errors))
+
+        self.assertEqual([None], self._errors)
+        self.assertTrue(output.is_closed())
+        self.assertTrue(self._input.is_closed())
+        self.assertEqual(self._data, output.steal_as_bytes().get_data())
+        self.assertEqual(len(self._data), splicer.get_size())
+        self.assertEqual(hashlib.sha1(self._data).hexdigest(),
+                         splicer.get_digest())
+
+    def test_hash_only(self):
+        splicer = filetransfer.HashingSplicer(self._input, None)
+        splicer.splice_async(self._splice_cb)
+        self.assertTrue(_wait_for(lambda: self._errors))
+
+        self.assertEqual([None], self._errors)
+        self.assertEqual(hashlib.sha256(self._data).hexdigest(),
+                         splicer.get_digest())
+
+
+class TestThroughput(unittest.TestCase):
+    def test_eta(self):
+        transfer = filetransfer.BaseFileTransfer(None)
+        transfer.file_size = _FILE_SIZE
+        self.assertEqual(0.0, transfer.props.throughput)
+        self.assertEqual(-1, transfer.props.eta)
+
+        transfer.props.transferred_bytes = 0
+        time.sleep(0.1)
+        transfer.props.transferred_bytes = _FILE_SIZE / 2
+
+        self.assertGreater(transfer.props.throughput, 0)
+        self.assertGreaterEqual(transfer.props.eta, 0)
+        self.assertLessEqual(transfer.props.eta, 1)
@@ -0,0 +1,86 @@
+# Copyright (C) 2013, One Laptop per Child
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+tests_dir = os.getcwd()
+base_dir = os.path.dirname(tests_dir)
+rules_dir = os.path.join(tests_dir, 'data', 'xkb', 'rules')
+
+sys.path.append(os.path.join(base_dir, 'extensions'))
+from cpsection.keyboard import model
+
+
+def _get_live_registry(rules_path):
+    from gi.repository import GdkX11
+    from gi.repository import Xkl
+
+    engine = Xkl.Engine.get_instance(GdkX11.x11_get_default_xdisplay())
+    registry = Xkl.ConfigRegistry.get_instance(engine)
+    if not registry.load_from_file(rules_path, 0):
+        raise RuntimeError('Could not load %s' % rules_path)
+    return registry
+
+
+class TestRegistrySnapshot(unittest.TestCase):
+    def setUp(self):
+        self._tmp_dir = tempfile.mkdtemp()
+        self._rules_dir = os.path.join(self._tmp_dir, 'rules')
+        shutil.copytree(rules_dir, self._rules_dir)
+        self._rules_path = os.path.join(self._rules_dir, 'evdev.xml')
+        self._snapshot_path = os.path.join(self._tmp_dir, 'snapshot.json')
+
+    def tearDown(self):
+        shutil.rmtree(self._tmp_dir)
+
+    @unittest.skipUnless(os.environ.get('DISPLAY'), 'X is required')
+    def test_cached_equals_live(self):
+        live = model.build_snapshot(_get_live_registry(self._rules_path))
+        self.assertEqual(2, len(live['models']))
+        self.assertEqual(['eng', 'spa'], sorted(
+            name for description, name in live['languages']))
+        self.assertEqual(3, len(live['layouts']['spa']))
+        self.assertIn(['Default layout, English (US)', 'us()'],
+                      live['layouts']['eng'])
+        self.assertEqual(2, len(live['options']))
+
+        key = model.get_snapshot_key(self._rules_dir)
+        model.save_snapshot(self._snapshot_path, key, live)
+        cached = model.load_snapshot(self._snapshot_path, key)
+        self.assertEqual(live, cached)
+        for description, name in cached['models']:
+            self.assertIsInstance(description, str)
+
+    def test_rules_changed(self):
+        key = model.get_snapshot_key(self._rules_dir)
+        model.save_snapshot(self._snapshot_path, key,
+                            {'models': [['OLPC', 'olpc']], 'languages': [],
+                             'options': [], 'layouts': {}})
+        self.assertIsNotNone(model.load_snapshot(self._snapshot_path, key))
+
+        mtime = time.time() + 10
+        os.utime(self._rules_path, (mtime, mtime))
+        key = model.get_snapshot_key(self._rules_dir)
+        self.assertIsNone(model.load_snapshot(self._snapshot_path, key))
+
+    def test_missing_rules(self):
+        self.assertIsNone(model.get_snapshot_key(
+            os.path.join(self._tmp_dir, 'missing')))
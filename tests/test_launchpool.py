@@ -0,0 +1,246 @@
+# Copyright (C) 2013, One Laptop per Child
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from distutils.spawn import find_executable
+
+from gi.repository import GLib
+
+from jarabe.model import launchpool
+
+GLib.threads_init()
+
+_IDLE_HOST = [sys.executable, '-c', 'import sys; sys.stdin.readline()']
+_LAUNCHES = 5
+
+_ACTIVITY_INFO = """[Activity]
+name = Launch Test
+activity_version = 1
+bundle_id = org.sugarlabs.LaunchTestActivity
+exec = sugar-activity launchtest.LaunchTestActivity
+icon = activity-launchtest
+"""
+
+_ACTIVITY_CODE = """from sugar3.activity import activity
+
+
+class LaunchTestActivity(activity.Activity):
+    def __init__(self, handle):
+        activity.Activity.__init__(self, handle)
+"""
+
+_GTK2_ACTIVITY_CODE = """import gtk
+
+from sugar.activity import activity
+
+
+class LaunchTestActivity(activity.Activity):
+    pass
+"""
+
+
+def _wait_for(condition, timeout=10):
+    start = time.time()
+    while not condition() and time.time() - start < timeout:
+        GLib.MainContext.default().iteration(False)
+        time.sleep(0.01)
+    return condition()
+
+
+class TestLaunchPool(unittest.TestCase):
+    def setUp(self):
+        self._memory = 1024 * 1024
+        self._pool = launchpool.LaunchPool(2, host_command=_IDLE_HOST,
+                                           get_memory=self._get_memory)
+
+    def tearDown(self):
+        self._pool.stop()
+
+    def _get_memory(self):
+        return self._memory
+
+    def test_start(self):
+        self._pool.start()
+        self.assertEqual(2, self._pool.get_idle_hosts())
+
+    def test_low_memory(self):
+        self._memory = 0
+        self._pool.start()
+        self.assertEqual(0, self._pool.get_idle_hosts())
+
+    def test_shrink(self):
+        self._pool.start()
+        self._memory = 0
+        self._pool._refill()
+        self.assertEqual(0, self._pool.get_idle_hosts())
+
+    def test_host_exit(self):
+        self._pool.start()
+        os.kill(self._pool._hosts[0].pid, 9)
+        self.assertTrue(_wait_for(lambda: self._pool.get_idle_hosts() == 1))
+
+
+class TestToolkit(unittest.TestCase):
+    def setUp(self):
+        self._bundle_path = tempfile.mkdtemp()
+        self._command = ['sugar-activity', 'launchtest.LaunchTestActivity',
+                         '-b', 'org.sugarlabs.LaunchTestActivity']
+
+    def tearDown(self):
+        shutil.rmtree(self._bundle_path)
+
+    def _write_module(self, code, name='launchtest.py'):
+        with open(os.path.join(self._bundle_path, name), 'w') as module:
+            module.write(code)
+
+    def test_sugar3(self):
+        self._write_module(_ACTIVITY_CODE)
+        self.assertTrue(launchpool.is_sugar3_activity(self._bundle_path,
+                                                      self._command))
+
+    def test_gtk2(self):
+        self._write_module(_GTK2_ACTIVITY_CODE)
+        self.assertFalse(launchpool.is_sugar3_activity(self._bundle_path,
+                                                       self._command))
+
+    def test_package(self):
+        os.makedirs(os.path.join(self._bundle_path, 'launchtest'))
+        self._write_module(_ACTIVITY_CODE,
+                           os.path.join('launchtest', '__init__.py'))
+        self.assertTrue(launchpool.is_sugar3_activity(self._bundle_path,
+                                                      self._command))
+
+    def test_missing_module(self):
+        self.assertFalse(launchpool.is_sugar3_activity(self._bundle_path,
+                                                       self._command))
+
+
+@unittest.skipUnless(find_executable('Xvfb') and
+                     find_executable('metacity') and
+                     find_executable('dbus-launch') and
+                     find_executable('sugar-activity'),
+                     'Xvfb, metacity, dbus-launch and sugar-activity '
+                     'are required')
+class TestLaunchLatency(unittest.TestCase):
+    """Compare how long ShellModel takes to see the main window of an
+    activity, launched from scratch and from the pool, on Xvfb.
+    """
+
+    def setUp(self):
+        self._tmp_dir = tempfile.mkdtemp()
+        self._bundle_path = os.path.join(self._tmp_dir,
+                                         'LaunchTest.activity')
+        os.makedirs(os.path.join(self._bundle_path, 'activity'))
+        with open(os.path.join(self._bundle_path, 'activity',
+                               'activity.info'), 'w') as info:
+            info.write(_ACTIVITY_INFO)
+        with open(os.path.join(self._bundle_path,
+                               'launchtest.py'), 'w') as code:
+            code.write(_ACTIVITY_CODE)
+
+        self._display = ':%d' % (100 + os.getpid() % 100)
+        self._xvfb = subprocess.Popen(['Xvfb', self._display, '-screen',
+                                       '0', '1200x900x24'])
+        self._environ = dict(os.environ, DISPLAY=self._display)
+        time.sleep(1)
+        self._wm = subprocess.Popen(['metacity', '--no-force-fullscreen'],
+                                    env=self._environ)
+        time.sleep(1)
+
+    def tearDown(self):
+        self._wm.terminate()
+        self._xvfb.terminate()
+        shutil.rmtree(self._tmp_dir)
+
+    def _measure(self, mode):
+        output = subprocess.check_output(
+            ['dbus-launch', '--exit-with-session', sys.executable,
+             os.path.abspath(__file__), mode, self._bundle_path],
+            env=self._environ)
+        return json.loads(output.splitlines()[-1])
+
+    def test_launch_latency(self):
+        cold = self._measure('cold')
+        pooled = self._measure('pool')
+        self.assertEqual(_LAUNCHES, len(cold))
+        self.assertEqual(_LAUNCHES, len(pooled))
+
+        cold_median = sorted(cold)[_LAUNCHES / 2]
+        pooled_median = sorted(pooled)[_LAUNCHES / 2]
+        logging.info('Median launch time: %.3f s from scratch, '
+                     '%.3f s from the pool', cold_median, pooled_median)
+        self.assertLess(pooled_median, cold_median)
+
+
+def _run_launches(mode, bundle_path):
+    from sugar3.activity import activityfactory
+    from sugar3.activity.activityhandle import ActivityHandle
+    from sugar3.bundle.activitybundle import ActivityBundle
+
+    from jarabe.model import shell
+    from jarabe.model.bundleregistry import get_registry
+
+    bundle = ActivityBundle(bundle_path)
+    get_registry().add_bundle(bundle_path)
+    model = shell.get_model()
+
+    launched = []
+    model.connect('launch-completed',
+                  lambda model, activity: launched.append(time.time()))
+
+    pool = launchpool.LaunchPool(1)
+    pool.start()
+
+    times = []
+    for i in range(_LAUNCHES):
+        _wait_for(lambda: pool.get_idle_hosts() == 1, timeout=30)
+        handle = ActivityHandle(activityfactory.create_activity_id())
+        del launched[:]
+
+        start = time.time()
+        if mode == 'pool':
+            pool.launch(bundle, handle)
+        else:
+            model.notify_launch(handle.activity_id, bundle.get_bundle_id())
+            command = activityfactory.get_command(bundle, handle.activity_id)
+            subprocess.Popen([str(arg) for arg in command],
+                             env=activityfactory.get_environment(bundle),
+                             cwd=bundle_path)
+
+        if not _wait_for(lambda: launched, timeout=60):
+            raise RuntimeError('Launch %d (%s) did not complete within '
+                               '60 seconds' % (i, mode))
+        times.append(launched[0] - start)
+
+        activity = model.get_activity_by_id(handle.activity_id)
+        activity.close_window()
+        _wait_for(lambda: model.get_activity_by_id(handle.activity_id)
+                  is None)
+
+    pool.stop()
+    print json.dumps(times)
+
+
+if __name__ == '__main__':
+    _run_launches(sys.argv[1], sys.argv[2])
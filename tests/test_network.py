@@ -0,0 +1,197 @@
+# Copyright (C) 2013, One Laptop per Child
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import os
+import subprocess
+import time
+import unittest
+from distutils.spawn import find_executable
+
+import dbus
+import dbus.service
+from dbus.mainloop.glib import DBusGMainLoop
+from gi.repository import GLib
+
+from jarabe.model import network
+
+DBusGMainLoop(set_as_default=True)
+
+_CONNECTIONS = 200
+
+
+def _wait_for(condition, timeout=10):
+    start = time.time()
+    while not condition() and time.time() - start < timeout:
+        GLib.MainContext.default().iteration(False)
+    return condition()
+
+
+def _make_settings(number, ssid=None):
+    if ssid is None:
+        ssid = 'network-%d' % number
+    return {'connection': {'id': 'connection-%d' % number,
+                           'uuid': 'uuid-%d' % number,
+                           'type': '802-11-wireless'},
+            '802-11-wireless': {'ssid': dbus.ByteArray(ssid)}}
+
+
+class MockConnection(dbus.service.Object):
+    def __init__(self, bus_name, number):
+        self.path = '%s/%d' % (network.NM_SETTINGS_PATH, number)
+        dbus.service.Object.__init__(self, bus_name, self.path)
+        self.settings = _make_settings(number)
+
+    @dbus.service.method(network.NM_CONNECTION_IFACE, in_signature='',
+                         out_signature='a{sa{sv}}')
+    def GetSettings(self):
+        return self.settings
+
+    @dbus.service.signal(network.NM_CONNECTION_IFACE, signature='')
+    def Updated(self):
+        pass
+
+    @dbus.service.signal(network.NM_CONNECTION_IFACE, signature='')
+    def Removed(self):
+        pass
+
+
+class MockSettings(dbus.service.Object):
+    def __init__(self, bus_name):
+        dbus.service.Object.__init__(self, bus_name,
+                                     network.NM_SETTINGS_PATH)
+        self.connections = []
+
+    @dbus.service.method(network.NM_SETTINGS_IFACE, in_signature='',
+                         out_signature='ao')
+    def ListConnections(self):
+        return [connection.path for connection in self.connections]
+
+    @dbus.service.signal(network.NM_SETTINGS_IFACE, signature='o')
+    def NewConnection(self, connection_o):
+        pass
+
+
+@unittest.skipUnless(find_executable('dbus-daemon'), 'dbus-daemon is required')
+class TestConnections(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # NetworkManager lives on the system bus, replace it by a private one
+        cls._daemon = subprocess.Popen(
+            ['dbus-daemon', '--session', '--nofork', '--print-address'],
+            stdout=subprocess.PIPE)
+        address = cls._daemon.stdout.readline().strip()
+        cls._system_bus_address = os.environ.get('DBUS_SYSTEM_BUS_ADDRESS')
+        os.environ['DBUS_SYSTEM_BUS_ADDRESS'] = address
+
+        cls._bus = dbus.SystemBus()
+        cls._bus_name = dbus.service.BusName(network.NM_SERVICE, bus=cls._bus)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._daemon.terminate()
+        cls._daemon.wait()
+        if cls._system_bus_address is None:
+            del os.environ['DBUS_SYSTEM_BUS_ADDRESS']
+        else:
+            os.environ['DBUS_SYSTEM_BUS_ADDRESS'] = cls._system_bus_address
+
+    def setUp(self):
+        self._settings = MockSettings(self._bus_name)
+        for number in range(_CONNECTIONS):
+            self._settings.connections.append(
+                MockConnection(self._bus_name, number))
+
+        # skip the migration of old connections
+        obj = self._bus.get_object(network.NM_SERVICE,
+                                   network.NM_SETTINGS_PATH)
+        network._nm_settings = dbus.Interface(obj, network.NM_SETTINGS_IFACE)
+
+        self._connections = network.Connections()
+        self.assertTrue(_wait_for(self._connections.is_ready))
+
+    def tearDown(self):
+        network._nm_settings = None
+        for connection in self._settings.connections:
+            connection.remove_from_connection()
+        self._settings.remove_from_connection()
+
+    def test_ready(self):
+        self.assertEqual(_CONNECTIONS, len(self._connections.get_list()))
+        for connection in self._connections.get_list():
+            self.assertTrue(connection.is_loaded())
+
+    def test_find(self):
+        connection = self._connections.find_by_ssid('network-42')
+        self.assertEqual('connection-42', connection.get_id())
+        connection = self._connections.find_by_id('connection-7')
+        self.assertEqual('network-7', connection.get_ssid())
+        self.assertIsNone(self._connections.find_by_ssid('unknown'))
+
+    def test_new_connection(self):
+        mock = MockConnection(self._bus_name, _CONNECTIONS)
+        self._settings.connections.append(mock)
+        self._settings.NewConnection(mock.path)
+
+        self.assertTrue(_wait_for(
+            lambda: self._connections.find_by_id(
+                'connection-%d' % _CONNECTIONS) is not None))
+
+    def test_updated(self):
+        mock = self._settings.connections[3]
+        mock.settings = _make_settings(3, ssid='renamed')
+        mock.Updated()
+
+        self.assertTrue(_wait_for(
+            lambda: self._connections.find_by_ssid('renamed') is not None))
+        self.assertIsNone(self._connections.find_by_ssid('network-3'))
+
+    def test_removed(self):
+        mock = self._settings.connections.pop(5)
+        mock.Removed()
+        mock.remove_from_connection()
+
+        self.assertTrue(_wait_for(
+            lambda: self._connections.find_by_id('connection-5') is None))
+        self.assertEqual(_CONNECTIONS - 1,
+                         len(self._connections.get_list()))
+
+    def test_duplicate_ssid(self):
+        mock = self._settings.connections[10]
+        mock.settings = _make_settings(10, ssid='network-9')
+        mock.Updated()
+        self.assertTrue(_wait_for(
+            lambda: self._connections.find_by_ssid('network-10') is None))
+
+        removed = self._settings.connections.pop(9)
+        removed.Removed()
+        removed.remove_from_connection()
+
+        self.assertTrue(_wait_for(
+            lambda: self._connections.find_by_id('connection-9') is None))
+        connection = self._connections.find_by_ssid('network-9')
+        self.assertEqual('connection-10', connection.get_id())
+
+    def test_duplicate_ssid_order(self):
+        # an earlier connection in the list wins, even when it is loaded
+        # after the other one
+        mock = self._settings.connections[7]
+        mock.settings = _make_settings(7, ssid='network-8')
+        mock.Updated()
+
+        self.assertTrue(_wait_for(
+            lambda: self._connections.find_by_ssid('network-7') is None))
+        connection = self._connections.find_by_ssid('network-8')
+        self.assertEqual('connection-7', connection.get_id())
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2013, One Laptop per Child
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import unittest
+
+from jarabe.util.normalize import SearchIndex
+
+
+class TestSearchIndex(unittest.TestCase):
+    def setUp(self):
+        self._index = SearchIndex()
+        self._index.add('abacus', u'Ábaco')
+        self._index.add('browse', 'Browse')
+        self._index.add('maze', 'Maze')
+
+    def test_match(self):
+        self.assertEqual(set(['abacus', 'browse', 'maze']),
+                         self._index.match(''))
+        self.assertEqual(set(['abacus', 'maze']), self._index.match('a'))
+        self.assertEqual(set(['abacus']), self._index.match('aba'))
+        self.assertEqual(set(['browse']), self._index.match('bro'))
+
+    def test_update(self):
+        matches = self._index.match('ma')
+        self._index.add('memorize', 'Memorize')
+        self._index.add('mathematics', 'Mathematics')
+        self._index.add('maze', 'Labyrinth')
+        self.assertEqual(set(['mathematics']), matches)
+
+        self._index.remove('mathematics')
+        self.assertEqual(set(), self._index.match('ma'))
+        self.assertEqual(set(['memorize']), self._index.match('me'))
@@ -0,0 +1,141 @@
+# Copyright (C) 2013, One Laptop per Child
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import os
+import subprocess
+import time
+import unittest
+from distutils.spawn import find_executable
+
+import dbus
+from dbus.mainloop.glib import DBusGMainLoop
+from gi.repository import GLib
+
+from jarabe.model import notifications
+
+DBusGMainLoop(set_as_default=True)
+
+
+def _wait_for(condition, timeout=10):
+    start = time.time()
+    while not condition() and time.time() - start < timeout:
+        GLib.MainContext.default().iteration(False)
+    return condition()
+
+
+@unittest.skipUnless(find_executable('dbus-daemon'), 'dbus-daemon is required')
+class TestNotificationService(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # don't take the notifications of the running session
+        cls._daemon = subprocess.Popen(
+            ['dbus-daemon', '--session', '--nofork', '--print-address'],
+            stdout=subprocess.PIPE)
+        address = cls._daemon.stdout.readline().strip()
+        cls._session_bus_address = os.environ.get('DBUS_SESSION_BUS_ADDRESS')
+        os.environ['DBUS_SESSION_BUS_ADDRESS'] = address
+
+        cls._bus = dbus.SessionBus()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._daemon.terminate()
+        cls._daemon.wait()
+        if cls._session_bus_address is None:
+            del os.environ['DBUS_SESSION_BUS_ADDRESS']
+        else:
+            os.environ['DBUS_SESSION_BUS_ADDRESS'] = cls._session_bus_address
+
+    def setUp(self):
+        self._service = notifications.NotificationService(max_visible=2)
+        self._shown = []
+        self._cancelled = []
+        self._closed = []
+        self._service.notification_received.connect(self.__received_cb)
+        self._service.notification_cancelled.connect(self.__cancelled_cb)
+        self._match = self._bus.add_signal_receiver(
+            self.__closed_cb, 'NotificationClosed',
+            'org.freedesktop.Notifications')
+
+    def tearDown(self):
+        self._match.remove()
+        self._service.remove_from_connection()
+
+    def __received_cb(self, **kwargs):
+        self._shown.append((kwargs['notification_id'], kwargs['replaces_id'],
+                            kwargs['summary']))
+
+    def __cancelled_cb(self, **kwargs):
+        self._cancelled.append(kwargs['notification_id'])
+
+    def __closed_cb(self, notification_id, reason):
+        self._closed.append((notification_id, reason))
+
+    def _notify(self, app_name, summary, replaces_id=0, expire_timeout=-1):
+        return self._service.Notify(app_name, replaces_id, '', summary, '',
+                                    [], {}, expire_timeout)
+
+    def test_queue(self):
+        first = self._notify('first', 'one')
+        second = self._notify('second', 'two')
+        third = self._notify('third', 'three')
+        self.assertEqual([first, second], [notification_id for
+                                           notification_id, replaces_id_,
+                                           summary_ in self._shown])
+
+        self._service.CloseNotification(first)
+        self.assertEqual([first], self._cancelled)
+        self.assertEqual((third, 0, 'three'), self._shown[-1])
+        self.assertTrue(_wait_for(lambda: self._closed))
+        self.assertEqual([(first, notifications.CLOSED_BY_CALL)],
+                         self._closed)
+
+    def test_replaces_id(self):
+        first = self._notify('app', 'one')
+        self.assertEqual(first, self._notify('app', 'two',
+                                             replaces_id=first))
+        self.assertEqual([(first, 0, 'one'), (first, first, 'two')],
+                         self._shown)
+
+    def test_coalesce(self):
+        ids = [self._notify('chatty', 'message %d' % i) for i in range(10)]
+        self.assertEqual(10, len(set(ids)))
+
+        # every message takes the window of the previous one
+        self.assertEqual((ids[-1], ids[-2], 'message 9'), self._shown[-1])
+        self.assertEqual([], self._cancelled)
+        self.assertTrue(_wait_for(lambda: len(self._closed) == 9))
+        self.assertEqual([(notification_id, notifications.CLOSED_UNDEFINED)
+                          for notification_id in ids[:-1]], self._closed)
+
+        # a queued message is replaced in the queue
+        self._notify('other', 'other')
+        waiting = self._notify('queued', 'first')
+        last = self._notify('queued', 'second')
+        self.assertEqual(3, len(set([ids[-1], waiting, last])))
+        self._service.CloseNotification(ids[-1])
+        self.assertEqual((last, 0, 'second'), self._shown[-1])
+
+    def test_expired(self):
+        notification_id = self._notify('app', 'one', expire_timeout=50)
+        self.assertTrue(_wait_for(lambda: self._closed))
+        self.assertEqual([notification_id], self._cancelled)
+        self.assertEqual([(notification_id, notifications.CLOSED_EXPIRED)],
+                         self._closed)
+
+    def test_close_unknown(self):
+        self._service.CloseNotification(1234)
+        self.assertEqual([], self._cancelled)
@@ -0,0 +1,126 @@
+# Copyright (C) 2013, One Laptop per Child
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from gi.repository import GdkPixbuf
+from gi.repository import GLib
+
+from jarabe.util import thumbnails
+
+GLib.threads_init()
+
+_IMAGES = 20
+
+
+def _wait_for(condition, timeout=10):
+    start = time.time()
+    while not condition() and time.time() - start < timeout:
+        GLib.MainContext.default().iteration(False)
+        time.sleep(0.01)
+    return condition()
+
+
+class TestThumbnails(unittest.TestCase):
+    def setUp(self):
+        self._tmp_dir = tempfile.mkdtemp()
+        self._cache_dir = os.path.join(self._tmp_dir, 'thumbnails')
+        self._cache = thumbnails.ThumbnailCache(self._cache_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self._tmp_dir)
+
+    def _create_image(self, name, width=512, height=256):
+        path = os.path.join(self._tmp_dir, name)
+        pixbuf = GdkPixbuf.Pixbuf.new(GdkPixbuf.Colorspace.RGB, False, 8,
+                                      width, height)
+        pixbuf.fill(0xff0000ff)
+        pixbuf.savev(path, 'png', [], [])
+        return path
+
+    def _get_cached_files(self, directory='normal'):
+        path = os.path.join(self._cache_dir, directory)
+        if not os.path.isdir(path):
+            return []
+        return os.listdir(path)
+
+    def test_create(self):
+        path = self._create_image('image.png')
+        pixbuf = self._cache.get_thumbnail(path)
+        self.assertEqual(128, pixbuf.get_width())
+        self.assertEqual(64, pixbuf.get_height())
+
+        cached = self._get_cached_files()
+        self.assertEqual(1, len(cached))
+        cached_path = os.path.join(self._cache_dir, 'normal', cached[0])
+        cached_pixbuf = GdkPixbuf.Pixbuf.new_from_file(cached_path)
+        self.assertEqual(GLib.filename_to_uri(path, None),
+                         cached_pixbuf.get_option('tEXt::Thumb::URI'))
+
+        # the cached thumbnail is used as long as the image is the same
+        mtime = os.path.getmtime(cached_path)
+        self._cache.get_thumbnail(path)
+        self.assertEqual(mtime, os.path.getmtime(cached_path))
+
+    def test_large(self):
+        path = self._create_image('image.png')
+        pixbuf = self._cache.get_thumbnail(path, size=150)
+        self.assertEqual(256, pixbuf.get_width())
+        self.assertEqual(128, pixbuf.get_height())
+        self.assertEqual(1, len(self._get_cached_files('large')))
+        self.assertEqual(0, len(self._get_cached_files('normal')))
+
+    def test_outdated(self):
+        path = self._create_image('image.png')
+        self._cache.get_thumbnail(path)
+
+        self._create_image('image.png', width=64, height=64)
+        os.utime(path, (time.time() + 10, time.time() + 10))
+        pixbuf = self._cache.get_thumbnail(path)
+        self.assertEqual(64, pixbuf.get_width())
+
+    def test_failed(self):
+        path = os.path.join(self._tmp_dir, 'broken.png')
+        with open(path, 'w') as image:
+            image.write('\x89PNG\r\n\x1a\n' + 'broken' * 10)
+
+        self.assertIsNone(self._cache.get_thumbnail(path))
+        self.assertIsNone(self._cache.get_thumbnail(path))
+        self.assertEqual(0, len(self._get_cached_files()))
+
+    def test_pool(self):
+        results = []
+        done = []
+        pool = thumbnails.ThumbnailPool(results.extend,
+                                        lambda: done.append(True),
+                                        cache=self._cache)
+        paths = [self._create_image('image-%d.png' % i)
+                 for i in range(_IMAGES)]
+        for path in paths:
+            pool.add(path)
+        pool.add(os.path.join(self._tmp_dir, 'missing.png'))
+        pool.close()
+
+        self.assertTrue(_wait_for(lambda: done))
+        self.assertEqual(_IMAGES + 1, len(results))
+        self.assertEqual(sorted(paths),
+                         sorted(path for path, pixbuf in results
+                                if pixbuf is not None))
+        self.assertEqual(_IMAGES, len(self._get_cached_files()))
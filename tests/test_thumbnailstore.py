@@ -0,0 +1,53 @@
+# Copyright (C) 2013, One Laptop per Child
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import unittest
+
+from jarabe.model.thumbnailstore import ThumbnailStore
+
+
+class TestThumbnailStore(unittest.TestCase):
+    def setUp(self):
+        self._store = ThumbnailStore(max_size=3)
+
+    def test_put_get(self):
+        self._store.put('a', 'thumbnail-a')
+        self.assertEqual('thumbnail-a', self._store.get('a'))
+        self.assertIsNone(self._store.get('b'))
+
+        self._store.put('a', 'new-thumbnail-a')
+        self.assertEqual('new-thumbnail-a', self._store.get('a'))
+        self.assertEqual(1, len(self._store))
+
+    def test_evict_least_recently_used(self):
+        for activity_id in ['a', 'b', 'c']:
+            self._store.put(activity_id, 'thumbnail-' + activity_id)
+
+        # using a makes b the least recently used one
+        self._store.get('a')
+        self._store.put('d', 'thumbnail-d')
+
+        self.assertEqual(3, len(self._store))
+        self.assertNotIn('b', self._store)
+        for activity_id in ['a', 'c', 'd']:
+            self.assertIn(activity_id, self._store)
+
+    def test_remove(self):
+        self._store.put('a', 'thumbnail-a')
+        self._store.remove('a')
+        self._store.remove('unknown')
+        self.assertNotIn('a', self._store)
+        self.assertEqual(0, len(self._store))